@@ -1,29 +1,191 @@
 from django.contrib import admin
-from .models import FlavorSeason, Ingredient, CustomerSuggestion, AllergyIssue, Inquiry
+from django.forms.models import BaseInlineFormSet
+from django.utils import timezone
+from django.utils.functional import cached_property
+from . import search
+from .forms import IngredientForm
+from .units import format_quantity
+from .models import (
+    FlavorSeason, Ingredient, CustomerSuggestion, AllergyIssue, Inquiry, PendingSubmission,
+    RecipeIngredient, StockMovement, STOCK_LEVELS,
+)
 
 
-@admin.register(FlavorSeason)
-class FlavorSeasonAdmin(admin.ModelAdmin):
-    list_display = ('name', 'available_from', 'available_to', 'is_active')
-    list_filter = ('is_active',)
-    search_fields = ('name',)
+class StockLevelFilter(admin.SimpleListFilter):
+    """
+    Filter ingredients by low/ok/high stock buckets (see STOCK_LEVEL_THRESHOLDS).
+
+    The choices are fixed, so the changelist does not run a DISTINCT over the
+    stock column to build the filter sidebar.
+    """
+    title = 'stock level'
+    parameter_name = 'stock_level'
+
+    def lookups(self, request, model_admin):
+        return [(level, level.capitalize()) for level in STOCK_LEVELS]
+
+    def queryset(self, request, queryset):
+        if self.value() in STOCK_LEVELS:
+            return queryset.with_stock_level(self.value())
+        return queryset
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
-    list_display = ('name', 'stock')
+    form = IngredientForm
+    list_display = ('name', 'stock_display')
     search_fields = ('name',)
-    list_filter = ('stock',)
+    list_filter = (StockLevelFilter, 'unit')
+
+    @admin.display(description='stock', ordering='stock')
+    def stock_display(self, obj):
+        return obj.get_stock_display()
+
+    def save_model(self, request, obj, form, change):
+        # IngredientForm.save records stock edits in the ledger instead of overwriting stock.
+        # Edits that would make the stock negative are form errors (IngredientForm.clean).
+        form.save()
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('ingredient', 'delta_display', 'reason', 'created_at')
+    list_select_related = ('ingredient',)
+    search_fields = ('ingredient__name', 'reason')
+    date_hierarchy = 'created_at'
+
+    @admin.display(description='change', ordering='delta')
+    def delta_display(self, obj):
+        sign = '-' if obj.delta < 0 else '+'
+        return sign + format_quantity(abs(obj.delta), obj.ingredient.unit)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class SharedChoicesInlineFormSet(BaseInlineFormSet):
+    """
+    Inline formset whose forms share one evaluated choice list per select field.
+
+    By default every inline row renders its own <select>, and each one runs the
+    field's queryset again. Here the choices of the fields named in
+    `shared_choice_fields` are read once per formset and reused by every row.
+    """
+    shared_choice_fields = ()
+
+    @cached_property
+    def shared_choices(self):
+        # iter() avoids list() asking ModelChoiceIterator for its length, which runs a COUNT query.
+        return {name: list(iter(self.form.base_fields[name].choices)) for name in self.shared_choice_fields}
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        self._share_choices(form)
+        return form
+
+    @property
+    def empty_form(self):
+        form = super().empty_form
+        self._share_choices(form)
+        return form
+
+    def _share_choices(self, form):
+        for name, choices in self.shared_choices.items():
+            field = form.fields[name]
+            field.choices = choices
+            # The admin wraps select widgets (RelatedFieldWidgetWrapper); update the inner widget too.
+            widget = field.widget
+            while hasattr(widget, 'widget'):
+                widget = widget.widget
+                widget.choices = choices
+
+
+class AllergyIssueInlineFormSet(SharedChoicesInlineFormSet):
+    shared_choice_fields = ('ingredient',)
 
 
 class AllergyIssueInline(admin.TabularInline):
     model = AllergyIssue
+    formset = AllergyIssueInlineFormSet
     extra = 1 
 
+    def get_queryset(self, request):
+        # Each row's __str__ (shown above the row) reads both relations.
+        return super().get_queryset(request).with_related()
+
+
+class RecipeIngredientInlineFormSet(SharedChoicesInlineFormSet):
+    shared_choice_fields = ('ingredient',)
+
+
+class RecipeIngredientInline(admin.TabularInline):
+    model = RecipeIngredient
+    formset = RecipeIngredientInlineFormSet
+    extra = 1
+
+    def get_queryset(self, request):
+        # Each row's __str__ (shown above the row) reads the ingredient.
+        return super().get_queryset(request).select_related('ingredient')
+
+
+@admin.register(FlavorSeason)
+class FlavorSeasonAdmin(admin.ModelAdmin):
+    list_display = ('name', 'available_from', 'available_to', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('name',)
+    inlines = [RecipeIngredientInline]
+
+
+class FullTextSearchMixin:
+    """
+    Answer the changelist search box from an FTS5 index instead of icontains.
+
+    `search_index` names the FTS5 table (see choco_app/search.py); `search_fields`
+    still enables the search box and is used where FTS5 is not available.
+    """
+    search_index = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_queryset(queryset, self.search_index, search_term, self.search_fields), False
+
+
 @admin.register(CustomerSuggestion)
-class CustomerSuggestionAdmin(admin.ModelAdmin):
+class CustomerSuggestionAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('customer_name', 'customer_email', 'suggested_flavor')
-    search_fields = ('customer_name', 'suggested_flavor')
+    search_fields = ('customer_name', 'suggested_flavor', 'suggestion_reason')
+    search_index = search.SUGGESTION_INDEX
     inlines = [AllergyIssueInline]
 
-admin.site.register(Inquiry)
+
+@admin.register(AllergyIssue)
+class AllergyIssueAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'concern_detail')
+    list_select_related = ('customer_suggestion', 'ingredient')
+    autocomplete_fields = ('customer_suggestion', 'ingredient')
+    search_fields = ('customer_suggestion__customer_name', 'ingredient__name')
+
+
+
+@admin.register(Inquiry)
+class InquiryAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('name', 'email', 'created_at')
+    search_fields = ('name', 'email', 'message')
+    search_index = search.INQUIRY_INDEX
+
+
+@admin.register(PendingSubmission)
+class PendingSubmissionAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'kind', 'status', 'attempts', 'available_at', 'last_error')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('kind', 'payload', 'attempts', 'last_error', 'created_at')
+    actions = ['retry']
+
+    @admin.action(description='Retry selected submissions now')
+    def retry(self, request, queryset):
+        count = queryset.update(status=PendingSubmission.PENDING, attempts=0, available_at=timezone.now())
+        self.message_user(request, f'{count} submission(s) queued for retry.')
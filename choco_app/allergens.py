@@ -0,0 +1,185 @@
+import threading
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import cache
+from .models import AllergenStats, AllergyIssue, CustomerSuggestion, Ingredient
+
+# The table linking suggestions to the ingredients they use.
+SuggestionIngredient = CustomerSuggestion.ingredients.through
+
+# Distinct allergen sets whose unsafe suggestions an index keeps at once.
+MAX_CACHED_SETS = 1024
+
+
+def recount(ingredient_ids, batch_size=500, using=None):
+    """
+    Recompute the AllergenStats rows of the given ingredients from the source tables.
+
+    Called with the ingredients touched by a write, this keeps the index current
+    at the cost of two queries per batch; called with every ingredient it
+    rebuilds the index. Ids of deleted ingredients are ignored.
+
+    Parameters:
+        ingredient_ids (Iterable[int]): The ingredients to recount.
+        batch_size (int): The number of ingredients recounted per query.
+        using (str): The database alias; the default database if omitted.
+
+    Returns:
+        int: The number of rows written.
+    """
+    ids = sorted(set(ingredient_ids))
+    if not ids:
+        return 0
+    issues = (
+        AllergyIssue.objects.filter(ingredient=OuterRef('pk')).order_by()
+        .values('ingredient').annotate(n=Count('pk')).values('n')
+    )
+    uses = (
+        SuggestionIngredient.objects.filter(ingredient=OuterRef('pk')).order_by()
+        .values('ingredient').annotate(n=Count('pk')).values('n')
+    )
+    written = 0
+    for start in range(0, len(ids), batch_size):
+        rows = Ingredient.objects.using(using).filter(pk__in=ids[start:start + batch_size]).annotate(
+            issues=Coalesce(Subquery(issues, output_field=IntegerField()), 0),
+            uses=Coalesce(Subquery(uses, output_field=IntegerField()), 0),
+        ).values_list('pk', 'issues', 'uses')
+        stats = [
+            AllergenStats(ingredient_id=pk, allergy_issue_count=issue_count, suggestion_count=use_count)
+            for pk, issue_count, use_count in rows
+        ]
+        AllergenStats.objects.using(using).bulk_create(
+            stats, update_conflicts=True, unique_fields=['ingredient'],
+            update_fields=['allergy_issue_count', 'suggestion_count'],
+        )
+        written += len(stats)
+    # Bump again once the transaction commits: a snapshot built between the
+    # first bump and the commit would otherwise carry the new version but read
+    # the old data.
+    cache.bump_version(cache.ALLERGENS)
+    transaction.on_commit(lambda: cache.bump_version(cache.ALLERGENS), using=using)
+    return written
+
+
+def rebuild(batch_size=500, using=None):
+    """
+    Recount the allergen figures of every ingredient.
+
+    Returns:
+        int: The number of rows written.
+    """
+    return recount(Ingredient.objects.using(using).values_list('pk', flat=True).iterator(), batch_size, using)
+
+
+class AllergenIndex:
+    """
+    In-memory snapshot of the allergen index at one version.
+
+    For each ingredient the snapshot holds the set of suggestions using it,
+    loaded from the database the first time the ingredient is asked about. The
+    union of those sets for an allergen set is computed once and remembered, so
+    checking a suggestion against a set already seen is a single set lookup.
+    Snapshots are never updated; `get_index` replaces them when the version moves.
+
+    Attributes:
+        version (int): The ALLERGENS cache group version the snapshot reflects.
+    """
+    def __init__(self, version):
+        self.version = version
+        self._lock = threading.Lock()
+        self._users = {}
+        self._unsafe = {}
+        self._allergens = None
+
+    def suggestions_using(self, ingredient_ids):
+        """
+        Return the suggestions using each of the given ingredients.
+
+        Parameters:
+            ingredient_ids (Iterable[int]): The ingredients.
+
+        Returns:
+            dict[int, frozenset[int]]: Suggestion ids by ingredient id.
+        """
+        ids = set(ingredient_ids)
+        missing = ids - self._users.keys()
+        if missing:
+            loaded = {pk: set() for pk in missing}
+            pairs = SuggestionIngredient.objects.filter(ingredient_id__in=missing).values_list(
+                'ingredient_id', 'customersuggestion_id',
+            )
+            for ingredient_id, suggestion_id in pairs.iterator():
+                loaded[ingredient_id].add(suggestion_id)
+            with self._lock:
+                self._users.update((pk, frozenset(users)) for pk, users in loaded.items())
+        return {pk: self._users[pk] for pk in ids}
+
+    def unsafe_suggestions(self, allergens):
+        """
+        Return the suggestions using at least one of `allergens`.
+
+        Parameters:
+            allergens (Iterable[int]): Ingredient ids to avoid.
+
+        Returns:
+            frozenset[int]: The ids of the unsafe suggestions.
+        """
+        key = frozenset(allergens)
+        unsafe = self._unsafe.get(key)
+        if unsafe is None:
+            unsafe = frozenset().union(*self.suggestions_using(key).values())
+            with self._lock:
+                if len(self._unsafe) >= MAX_CACHED_SETS:
+                    self._unsafe.clear()
+                self._unsafe[key] = unsafe
+        return unsafe
+
+    def is_safe(self, suggestion_id, allergens):
+        """Return True if suggestion `suggestion_id` uses none of the ingredients in `allergens`."""
+        return suggestion_id not in self.unsafe_suggestions(allergens)
+
+    def safe_suggestions(self, suggestion_ids, allergens):
+        """
+        Return the suggestions among `suggestion_ids` that use none of `allergens`, in order.
+
+        Parameters:
+            suggestion_ids (Iterable[int]): The suggestions to check.
+            allergens (Iterable[int]): Ingredient ids to avoid.
+
+        Returns:
+            list[int]: The safe suggestion ids.
+        """
+        unsafe = self.unsafe_suggestions(allergens)
+        return [pk for pk in suggestion_ids if pk not in unsafe]
+
+    def known_allergens(self):
+        """Return the ids of the ingredients with at least one reported allergy issue."""
+        if self._allergens is None:
+            self._allergens = frozenset(
+                AllergenStats.objects.filter(allergy_issue_count__gt=0).values_list('ingredient_id', flat=True)
+            )
+        return self._allergens
+
+
+_index = None
+
+
+def get_index():
+    """
+    Return the process's allergen index, replacing it if the data has changed since it was built.
+
+    This reads the ALLERGENS version from the cache once; callers checking many
+    suggestions should keep the returned snapshot for the duration of the batch.
+
+    Returns:
+        AllergenIndex: The current snapshot.
+    """
+    global _index
+    version = cache.get_version(cache.ALLERGENS)
+    index = _index
+    if index is None or index.version != version:
+        index = _index = AllergenIndex(version)
+    return index
@@ -0,0 +1,155 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AllergenStats, AllergyIssue, CustomerSuggestion, DailyActivity, FlavorStats
+
+# Keys recounted per query, well below SQLite's bound parameter limit.
+BATCH_SIZE = 500
+
+
+def _batches(values, size=BATCH_SIZE):
+    values = sorted(set(values))
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def day_of(moment):
+    """Return the day `moment` falls on in the current time zone."""
+    return timezone.localdate(moment)
+
+
+def _day_range(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _count_by_day(queryset):
+    return dict(
+        queryset.order_by().annotate(day=TruncDate('created_at')).values_list('day').annotate(n=Count('pk'))
+    )
+
+
+def recount_flavors(flavors, using=None):
+    """
+    Recompute the FlavorStats rows of the given flavors from the suggestions table.
+
+    Flavors no longer suggested lose their row. Each batch costs one grouped
+    count over the suggested_flavor index, one upsert and at most one delete.
+
+    Parameters:
+        flavors (Iterable[str]): The flavors whose suggestions changed.
+        using (str): The database alias; the default database if omitted.
+    """
+    for batch in _batches(flavors):
+        counts = dict(
+            CustomerSuggestion.objects.using(using).filter(suggested_flavor__in=batch).order_by()
+            .values_list('suggested_flavor').annotate(n=Count('pk'))
+        )
+        if counts:
+            FlavorStats.objects.using(using).bulk_create(
+                [FlavorStats(suggested_flavor=flavor, suggestion_count=n) for flavor, n in counts.items()],
+                update_conflicts=True, unique_fields=['suggested_flavor'], update_fields=['suggestion_count'],
+            )
+        if len(counts) < len(batch):
+            FlavorStats.objects.using(using).filter(suggested_flavor__in=set(batch) - counts.keys()).delete()
+
+
+def recount_days(days, using=None):
+    """
+    Recompute the DailyActivity rows of the given days from the suggestion and allergy issue tables.
+
+    Days left without any activity lose their row.
+
+    Parameters:
+        days (Iterable[date]): The days whose suggestions or allergy issues changed.
+        using (str): The database alias; the default database if omitted.
+    """
+    for batch in _batches(days):
+        window = Q()
+        for day in batch:
+            start, end = _day_range(day)
+            window |= Q(created_at__gte=start, created_at__lt=end)
+        suggestions = _count_by_day(CustomerSuggestion.objects.using(using).filter(window))
+        issues = _count_by_day(AllergyIssue.objects.using(using).filter(window))
+        active = suggestions.keys() | issues.keys()
+        if active:
+            DailyActivity.objects.using(using).bulk_create(
+                [
+                    DailyActivity(day=day, suggestion_count=suggestions.get(day, 0),
+                                  allergy_issue_count=issues.get(day, 0))
+                    for day in active
+                ],
+                update_conflicts=True, unique_fields=['day'],
+                update_fields=['suggestion_count', 'allergy_issue_count'],
+            )
+        if len(active) < len(batch):
+            DailyActivity.objects.using(using).filter(day__in=set(batch) - active).delete()
+
+
+def rebuild(using=None, batch_size=1000):
+    """
+    Recompute every analytics table from scratch.
+
+    Each table is rebuilt from a single GROUP BY over its source table, streamed
+    into bulk INSERTs of `batch_size` rows, inside one transaction so readers
+    never see a half-built table. The ingredient figures live in AllergenStats
+    and are rebuilt by `choco_app.allergens.rebuild`.
+
+    Parameters:
+        using (str): The database alias; the default database if omitted.
+        batch_size (int): Rows per INSERT.
+
+    Returns:
+        tuple[int, int]: The number of FlavorStats and DailyActivity rows written.
+    """
+    suggestions = CustomerSuggestion.objects.using(using)
+    with transaction.atomic(using=using):
+        FlavorStats.objects.using(using).all().delete()
+        flavors = FlavorStats.objects.using(using).bulk_create(
+            (
+                FlavorStats(suggested_flavor=flavor, suggestion_count=n)
+                for flavor, n in suggestions.order_by().values_list('suggested_flavor').annotate(n=Count('pk'))
+            ),
+            batch_size=batch_size,
+        )
+        DailyActivity.objects.using(using).all().delete()
+        per_day = _count_by_day(suggestions)
+        issues = _count_by_day(AllergyIssue.objects.using(using))
+        days = DailyActivity.objects.using(using).bulk_create(
+            (
+                DailyActivity(day=day, suggestion_count=per_day.get(day, 0), allergy_issue_count=issues.get(day, 0))
+                for day in sorted(per_day.keys() | issues.keys())
+            ),
+            batch_size=batch_size,
+        )
+    return len(flavors), len(days)
+
+
+def top_flavors(limit=10):
+    """Return the `limit` most suggested flavors, most suggested first."""
+    return FlavorStats.objects.order_by('-suggestion_count', 'suggested_flavor')[:limit]
+
+
+def top_ingredients(limit=10):
+    """Return the AllergenStats of the `limit` ingredients used by the most suggestions, with their ingredient."""
+    return (
+        AllergenStats.objects.filter(suggestion_count__gt=0).select_related('ingredient')
+        .order_by('-suggestion_count', 'ingredient_id')[:limit]
+    )
+
+
+def top_allergens(limit=10):
+    """Return the AllergenStats of the `limit` ingredients with the most allergy issues, with their ingredient."""
+    return (
+        AllergenStats.objects.filter(allergy_issue_count__gt=0).select_related('ingredient')
+        .order_by('-allergy_issue_count', 'ingredient_id')[:limit]
+    )
+
+
+def daily_activity(days=30):
+    """Return the DailyActivity rows of the last `days` days (today included), oldest first."""
+    return DailyActivity.objects.filter(day__gt=timezone.localdate() - timedelta(days=days)).order_by('day')
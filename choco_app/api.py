@@ -0,0 +1,187 @@
+from django.core.exceptions import ValidationError
+from django.http import Http404
+
+from .models import CustomerSuggestion, FlavorSeason, Ingredient, RowChange
+
+
+def parse_ids(model, values):
+    """
+    Convert query parameter values to primary keys of `model`.
+
+    Parameters:
+        model (type[Model]): The model the ids refer to.
+        values (list[str]): The parameter values.
+
+    Returns:
+        list[int]: The primary keys, in order.
+
+    Raises:
+        ValueError: If a value is not an integer the primary key can hold.
+    """
+    field = model._meta.pk
+    ids = []
+    for value in values:
+        try:
+            pk = int(value)
+        except ValueError:
+            raise ValueError('Ids must be integers.')
+        try:
+            field.run_validators(pk)
+        except ValidationError as exc:
+            raise ValueError(f"Id {pk} is out of range. {' '.join(exc.messages)}")
+        ids.append(pk)
+    return ids
+
+
+class Resource:
+    """
+    A model published read-only by the JSON API.
+
+    Rows are read with `values()` over the selected columns only, so no model
+    instances are created. Many-to-many fields are published as lists of
+    primary keys, read with one extra query over the link table.
+
+    Attributes:
+        model (type[Model]): The published model.
+        fields (tuple[str]): The fields clients may select, 'id' first; it is always included.
+        table (str): The model's table, as recorded in RowChange.
+    """
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = ('id',) + tuple(field for field in fields if field != 'id')
+        self.table = model._meta.db_table
+        self.related = {field.name: field for field in model._meta.many_to_many if field.name in self.fields}
+
+    def parse_fields(self, value):
+        """
+        Return the fields selected by a comma-separated `fields` parameter.
+
+        Parameters:
+            value (str): The parameter, or None/empty for every field.
+
+        Returns:
+            list[str]: The selected fields, 'id' first.
+
+        Raises:
+            ValueError: If a field is not published.
+        """
+        if not value:
+            return list(self.fields)
+        wanted = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in wanted if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.fields)}.")
+        return ['id'] + [name for name in dict.fromkeys(wanted) if name != 'id']
+
+    def parse_ids(self, values):
+        """
+        Return the primary keys given as repeated `id` parameters, without duplicates, in request order.
+
+        Raises:
+            ValueError: If a value is not an integer the primary key can hold.
+        """
+        return list(dict.fromkeys(parse_ids(self.model, values)))
+
+    def values(self, fields, queryset=None):
+        """Return `queryset` (all rows by default) as dicts of the selected columns."""
+        queryset = self.model._default_manager.all() if queryset is None else queryset
+        return queryset.values(*(name for name in fields if name not in self.related))
+
+    def attach(self, rows, fields):
+        """
+        Add the selected many-to-many fields to `rows`, as lists of primary keys.
+
+        Parameters:
+            rows (list[dict]): Rows from `values`, each with its 'id'.
+            fields (list[str]): The selected fields.
+
+        Returns:
+            list[dict]: `rows`, updated in place.
+        """
+        for name in fields:
+            field = self.related.get(name)
+            if field is None:
+                continue
+            source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+            links = {row['id']: [] for row in rows}
+            pairs = field.remote_field.through.objects.filter(**{f'{source}_id__in': list(links)}).order_by(
+                f'{source}_id', f'{target}_id',
+            ).values_list(f'{source}_id', f'{target}_id')
+            for row_id, related_id in pairs:
+                links[row_id].append(related_id)
+            for row in rows:
+                row[name] = links[row['id']]
+        return rows
+
+    def fetch(self, ids, fields):
+        """
+        Return the rows with the given primary keys, by primary key.
+
+        Parameters:
+            ids (Iterable[int]): The primary keys to read.
+            fields (list[str]): The selected fields.
+
+        Returns:
+            dict[int, dict]: The rows that exist.
+        """
+        rows = list(self.values(fields, self.model._default_manager.filter(pk__in=ids)))
+        return {row['id']: row for row in self.attach(rows, fields)}
+
+
+# Published resources by URL name. Customer e-mail addresses are not published.
+RESOURCES = {
+    'ingredients': Resource(Ingredient, ['name', 'stock', 'unit', 'updated_at']),
+    'flavors': Resource(
+        FlavorSeason, ['name', 'description', 'available_from', 'available_to', 'is_active', 'updated_at'],
+    ),
+    'suggestions': Resource(
+        CustomerSuggestion, ['customer_name', 'suggested_flavor', 'suggestion_reason', 'created_at', 'ingredients'],
+    ),
+}
+
+
+def get_resource(name):
+    """Return the published resource called `name`, or raise Http404."""
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise Http404(f'No API resource named {name!r}.')
+
+
+def current_version():
+    """Return the version of the latest change to any published row (0 before the first)."""
+    return RowChange.objects.order_by('-version').values_list('version', flat=True).first() or 0
+
+
+def changes(resource, since, limit, fields):
+    """
+    Return the rows of `resource` changed after version `since`, oldest change first.
+
+    Only the latest change of each row is kept in RowChange, so a row changed
+    many times is sent once. Rows that no longer exist are reported as deleted.
+    SQLite runs one write transaction at a time, so versions become visible in
+    order and a client never skips a change by resuming from the last version
+    it received.
+
+    Parameters:
+        resource (Resource): The published resource.
+        since (int): The last version the client has seen.
+        limit (int): The most rows to return; the client asks again from the returned version for more.
+        fields (list[str]): The selected fields.
+
+    Returns:
+        tuple[int, list[dict], list[int], bool]: The version to resume from, the
+        changed rows, the ids of deleted rows, and whether more changes are waiting.
+    """
+    entries = list(
+        RowChange.objects.filter(table_name=resource.table, version__gt=since).order_by('version')
+        .values_list('version', 'row_id')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return since, [], [], False
+    rows = resource.fetch([row_id for _version, row_id in entries], fields)
+    changed = [rows[row_id] for _version, row_id in entries if row_id in rows]
+    deleted = [row_id for _version, row_id in entries if row_id not in rows]
+    return entries[-1][0], changed, deleted, has_more
@@ -0,0 +1,1030 @@
+import asyncio
+import json
+import math
+import os
+import signal
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import OperationalError, connection, connections, transaction
+from django.template import Engine, RequestContext, engines
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import allergens, analytics, events, urls as app_urls
+from .forms import (
+    AllergyForm, IngredientForm, IngredientImportForm, InquiryForm, SeasonalFlavorForm, SuggestionForm,
+)
+from .models import AllergyIssue, CustomerSuggestion, FlavorSeason, Ingredient, Inquiry, RecipeIngredient
+from .pagination import encode_cursor, keyset_paginate
+
+# Rows of each seeded model (ingredients, suggestions, allergy issues, inquiries) per scale.
+SCALES = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+# Seasonal flavors do not grow with the archive; a shop has at most a few hundred.
+MAX_FLAVORS = 500
+
+# Ingredients in each seeded flavor recipe.
+RECIPE_SIZE = 6
+
+
+class QueryCounter:
+    """`connection.execute_wrapper` hook that counts the queries it sees."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def seed(rows, batch_size=5000, stdout=None):
+    """
+    Fill the database with `rows` synthetic ingredients, suggestions, allergy issues and inquiries,
+    and up to MAX_FLAVORS seasonal flavors with their recipes.
+
+    Rows are written with bulk_create in batches, so signals (ledger entries,
+    cache bumps) are not sent; the full-text indexes are still maintained by
+    their triggers and the allergen index and analytics tables are rebuilt at
+    the end.
+
+    Parameters:
+        rows (int): Number of rows of each model to create.
+        batch_size (int): Rows per INSERT batch.
+        stdout (OutputWrapper): Where to report progress, if anywhere.
+    """
+    today = timezone.localdate()
+    flavors = ['Mint', 'Hazelnut', 'Salted Caramel', 'Raspberry', 'Orange', 'Chili']
+    for start in range(0, rows, batch_size):
+        stop = min(start + batch_size, rows)
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ingredient {i:07d}', stock=(i % 50) * 100_000, unit='g' if i % 4 else 'unit')
+            for i in range(start, stop)
+        ])
+        suggestions = CustomerSuggestion.objects.bulk_create([
+            CustomerSuggestion(
+                customer_name=f'Customer {i:07d}', customer_email=f'customer{i}@example.com',
+                suggested_flavor=flavors[i % len(flavors)],
+                suggestion_reason=f'Suggestion number {i} because it pairs well with dark chocolate',
+            )
+            for i in range(start, stop)
+        ])
+        through = CustomerSuggestion.ingredients.through
+        through.objects.bulk_create([
+            through(customersuggestion_id=suggestion.pk, ingredient_id=ingredients[(n + k) % len(ingredients)].pk)
+            for n, suggestion in enumerate(suggestions) for k in range(min(3, len(ingredients)))
+        ])
+        AllergyIssue.objects.bulk_create([
+            AllergyIssue(
+                customer_suggestion=suggestion, ingredient=ingredients[(n * 7) % len(ingredients)],
+                concern_detail='Possible traces of nuts',
+            )
+            for n, suggestion in enumerate(suggestions)
+        ])
+        Inquiry.objects.bulk_create([
+            Inquiry(name=f'Visitor {i:07d}', email=f'visitor{i}@example.com',
+                    message=f'Do you ship order {i} to the coast?')
+            for i in range(start, stop)
+        ])
+        if stdout:
+            stdout.write(f'  seeded {stop}/{rows}')
+
+    FlavorSeason.objects.bulk_create([
+        FlavorSeason(
+            name=f'Flavor {i:04d}', is_active=i % 3 == 0,
+            available_from=today - timedelta(days=i % 60), available_to=today + timedelta(days=i % 45),
+        )
+        for i in range(min(rows, MAX_FLAVORS))
+    ])
+    flavor_ids = list(FlavorSeason.objects.order_by('pk').values_list('pk', flat=True))
+    ingredient_ids = list(Ingredient.objects.order_by('pk').values_list('pk', flat=True)[:MAX_FLAVORS * 2])
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(
+            flavor_id=flavor_id, ingredient_id=ingredient_ids[(n * 7 + k * 31) % len(ingredient_ids)],
+            quantity=(k + 1) * 50_000,
+        )
+        for n, flavor_id in enumerate(flavor_ids) for k in range(min(RECIPE_SIZE, len(ingredient_ids)))
+    ], ignore_conflicts=True)
+    allergens.rebuild()
+    analytics.rebuild()
+
+
+@contextmanager
+def seeded_database(scale, keepdb=False, stdout=None):
+    """
+    Run the block against a throwaway database seeded with `scale` rows per model.
+
+    The database is a separate SQLite file, bench_<scale>.sqlite3 next to the
+    project database, created and migrated like a test database so that the
+    development data is never touched. It is seeded unless it already holds
+    enough rows (a database kept by an earlier run), and destroyed afterwards
+    unless `keepdb` is set.
+
+    Parameters:
+        scale (str): A key of SCALES.
+        keepdb (bool): Reuse the database if it exists, and keep it afterwards.
+        stdout (OutputWrapper): Where to report seeding progress, if anywhere.
+
+    Yields:
+        str: The path of the database file, for servers run in other processes.
+    """
+    name = str(settings.BASE_DIR / f'bench_{scale}.sqlite3')
+    settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = name
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = name
+    original_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb,
+    )
+    try:
+        rows = SCALES[scale]
+        if Ingredient.objects.count() < rows:
+            if stdout:
+                stdout.write(f'Seeding {rows} rows per model...')
+            seed(rows, stdout=stdout)
+        yield str(connection.settings_dict['NAME'])
+    finally:
+        if not keepdb:
+            connection.creation.destroy_test_db(original_name, verbosity=0)
+
+
+def write_results(results, path, stdout=None):
+    """
+    Write benchmark results to `path` as indented JSON.
+
+    Parameters:
+        results (dict): The results, as reported by the command.
+        path (str): The file to write; nothing is written if empty.
+        stdout (OutputWrapper): Where to say so, if anywhere.
+    """
+    if not path:
+        return
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(results, output, indent=2)
+    if stdout:
+        stdout.write(f'Results written to {path}.')
+
+
+class Route:
+    """
+    One benchmarked request.
+
+    Attributes:
+        label (str): Name shown in reports; the URL name, plus a variant suffix if any.
+        url_name (str): The name of the route in choco_app/urls.py.
+        method (str): 'GET' or 'POST'.
+        path (str): The request path, including any query string.
+        data: POST form data (dict) or raw JSON body (str).
+        content_type (str): Content type of a raw body, if any.
+    """
+    def __init__(self, label, url_name, method, path, data=None, content_type=None):
+        self.label = label
+        self.url_name = url_name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.content_type = content_type
+
+
+def build_routes():
+    """
+    Return the requests to benchmark, covering every route of choco_app/urls.py.
+
+    Keep this list in step with choco_app/urls.py; `missing_routes` reports any
+    URL name without an entry.
+
+    Returns:
+        list[Route]: The routes, addressed at rows that exist in the seeded database.
+    """
+    ingredient = Ingredient.objects.order_by('pk').values_list('pk', flat=True).first()
+    flavor = FlavorSeason.objects.order_by('pk').values_list('pk', flat=True).first()
+    # A cursor into the middle of the ingredient list.
+    middle = Ingredient.objects.order_by('name', 'pk').values_list('name', 'pk')[
+        Ingredient.objects.count() // 2:
+    ].first()
+
+    def get(url_name, query='', label=None, **kwargs):
+        return Route(label or url_name, url_name, 'GET', reverse(url_name, kwargs=kwargs) + query)
+
+    return [
+        get('home'),
+        get('about'),
+        get('contact'),
+        get('ingredient_list'),
+        get('ingredient_list', '?page_size=500', label='ingredient_list (500 rows)'),
+        get('ingredient_list', f'?cursor={encode_cursor(middle)}', label='ingredient_list (next page)'),
+        get('ingredient_list', '?stream=1', label='ingredient_list (stream)'),
+        get('ingredient_create'),
+        get('ingredient_update', pk=ingredient),
+        get('ingredient_delete', pk=ingredient),
+        Route('ingredient_stock_adjust', 'ingredient_stock_adjust', 'POST',
+              reverse('ingredient_stock_adjust', kwargs={'pk': ingredient}), {'delta': 1, 'reason': 'benchmark'}),
+        Route('ingredient_stock_batch', 'ingredient_stock_batch', 'POST', reverse('ingredient_stock_batch'),
+              json.dumps({'movements': [{'ingredient': ingredient, 'delta': 1, 'reason': 'benchmark'}]}),
+              'application/json'),
+        get('ingredient_import'),
+        get('ingredient_export'),
+        get('customer_suggestion'),
+        get('suggestion_search', '?q=salted+cara'),
+        get('ingredient_catalogue'),
+        get('suggestion_success'),
+        get('seasonal_flavors'),
+        get('allergy_concern_create'),
+        get('customer_suggestion_lookup', '?q=Customer+00001'),
+        get('allergen_check', '?suggestion=1&suggestion=2&suggestion=3'),
+        get('allergy_concern_success'),
+        get('analytics'),
+        get('production_plan'),
+        get('production_plan', '?weights=demand&flavors=all', label='production_plan (all, by demand)'),
+        get('api_list', '?page_size=100', label='api_list (ingredients)', resource='ingredients'),
+        get('api_list', f'?id={ingredient}&fields=name,stock', label='api_list (ingredients by id)',
+            resource='ingredients'),
+        get('api_list', label='api_list (suggestions)', resource='suggestions'),
+        get('api_changes', '?since=0', label='api_changes (ingredients)', resource='ingredients'),
+        get('add_seasonal_flavor'),
+        get('update_seasonal_flavor', flavor_id=flavor),
+        get('delete_seasonal_flavor', flavor_id=flavor),
+    ]
+
+
+# URL names measured by their own benchmark instead of request/response timing,
+# with the command that covers them.
+SEPARATELY_BENCHMARKED = {
+    'live_events': 'benchmark_events',  # An open-ended stream.
+}
+
+
+def missing_routes(routes):
+    """Return the URL names in choco_app/urls.py that no route in `routes` exercises."""
+    names = {pattern.name for pattern in app_urls.urlpatterns if isinstance(pattern, URLPattern)}
+    return sorted(names - {route.url_name for route in routes} - SEPARATELY_BENCHMARKED.keys())
+
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values), math.ceil(fraction * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, queries, elapsed, statuses):
+    """
+    Reduce the samples of one route to the reported figures.
+
+    Parameters:
+        latencies (list[float]): Seconds per request.
+        queries (list[int]): SQL queries per request, empty when not measurable.
+        elapsed (float): Wall-clock seconds for all requests of the route.
+        statuses (list[int]): Response status codes.
+
+    Returns:
+        dict: Percentiles in milliseconds, throughput in requests per second and mean queries.
+    """
+    ordered = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'statuses': sorted(set(statuses)),
+    }
+
+
+def run_client(routes, requests, cold=False):
+    """
+    Send every route `requests` times through the Django test client.
+
+    Parameters:
+        routes (list[Route]): The routes to request.
+        requests (int): Requests per route.
+        cold (bool): Clear the page cache before each request.
+
+    Returns:
+        dict: Summary per route label (see `summarize`).
+    """
+    client = Client()
+    results = {}
+    for route in routes:
+        latencies, queries, statuses = [], [], []
+        started = time.perf_counter()
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            counter = QueryCounter()
+            start = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                response = _client_request(client, route)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            latencies.append(time.perf_counter() - start)
+            queries.append(counter.count)
+            statuses.append(response.status_code)
+        results[route.label] = summarize(latencies, queries, time.perf_counter() - started, statuses)
+    return results
+
+
+class _Rollback(Exception):
+    pass
+
+
+def capture_queries(routes):
+    """
+    Return the SQL statements each route runs, as the test client requests it once.
+
+    The page cache is replaced by a DummyCache, so every view runs its queries,
+    and each request runs in a transaction that is rolled back, so the routes
+    that write leave the database as it was.
+
+    Parameters:
+        routes (list[Route]): The routes to request.
+
+    Returns:
+        list[tuple[Route, list[str]]]: Each route with the SQL it ran, parameters inlined.
+    """
+    client = Client()
+    dummy = {alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'} for alias in settings.CACHES}
+    captured = []
+    with override_settings(CACHES=dummy, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for route in routes:
+            with CaptureQueriesContext(connection) as queries:
+                try:
+                    with transaction.atomic():
+                        response = _client_request(client, route)
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                        raise _Rollback
+                except _Rollback:
+                    pass
+            captured.append((route, [query['sql'] for query in queries]))
+    return captured
+
+
+def _client_request(client, route):
+    if route.method == 'GET':
+        return client.get(route.path)
+    if route.content_type:
+        return client.post(route.path, route.data, content_type=route.content_type)
+    return client.post(route.path, route.data)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def counting_application(application):
+    """
+    Wrap a WSGI application to report the queries of each request in an X-Bench-Queries header.
+
+    The response body is read before it is returned so that queries issued while
+    a streaming response is generated are counted too.
+    """
+    def wrapped(environ, start_response):
+        counter = QueryCounter()
+        captured = []
+        with connection.execute_wrapper(counter):
+            result = application(environ, lambda status, headers, *exc: captured.append((status, headers)))
+            try:
+                body = list(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        status, headers = captured[-1]
+        start_response(status, headers + [('X-Bench-Queries', str(counter.count))])
+        return body
+    return wrapped
+
+
+def serve_wsgi(application):
+    """
+    Start a threaded WSGI server for `application` on a free local port.
+
+    Returns:
+        tuple[ThreadedWSGIServer, str]: The running server and its base URL.
+    """
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(counting_application(application))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def serve_asgi(application):
+    """
+    Start uvicorn for the ASGI `application` on a free local port.
+
+    Raises:
+        ImportError: If uvicorn is not installed.
+
+    Returns:
+        tuple[RunningAsgiServer, str]: The running server and its base URL.
+    """
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(application, log_level='warning', lifespan='off'))
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    return RunningAsgiServer(server, thread, sock), f'http://127.0.0.1:{port}'
+
+
+class RunningAsgiServer:
+    """Handle on a uvicorn server started by `serve_asgi`."""
+
+    def __init__(self, server, thread, sock):
+        self.server = server
+        self.thread = thread
+        self.sock = sock
+
+    def shutdown(self):
+        self.server.should_exit = True
+        self.thread.join()
+        self.sock.close()
+
+
+def run_server(base_url, routes, requests, concurrency=1, cold=False):
+    """
+    Send every route `requests` times over HTTP to a running server.
+
+    POST routes carry the CSRF cookie and token of a prior GET, like a browser.
+
+    Parameters:
+        base_url (str): The server's base URL.
+        routes (list[Route]): The routes to request.
+        requests (int): Requests per route.
+        concurrency (int): Number of requests in flight at once.
+        cold (bool): Clear the page cache before each request (in-process servers only).
+
+    Returns:
+        dict: Summary per route label (see `summarize`).
+    """
+    csrf_token = _fetch_csrf_token(base_url, reverse('contact'))
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for route in routes:
+            started = time.perf_counter()
+            samples = list(pool.map(
+                lambda _: _http_request(base_url, route, csrf_token, cold), range(requests)
+            ))
+            elapsed = time.perf_counter() - started
+            latencies = [latency for latency, _status, _queries in samples]
+            statuses = [status for _latency, status, _queries in samples]
+            queries = [count for _latency, _status, count in samples if count is not None]
+            results[route.label] = summarize(latencies, queries, elapsed, statuses)
+    return results
+
+
+def _fetch_csrf_token(base_url, path):
+    with urllib.request.urlopen(base_url + path) as response:
+        cookie = SimpleCookie()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie.load(header)
+        response.read()
+    return cookie['csrftoken'].value if 'csrftoken' in cookie else ''
+
+
+def _http_request(base_url, route, csrf_token, cold):
+    if cold:
+        cache.clear()
+    headers = {}
+    body = None
+    if route.method == 'POST':
+        headers = {'Cookie': f'csrftoken={csrf_token}', 'X-CSRFToken': csrf_token}
+        if route.content_type:
+            body = route.data.encode()
+            headers['Content-Type'] = route.content_type
+        else:
+            body = urllib.parse.urlencode(route.data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    request = urllib.request.Request(base_url + route.path, data=body, headers=headers, method=route.method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status, queries = response.status, response.headers.get('X-Bench-Queries')
+    except urllib.error.HTTPError as exc:
+        exc.read()
+        status, queries = exc.code, exc.headers.get('X-Bench-Queries')
+    latency = time.perf_counter() - start
+    return latency, status, int(queries) if queries is not None else None
+
+
+def compare(results, baseline, threshold):
+    """
+    List the regressions of `results` against a `baseline` run.
+
+    A route regresses when its p95 latency grows by more than `threshold`
+    (a fraction, 0.2 = 20%) or when it runs more queries per request.
+
+    Parameters:
+        results (dict): The current run, as written by the benchmark command.
+        baseline (dict): A previous run in the same format.
+        threshold (float): Allowed relative p95 growth.
+
+    Returns:
+        list[str]: One description per regression.
+    """
+    regressions = []
+    for runner, routes in results['runs'].items():
+        for label, current in routes.items():
+            previous = baseline.get('runs', {}).get(runner, {}).get(label)
+            if previous is None:
+                continue
+            if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+                regressions.append(
+                    f"{runner} {label}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms"
+                )
+            if (previous['queries_per_request'] is not None and current['queries_per_request'] is not None
+                    and current['queries_per_request'] > previous['queries_per_request']):
+                regressions.append(
+                    f"{runner} {label}: queries/request "
+                    f"{previous['queries_per_request']} -> {current['queries_per_request']}"
+                )
+    return regressions
+
+
+# SQLite connection profiles compared by the contention benchmark: Django's
+# defaults (rollback journal, deferred transactions, a connection per request)
+# against the tuned settings of DATABASES['default'].
+CONTENTION_PROFILES = {
+    'django-default': {'CONN_MAX_AGE': 0, 'OPTIONS': {}},
+    'tuned': {
+        'CONN_MAX_AGE': settings.DATABASES['default'].get('CONN_MAX_AGE', 0),
+        'OPTIONS': settings.DATABASES['default'].get('OPTIONS', {}),
+    },
+}
+
+
+def add_sqlite_database(alias, path, profile):
+    """
+    Register and migrate a SQLite database `alias` stored at `path` with a connection `profile`.
+
+    Parameters:
+        alias (str): The new database alias.
+        path (str): The database file.
+        profile (dict): Settings overriding the defaults, e.g. CONN_MAX_AGE and OPTIONS.
+    """
+    config = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, **profile}
+    connections.settings[alias] = connections.configure_settings({**connections.settings, alias: config})[alias]
+    call_command('migrate', database=alias, verbosity=0)
+
+
+def remove_database(alias):
+    """Close and unregister a database added by `add_sqlite_database`."""
+    connections[alias].close()
+    del connections.settings[alias]
+
+
+def run_contention(alias, threads, writes, ingredients=20):
+    """
+    Submit suggestions and stock movements from `threads` concurrent writers.
+
+    Each write is what a suggestion form submission plus a stock terminal do:
+    a suggestion with its ingredient links in one transaction, then one stock
+    movement. After each write the connection is released as at the end of a
+    request, honouring CONN_MAX_AGE.
+
+    Parameters:
+        alias (str): The database to write to.
+        threads (int): Number of concurrent writers.
+        writes (int): Writes per writer.
+        ingredients (int): Number of ingredients the writers share.
+
+    Returns:
+        dict: Committed writes, writes failed with "database is locked", seconds and writes per second.
+    """
+    Ingredient.objects.using(alias).bulk_create(
+        [Ingredient(name=f'Contention {i}', stock=10**9) for i in range(ingredients)],
+        ignore_conflicts=True,
+    )
+    ingredient_ids = list(Ingredient.objects.using(alias).values_list('pk', flat=True)[:ingredients])
+    connections[alias].close()
+
+    barrier = threading.Barrier(threads)
+    outcomes = []
+
+    def writer(number):
+        barrier.wait()
+        committed = locked = 0
+        for i in range(writes):
+            try:
+                with transaction.atomic(using=alias):
+                    suggestion = CustomerSuggestion.objects.using(alias).create(
+                        customer_name=f'Writer {number}', customer_email='writer@example.com',
+                        suggested_flavor='Mint', suggestion_reason=f'Write {i}',
+                    )
+                    suggestion.ingredients.add(*ingredient_ids[:3])
+                Ingredient.objects.db_manager(alias).adjust_stock(
+                    ingredient_ids[(number + i) % len(ingredient_ids)], -1, 'contention',
+                )
+                committed += 1
+            except OperationalError:
+                locked += 1
+            finally:
+                connections[alias].close_if_unusable_or_obsolete()
+        connections[alias].close()
+        outcomes.append((committed, locked))
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    committed = sum(done for done, _locked in outcomes)
+    return {
+        'threads': threads,
+        'committed': committed,
+        'locked_errors': sum(locked for _done, locked in outcomes),
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(committed / elapsed, 1),
+    }
+
+
+def rss_bytes():
+    """Return the resident set size of this process in bytes (Linux), or its peak elsewhere."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakRss:
+    """Context manager sampling this process's RSS every few milliseconds and keeping the peak."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    def __enter__(self):
+        self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+
+def run_concurrency(base_url, path, levels, requests):
+    """
+    Load one page at increasing numbers of concurrent requests.
+
+    For every level, `requests` GETs are sent with that many in flight at
+    once. Besides latency and throughput, the peak RSS growth of the process
+    (which hosts the server) over its idle size is reported per in-flight
+    request, and errors (refused connections, 5xx responses) show where the
+    server stops keeping up.
+
+    Parameters:
+        base_url (str): The server's base URL.
+        path (str): The page to request.
+        levels (Sequence[int]): Concurrency levels to try.
+        requests (int): Requests per level.
+
+    Returns:
+        list[dict]: One summary per level (see `summarize`), plus error and memory figures.
+    """
+    route = Route(path, None, 'GET', path)
+    results = []
+    for level in levels:
+        idle = rss_bytes()
+        with PeakRss() as peak, ThreadPoolExecutor(max_workers=level) as pool:
+            started = time.perf_counter()
+            samples = list(pool.map(lambda _: _safe_http_request(base_url, route), range(max(requests, level))))
+            elapsed = time.perf_counter() - started
+        ok = [sample for sample in samples if sample is not None]
+        row = summarize(
+            [latency for latency, _status, _queries in ok] or [0.0], [], elapsed,
+            [status for _latency, status, _queries in ok],
+        )
+        row.update({
+            'concurrency': level,
+            'errors': len(samples) - len(ok) + sum(1 for _latency, status, _queries in ok if status >= 500),
+            'peak_rss_mb': round(peak.peak / 2**20, 1),
+            'kb_per_in_flight_request': round(max(peak.peak - idle, 0) / 1024 / level, 1),
+        })
+        results.append(row)
+    return results
+
+
+def _safe_http_request(base_url, route):
+    try:
+        return _http_request(base_url, route, '', cold=False)
+    except OSError:
+        return None
+
+
+def free_port():
+    """Return a local TCP port that is free at the time of the call."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_process_server(command, env, base_url, timeout=30):
+    """
+    Start a server in a child process and wait until it answers HTTP requests.
+
+    Parameters:
+        command (list[str]): The command line of the server.
+        env (dict): Its environment.
+        base_url (str): The URL the server listens on.
+        timeout (float): Seconds to wait for the first response.
+
+    Raises:
+        RuntimeError: If the server exits or does not answer in time.
+
+    Returns:
+        subprocess.Popen: The running server; stop it with `stop_process_server`.
+    """
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{command[0]} exited with {process.returncode}:\n{process.stderr.read()}')
+        try:
+            with urllib.request.urlopen(base_url + '/', timeout=1) as response:
+                response.read()
+            return process
+        except urllib.error.HTTPError:
+            return process
+        except OSError:
+            time.sleep(0.1)
+    stop_process_server(process)
+    raise RuntimeError(f'{" ".join(command)} did not answer within {timeout}s')
+
+
+def stop_process_server(process):
+    """Stop a server started by `start_process_server`, and its workers."""
+    if os.name == 'posix':
+        process.send_signal(signal.SIGINT)  # Quick shutdown for gunicorn and runserver alike.
+    else:
+        process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    process.stderr.close()
+
+
+def run_load(base_url, path, concurrency, requests, headers=None):
+    """
+    Send `requests` GETs for one path with `concurrency` of them in flight at once.
+
+    Parameters:
+        base_url (str): The server's base URL.
+        path (str): The path to request.
+        concurrency (int): Requests in flight at once.
+        requests (int): Requests to send.
+        headers (dict): Extra request headers, e.g. Accept-Encoding.
+
+    Returns:
+        dict: The summary (see `summarize`) plus errors and the mean response body size in bytes.
+    """
+    def fetch(_):
+        request = urllib.request.Request(base_url + path, headers=headers or {})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                size = len(response.read())
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            size, status = len(exc.read()), exc.code
+        except OSError:
+            return None
+        return time.perf_counter() - start, status, size
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        samples = list(pool.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - started
+    ok = [sample for sample in samples if sample is not None]
+    row = summarize(
+        [latency for latency, _status, _size in ok] or [0.0], [], elapsed, [status for _latency, status, _size in ok],
+    )
+    row.update({
+        'concurrency': concurrency,
+        'errors': len(samples) - len(ok) + sum(1 for _latency, status, _size in ok if status >= 500),
+        'bytes_per_response': round(sum(size for _latency, _status, size in ok) / len(ok)) if ok else 0,
+    })
+    return row
+
+
+def template_cases():
+    """
+    Return the page templates to render, each with a factory for the context its view passes.
+
+    Querysets are left lazy where the view leaves them lazy, so the queries run
+    while rendering, as they do in the view. Contexts address rows of the seeded
+    database.
+
+    Returns:
+        dict[str, Callable[[], dict]]: Context factories by template name.
+    """
+    ingredient = Ingredient.objects.order_by('pk').first()
+    flavor = FlavorSeason.objects.order_by('pk').first()
+    limit = getattr(settings, 'ANALYTICS_TOP_LIMIT', 10)
+
+    def ingredient_page():
+        page = keyset_paginate(
+            Ingredient.objects.only('pk', 'name', 'stock', 'unit'),
+            page_size=getattr(settings, 'INGREDIENT_PAGE_SIZE', 50),
+        )
+        return {'ingredients': page.items, 'page': page}
+
+    return {
+        'home.html': dict,
+        'about.html': dict,
+        'contact.html': lambda: {'form': InquiryForm()},
+        'ingredient.html': ingredient_page,
+        'ingredient_stream.html': dict,
+        'ingredient_form.html': lambda: {'form': IngredientForm(instance=ingredient)},
+        'ingredient_delete.html': lambda: {'ingredient': ingredient},
+        'ingredient_import.html': lambda: {'form': IngredientImportForm(), 'result': None},
+        'customer_suggestion.html': lambda: {'form': SuggestionForm()},
+        'suggestion_success.html': dict,
+        'season_flavor.html': lambda: {'flavors': FlavorSeason.objects.current().sorted_by_name()},
+        'allergy_concern.html': lambda: {'form': AllergyForm()},
+        'allergy_sucess.html': dict,
+        'analytics.html': lambda: {
+            'flavors': analytics.top_flavors(limit),
+            'ingredients': analytics.top_ingredients(limit),
+            'allergens': analytics.top_allergens(limit),
+            'activity': analytics.daily_activity(30),
+            'days': 30,
+        },
+        'add_seasonal_flavor.html': lambda: {'form': SeasonalFlavorForm()},
+        'update_seasonal_flavour.html': lambda: {'form': SeasonalFlavorForm(instance=flavor)},
+        'confirm_delete.html': lambda: {'flavor': flavor},
+    }
+
+
+def template_engine(cached):
+    """
+    Return a copy of the project's template engine with or without the cached loader.
+
+    Parameters:
+        cached (bool): Whether compiled templates are kept between renders.
+
+    Returns:
+        Engine: The engine, with the project's context processors and libraries.
+    """
+    project = engines.all()[0].engine
+    loaders = settings.TEMPLATE_LOADERS
+    return Engine(
+        dirs=project.dirs,
+        context_processors=project.context_processors,
+        libraries=project.libraries,
+        loaders=[('django.template.loaders.cached.Loader', loaders)] if cached else loaders,
+    )
+
+
+def time_template(engine, name, make_context, renders, fragments=True):
+    """
+    Load and render one template `renders` times, as a view would for each request.
+
+    Parameters:
+        engine (Engine): The template engine, see `template_engine`.
+        name (str): The template name.
+        make_context (Callable[[], dict]): Builds a fresh context for every render.
+        renders (int): Number of renders.
+        fragments (bool): Whether ``{% cache %}`` fragments are stored; without, every
+                          fragment is rendered again, as on a cold cache.
+
+    Returns:
+        dict: ``render_us`` (mean time per render in microseconds, template loading
+              included) and ``queries`` (mean queries per render).
+    """
+    request = RequestFactory().get('/')
+    counter = QueryCounter()
+    elapsed = 0.0
+    timeout = getattr(settings, 'TEMPLATE_FRAGMENT_TIMEOUT', 3600) if fragments else 0
+    with override_settings(TEMPLATE_FRAGMENT_TIMEOUT=timeout), connection.execute_wrapper(counter):
+        for _ in range(renders):
+            context = RequestContext(request, make_context())
+            started = time.perf_counter()
+            engine.get_template(name).render(context)
+            elapsed += time.perf_counter() - started
+    return {'render_us': round(elapsed / renders * 1e6, 1), 'queries': counter.count / renders}
+
+
+def run_templates(names, renders):
+    """
+    Measure the rendering cost of each template before and after loader and fragment caching.
+
+    Three setups are timed per template:
+
+    - uncached: every render reads and compiles the template (and everything it
+      extends and includes) again and renders every fragment;
+    - cached_loader: compiled templates are reused, fragments are still rendered;
+    - fragments: compiled templates are reused and cached fragments are served
+      from the cache (after one warm-up render).
+
+    Parameters:
+        names (Iterable[str]): Templates to measure, keys of `template_cases`.
+        renders (int): Renders per template and setup.
+
+    Returns:
+        dict[str, dict[str, dict]]: `time_template` results by template and setup.
+    """
+    cases = template_cases()
+    uncached, cached = template_engine(cached=False), template_engine(cached=True)
+    results = {}
+    for name in names:
+        make_context = cases[name]
+        cache.clear()
+        results[name] = {'uncached': time_template(uncached, name, make_context, renders, fragments=False)}
+        results[name]['cached_loader'] = time_template(cached, name, make_context, renders, fragments=False)
+        time_template(cached, name, make_context, 1)
+        results[name]['fragments'] = time_template(cached, name, make_context, renders)
+    return results
+
+
+def run_fanout(subscribers, count):
+    """
+    Measure how long one batch of changes takes to reach every connected live update client.
+
+    `subscribers` subscriptions are opened on an event loop, as the SSE view
+    does for each client. Batches are published from another thread, as the
+    process's RowChange poller does, and timed until every subscription has
+    received and dequeued the batch. The poll itself, one indexed query per
+    EVENTS_POLL_INTERVAL per process whatever the number of clients, is not
+    included.
+
+    Parameters:
+        subscribers (int): Connected clients.
+        count (int): Batches to publish.
+
+    Returns:
+        dict: Delivery latency percentiles in milliseconds, the mean cost per
+              client in microseconds and the events per second.
+    """
+    class Unpolled(events.Broadcaster):
+        def _ensure_polling(self):
+            pass
+
+    async def measure():
+        broadcaster = Unpolled(queue_size=2)
+        subscriptions = [broadcaster.subscribe() for _ in range(subscribers)]
+        latencies = []
+        for number in range(count):
+            batch = events.Batch(number, number + 1, [
+                events.Event(events.INGREDIENTS, {'changed': [{'id': number}], 'deleted': []}),
+            ])
+            started = time.perf_counter()
+            await asyncio.to_thread(broadcaster.publish, batch)
+            while subscriptions[-1].queue.empty():
+                await asyncio.sleep(0)
+            for subscription in subscriptions:
+                subscription.queue.get_nowait()
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    started = time.perf_counter()
+    latencies = sorted(asyncio.run(measure()))
+    elapsed = time.perf_counter() - started
+    return {
+        'subscribers': subscribers,
+        'events': count,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'us_per_client': round(sum(latencies) / count / subscribers * 1e6, 3),
+        'events_per_second': round(count / elapsed, 1),
+    }
@@ -0,0 +1,294 @@
+import codecs
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache
+from .models import Ingredient, StockMovement
+from .units import GRAMS, from_base, to_base
+
+FORMATS = ('csv', 'jsonl')
+EXPORT_FIELDS = ('name', 'stock', 'unit')
+REQUIRED_COLUMNS = ('name', 'stock')
+
+
+class ImportResult:
+    """
+    Outcome of a bulk ingredient import.
+
+    Attributes:
+        rows (int): The number of input rows read.
+        imported (int): The number of rows written (created or updated).
+        errors (list[tuple[int, str]]): (line number, message) for every rejected row.
+        elapsed (float): Wall-clock seconds spent on the import.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        """Return the import throughput in input rows per second."""
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def guess_format(filename, default='csv'):
+    """Return the import format implied by a file name's extension."""
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return default
+
+
+def decode_lines(lines, encoding='utf-8-sig'):
+    """
+    Decode binary lines one at a time.
+
+    Unlike a TextIOWrapper, which decodes whole blocks, an undecodable byte
+    raises at the line it is on, after every line before it was read. The
+    default encoding drops the byte order mark that spreadsheet programs write
+    at the start of a "CSV UTF-8" file, which would otherwise become part of
+    the first column name.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for line in lines:
+        yield decoder.decode(line)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def _decoded(lines, failures):
+    """Yield `lines` until one cannot be decoded, appending that UnicodeDecodeError to `failures`."""
+    try:
+        yield from lines
+    except UnicodeDecodeError as exc:
+        failures.append(exc)
+
+
+def _decode_error(failures):
+    return ValueError(f'the file is not valid UTF-8 ({failures[0].reason}); the rest of it was not read.')
+
+
+def iter_records(lines, fmt):
+    """
+    Parse an iterable of text lines into (line number, record) pairs.
+
+    CSV input must have a header row naming at least the `name` and `stock`
+    columns, and may have a `unit` column; JSON Lines input has one object per
+    line with the same keys. Stock is given in grams or units, as displayed. A
+    CSV header without the required columns is reported once, as an exception
+    for line 1, and no rows are read. Other lines that cannot be parsed are
+    yielded with an exception instead of a record. Input that stops
+    decoding (a file that is not UTF-8, see `decode_lines`) ends with an
+    exception for the first line not read, after the records read before it.
+
+    Parameters:
+        lines (Iterable[str]): The input lines.
+        fmt (str): Either 'csv' or 'jsonl'.
+
+    Yields:
+        tuple[int, dict | Exception]: The line number and the parsed record.
+    """
+    failures = []
+    if fmt == 'csv':
+        reader = csv.DictReader(_decoded(lines, failures))
+        # An empty file has no header (None), and no rows to report either.
+        missing = [name for name in REQUIRED_COLUMNS if reader.fieldnames and name not in reader.fieldnames]
+        if missing:
+            yield 1, ValueError(
+                f"the header has no {' or '.join(missing)} column; no rows were read. "
+                f"Found: {', '.join(reader.fieldnames)}."
+            )
+            return
+        for record in reader:
+            yield reader.line_num, record
+        number = reader.line_num
+    elif fmt == 'jsonl':
+        number = 0
+        for number, line in enumerate(_decoded(lines, failures), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+                continue
+            if not isinstance(record, dict):
+                record = ValueError('expected a JSON object')
+            yield number, record
+    else:
+        raise ValueError(f'Unknown format {fmt!r}; expected one of {", ".join(FORMATS)}')
+    if failures:
+        yield number + 1, _decode_error(failures)
+
+
+def clean_record(record):
+    """
+    Validate one input record against the Ingredient field definitions.
+
+    No database queries are made; uniqueness of `name` is handled by the upsert
+    and the stock is converted to base units once the unit is known.
+
+    Parameters:
+        record (dict): The raw record.
+
+    Returns:
+        tuple[str, Decimal, str | None]: The cleaned name, stock in grams or
+        units, and unit (None when the record does not give one).
+
+    Raises:
+        ValidationError: If a field is missing or invalid.
+    """
+    values = {}
+    for field_name in EXPORT_FIELDS:
+        value = record.get(field_name)
+        values[field_name] = value.strip() if isinstance(value, str) else value
+    # JSON may give any type; text fields must not be silently stringified.
+    for field_name in ('name', 'unit'):
+        if values[field_name] is not None and not isinstance(values[field_name], str):
+            raise ValidationError(f"{field_name}: expected text, not {type(values[field_name]).__name__}.")
+
+    try:
+        name = Ingredient._meta.get_field('name').clean(values['name'], None)
+    except ValidationError as exc:
+        raise ValidationError(f"name: {' '.join(exc.messages)}")
+    unit = None
+    if values['unit'] not in (None, ''):
+        try:
+            unit = Ingredient._meta.get_field('unit').clean(values['unit'], None)
+        except ValidationError as exc:
+            raise ValidationError(f"unit: {' '.join(exc.messages)}")
+    try:
+        stock = Decimal(str(values['stock']))
+    except InvalidOperation:
+        raise ValidationError(f"stock: {values['stock']!r} is not a number.")
+    if not stock.is_finite() or stock < 0:
+        raise ValidationError(f"stock: {values['stock']!r} must be zero or more.")
+    return name, stock, unit
+
+
+def import_ingredients(lines, fmt='csv', batch_size=1000):
+    """
+    Upsert ingredients from CSV or JSON Lines input in batched transactions.
+
+    Input is consumed in chunks of `batch_size` rows, so memory use does not grow
+    with the size of the feed. Each chunk is written with one
+    ``INSERT ... ON CONFLICT(name) DO UPDATE`` inside its own transaction, together
+    with the matching StockMovement ledger entries; invalid rows are reported in
+    the result and skipped without aborting their batch.
+
+    Parameters:
+        lines (Iterable[str]): The input lines.
+        fmt (str): Either 'csv' or 'jsonl'.
+        batch_size (int): The number of rows per batch and transaction.
+
+    Returns:
+        ImportResult: Row counts, throughput and per-row errors.
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    records = iter_records(lines, fmt)
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+        result.rows += len(chunk)
+        parsed = {}
+        for line, record in chunk:
+            if isinstance(record, Exception):
+                result.errors.append((line, str(record)))
+                continue
+            try:
+                name, stock, unit = clean_record(record)
+            except ValidationError as exc:
+                result.errors.append((line, ' '.join(exc.messages)))
+                continue
+            # A later row for the same name in the batch wins, as it would if applied in order.
+            parsed[name] = (line, stock, unit)
+        if not parsed:
+            continue
+
+        now = timezone.now()
+        with transaction.atomic():
+            previous = {
+                name: (stock, unit)
+                for name, stock, unit in Ingredient.objects.filter(name__in=parsed).values_list('name', 'stock', 'unit')
+            }
+            batch = {}
+            deltas = {}
+            for name, (line, stock, unit) in parsed.items():
+                existing_stock, existing_unit = previous.get(name, (0, None))
+                if unit and existing_unit and unit != existing_unit:
+                    result.errors.append((line, f"unit: {name} is measured in {existing_unit!r}, not {unit!r}."))
+                    continue
+                unit = existing_unit or unit or GRAMS
+                try:
+                    base = to_base(stock, unit)
+                except ValueError as exc:
+                    result.errors.append((line, f"stock: {exc}"))
+                    continue
+                batch[name] = Ingredient(name=name, stock=base, unit=unit, updated_at=now)
+                deltas[name] = base - existing_stock
+            if not batch:
+                continue
+            Ingredient.objects.bulk_create(
+                batch.values(),
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=['stock', 'updated_at'],
+            )
+            # Record the change of each row in the stock ledger.
+            ids = dict(Ingredient.objects.filter(name__in=batch).values_list('name', 'pk'))
+            StockMovement.objects.bulk_create(
+                StockMovement(ingredient_id=ids[name], delta=delta, reason='import')
+                for name, delta in deltas.items()
+                if delta
+            )
+        result.imported += len(batch)
+    result.elapsed = time.perf_counter() - started
+    if result.imported:
+        # bulk_create sends no post_save signals.
+        cache.bump_version(cache.INGREDIENTS)
+    return result
+
+
+class _Echo:
+    """A file-like object whose write() returns the written value, for streaming csv.writer output."""
+    def write(self, value):
+        return value
+
+
+def export_ingredients(fmt='csv', chunk_size=2000):
+    """
+    Yield the ingredient table as CSV or JSON Lines text, one row at a time.
+
+    Rows are read with a server-side iterator over `values_list()`, so the full
+    table is never held in memory.
+
+    Parameters:
+        fmt (str): Either 'csv' or 'jsonl'.
+        chunk_size (int): The number of rows fetched from the database at a time.
+
+    Yields:
+        str: Lines of output, including the CSV header row.
+    """
+    rows = Ingredient.objects.order_by('name').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    rows = ((name, f'{from_base(stock, unit):f}', unit) for name, stock, unit in rows)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    elif fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n'
+    else:
+        raise ValueError(f'Unknown format {fmt!r}; expected one of {", ".join(FORMATS)}')
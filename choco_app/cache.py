@@ -0,0 +1,215 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.encoding import iri_to_uri
+from django.views.decorators.http import condition
+
+# Cache groups. Each group has a version counter that is bumped whenever data
+# feeding the pages in that group changes; page keys embed the counters, so a
+# bump makes every affected page miss while unrelated pages stay cached.
+# Versions are nanosecond timestamps of the last change, which also makes them
+# usable as Last-Modified values for conditional GET.
+INGREDIENTS = 'ingredients'
+FLAVORS = 'flavors'
+ALLERGENS = 'allergens'
+RECIPES = 'recipes'
+GROUPS = (INGREDIENTS, FLAVORS, ALLERGENS, RECIPES)
+
+
+def _version_key(group):
+    return f'version:{group}'
+
+
+def get_version(group):
+    """
+    Return the current version counter of a cache group.
+
+    A missing counter (first use, or evicted) is seeded from the clock rather
+    than restarting at 1, so a reseeded counter can never match a version that
+    older cached pages were stored under. A cache that stores nothing (such as
+    DummyCache) gets the current time, which never matches a cached page.
+
+    Parameters:
+        group (str): The cache group name.
+
+    Returns:
+        int: The current version.
+    """
+    key = _version_key(group)
+    version = cache.get(key)
+    if version is None:
+        seed = time.time_ns()
+        cache.add(key, seed, timeout=None)
+        version = cache.get(key, seed)
+    return version
+
+
+async def aget_version(group):
+    """Async variant of `get_version`, for use from async views."""
+    key = _version_key(group)
+    version = await cache.aget(key)
+    if version is None:
+        seed = time.time_ns()
+        await cache.aadd(key, seed, timeout=None)
+        version = await cache.aget(key, seed)
+    return version
+
+
+async def prefetch_versions(request, groups):
+    """
+    Read the versions of `groups` asynchronously and remember them on the request.
+
+    `page_cache_key` and the conditional GET headers then use the remembered
+    values, so the decorators below do no blocking cache I/O around async views.
+    """
+    versions = getattr(request, '_cache_versions', {})
+    for group in groups:
+        if group not in versions:
+            versions[group] = await aget_version(group)
+    request._cache_versions = versions
+
+
+def _request_version(request, group):
+    versions = getattr(request, '_cache_versions', None)
+    if versions is not None and group in versions:
+        return versions[group]
+    return get_version(group)
+
+
+def bump_version(group):
+    """
+    Invalidate every cached page in a group by advancing its version counter.
+
+    Parameters:
+        group (str): The cache group name.
+
+    Returns:
+        int: The new version.
+    """
+    key = _version_key(group)
+    version = max(time.time_ns(), (cache.get(key) or 0) + 1)
+    cache.set(key, version, timeout=None)
+    return version
+
+
+def version_datetime(version):
+    """Return the UTC datetime of a version counter, truncated to whole seconds."""
+    return datetime.fromtimestamp(version // 1_000_000_000, tz=dt_timezone.utc)
+
+
+def page_cache_key(request, groups=(), params=(), daily=False):
+    """
+    Build the cache key for a page from its path, selected query parameters and group versions.
+
+    Parameters:
+        request (HttpRequest): The request object.
+        groups (Sequence[str]): Cache groups whose data the page renders.
+        params (Sequence[str]): Query parameters that change the page content; others are ignored.
+        daily (bool): Whether the page depends on today's date.
+
+    Returns:
+        str: The cache key.
+    """
+    query = '&'.join(f'{name}={request.GET.get(name, "")}' for name in sorted(params))
+    versions = '.'.join(str(_request_version(request, group)) for group in groups)
+    if daily:
+        versions += f':{timezone.localdate().isoformat()}'
+    return f'page:{iri_to_uri(request.path)}?{query}:{versions}'
+
+
+def cache_page_for(*groups, params=(), daily=False, timeout=None):
+    """
+    Cache a view's rendered response, invalidated by the given cache groups.
+
+    Only successful, non-streaming GET/HEAD responses that set no cookies are
+    cached. Query parameters other than `params` do not produce separate entries.
+    Async views are supported and use the cache's async API.
+
+    Parameters:
+        *groups (str): Cache groups whose data the page renders.
+        params (Sequence[str]): Query parameters that change the page content.
+        daily (bool): Whether the page depends on today's date and must roll over at midnight.
+        timeout (int): Cache lifetime in seconds; defaults to the PAGE_CACHE_TIMEOUT setting.
+    """
+    def cacheable(response):
+        return response.status_code == 200 and not response.streaming and not response.cookies
+
+    def lifetime():
+        return timeout if timeout is not None else getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view_func(request, *args, **kwargs)
+                await prefetch_versions(request, groups)
+                key = page_cache_key(request, groups, params, daily)
+                response = await cache.aget(key)
+                if response is not None:
+                    return response
+                response = await view_func(request, *args, **kwargs)
+                if cacheable(response):
+                    await cache.aset(key, response, lifetime())
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            key = page_cache_key(request, groups, params, daily)
+            response = cache.get(key)
+            if response is not None:
+                return response
+            response = view_func(request, *args, **kwargs)
+            if cacheable(response):
+                cache.set(key, response, lifetime())
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(*groups, params=(), daily=False):
+    """
+    Answer conditional GETs for a page from its cache group versions alone.
+
+    The ETag and Last-Modified headers are derived from the version counters,
+    so a client revalidating an unchanged page gets a 304 without the view
+    running its queries or rendering its template.
+
+    Parameters:
+        *groups (str): Cache groups whose data the page renders.
+        params (Sequence[str]): Query parameters that change the page content.
+        daily (bool): Whether the page depends on today's date.
+    """
+    def etag(request, *args, **kwargs):
+        return hashlib.md5(page_cache_key(request, groups, params, daily).encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        modified = version_datetime(max(_request_version(request, group) for group in groups))
+        if daily:
+            midnight = datetime.combine(timezone.localdate(), datetime.min.time(), tzinfo=timezone.get_current_timezone())
+            modified = max(modified, midnight)
+        return modified
+
+    conditional = condition(etag_func=etag, last_modified_func=last_modified)
+
+    def decorator(view_func):
+        view = conditional(view_func)
+        if not iscoroutinefunction(view_func):
+            return view
+
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            # condition() computes the headers synchronously; read the versions first.
+            await prefetch_versions(request, groups)
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+    return decorator
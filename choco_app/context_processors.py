@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.utils import timezone
+
+from . import cache
+
+
+class CacheVersions:
+    """
+    The version counters of the cache groups, read lazily for ``{% cache %}`` fragment keys.
+
+    ``cache_versions.ingredients`` in a template is the current INGREDIENTS
+    version, so a fragment keyed on it is re-rendered after any ingredient
+    change, like the cached pages of that group. ``cache_versions.today`` is
+    today's date, for fragments that must roll over at midnight. Each counter
+    is read at most once per request; versions prefetched by an async view are
+    reused without any cache I/O.
+    """
+    def __init__(self, request):
+        self.request = request
+        self.versions = {}
+
+    def __getitem__(self, group):
+        if group == 'today':
+            return timezone.localdate().isoformat()
+        if group not in cache.GROUPS:
+            raise KeyError(group)
+        if group not in self.versions:
+            self.versions[group] = cache._request_version(self.request, group)
+        return self.versions[group]
+
+
+def fragment_cache(request):
+    """
+    Add what ``{% cache %}`` fragments need to every RequestContext.
+
+    Returns:
+        dict: ``cache_versions`` (a `CacheVersions`) and ``fragment_timeout``,
+              the TEMPLATE_FRAGMENT_TIMEOUT setting.
+    """
+    return {
+        'cache_versions': CacheVersions(request),
+        'fragment_timeout': getattr(settings, 'TEMPLATE_FRAGMENT_TIMEOUT', 3600),
+    }
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections
+
+from . import api
+from .models import RowChange
+
+logger = logging.getLogger(__name__)
+
+# Event topics. Every event carries ``{"changed": [row, ...], "deleted": [id, ...]}``
+# with the rows as they are now (see TOPIC_FIELDS).
+INGREDIENTS = 'ingredients'
+FLAVORS = 'flavors'
+TOPICS = (INGREDIENTS, FLAVORS)
+
+# The fields sent for the rows of each topic, which are published by the JSON API (choco_app/api.py).
+TOPIC_FIELDS = {
+    INGREDIENTS: ['id', 'name', 'stock', 'unit'],
+    FLAVORS: ['id', 'name', 'available_from', 'available_to', 'is_active'],
+}
+
+# Sent to a client that missed events (it fell behind, or reconnected after too
+# many changes); it should reload what it displays.
+RESET = 'reset'
+
+Event = namedtuple('Event', ['topic', 'data'])
+
+# The changes recorded in RowChange after version `since`, up to and including `version`.
+Batch = namedtuple('Batch', ['since', 'version', 'events'])
+
+
+def read_changes(since, limit):
+    """
+    Return the changes to the rows of every topic after RowChange version `since`.
+
+    RowChange keeps the latest change of each row, so a row changed several
+    times is sent once, as it is now; rows that no longer exist are deleted.
+
+    Parameters:
+        since (int): The last version already sent.
+        limit (int): The most changed rows to read.
+
+    Returns:
+        tuple[Batch, bool]: The changes, one event per topic with changes, and
+        whether more changes are waiting after the batch.
+    """
+    topics = {api.RESOURCES[topic].table: topic for topic in TOPICS}
+    entries = list(
+        RowChange.objects.filter(table_name__in=topics, version__gt=since).order_by('version')
+        .values_list('version', 'table_name', 'row_id')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return Batch(since, since, []), False
+    events = []
+    for table, topic in topics.items():
+        ids = [row_id for _version, table_name, row_id in entries if table_name == table]
+        if ids:
+            rows = api.RESOURCES[topic].fetch(ids, TOPIC_FIELDS[topic])
+            events.append(Event(topic, {
+                'changed': [rows[row_id] for row_id in ids if row_id in rows],
+                'deleted': [row_id for row_id in ids if row_id not in rows],
+            }))
+    return Batch(since, entries[-1][0], events), has_more
+
+
+class Subscription:
+    """
+    The batches waiting to be sent to one connected client.
+
+    Lives on the event loop serving the client; only that loop touches the queue.
+
+    Attributes:
+        queue (asyncio.Queue): Batches not yet sent.
+        lost (bool): Set when batches had to be dropped because the queue was full.
+    """
+    def __init__(self, loop, size):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=size)
+        self.lost = False
+
+    def put(self, batch):
+        """Queue `batch`; a full queue marks the subscription lost."""
+        try:
+            self.queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.lost = True
+
+    def drain(self):
+        """Discard every queued batch, after a reset has been sent instead."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.lost = False
+
+
+class Broadcaster:
+    """
+    Fan-out of the writes of every process to the live update clients of this process.
+
+    Writes are not announced in-process: database triggers record every write
+    to a published table in RowChange (see migration 0014_row_changes),
+    whichever process, code path or raw SQL made it. While clients are
+    connected, one thread per process polls that log every `interval` seconds,
+    one indexed query however many clients there are, and hands each new batch
+    to every event loop with one `call_soon_threadsafe`. Event ids are RowChange
+    versions, shared by all processes, so a client reconnecting to any worker
+    resumes from its Last-Event-ID (see `stream`).
+    """
+    def __init__(self, interval=0.5, queue_size=100, batch_size=1000):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._subscriptions = {}
+        self._thread = None
+        self._version = None
+
+    def position(self):
+        """Return the RowChange version up to which changes have been sent; later ones are still to come."""
+        with self._poll_lock:
+            if self._version is None:
+                self._version = api.current_version()
+            return self._version
+
+    def poll(self):
+        """Send the changes committed since the last poll to every subscription."""
+        with self._poll_lock:
+            if self._version is None:
+                self._version = api.current_version()
+            has_more = True
+            while has_more:
+                batch, has_more = read_changes(self._version, self.batch_size)
+                if batch.version == self._version:
+                    return
+                self._version = batch.version
+                self.publish(batch)
+
+    def publish(self, batch):
+        """Queue `batch` on every subscription, with one call per event loop."""
+        with self._lock:
+            targets = [(loop, list(subscriptions)) for loop, subscriptions in self._subscriptions.items()]
+        for loop, subscriptions in targets:
+            try:
+                loop.call_soon_threadsafe(self._deliver, subscriptions, batch)
+            except RuntimeError:
+                pass  # The loop was closed; its subscriptions are gone with it.
+
+    @staticmethod
+    def _deliver(subscriptions, batch):
+        for subscription in subscriptions:
+            subscription.put(batch)
+
+    def subscribe(self):
+        """Register a client on the running event loop and make sure the log is being polled."""
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(subscription.loop, set()).add(subscription)
+        self._ensure_polling()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription once its client has gone."""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.loop)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.loop]
+
+    def subscriber_count(self):
+        """Return the number of connected clients."""
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def _ensure_polling(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-events', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscriptions:
+                        self._thread = None
+                        with self._poll_lock:
+                            # Clients arriving later start from the changes made after they connect.
+                            self._version = None
+                        return
+                try:
+                    self.poll()
+                except DatabaseError:
+                    logger.exception('Polling the row change log failed; retrying.')
+                time.sleep(self.interval)
+        finally:
+            connections.close_all()
+
+
+broadcaster = Broadcaster(
+    interval=getattr(settings, 'EVENTS_POLL_INTERVAL', 0.5),
+    queue_size=getattr(settings, 'EVENTS_QUEUE_SIZE', 100),
+)
+
+
+def format_batch(batch, topics):
+    """
+    Return the events of `batch` on `topics` in the text/event-stream wire format.
+
+    The id is sent once, with the last event (alone if the batch has no events
+    on `topics`), so a client that disconnects mid-batch resumes before it.
+    """
+    frames = [
+        f"event: {event.topic}\ndata: {json.dumps(event.data, cls=DjangoJSONEncoder, separators=(',', ':'))}\n\n"
+        for event in batch.events if event.topic in topics
+    ] or ['\n']
+    frames[-1] = f'id: {batch.version}\n' + frames[-1]
+    return ''.join(frames)
+
+
+async def stream(topics, last_event_id=None, heartbeat=15, retry=3000, replay_limit=1000):
+    """
+    Yield the Server-Sent Events stream of one client until it disconnects.
+
+    A reconnecting client (`last_event_id`) is first sent the changes it missed,
+    read from RowChange, or a "reset" event if there are more than
+    `replay_limit`. A comment line is sent every `heartbeat` seconds without
+    events, so proxies keep the connection open and dead clients are noticed.
+
+    Parameters:
+        topics (Iterable[str]): The topics to receive.
+        last_event_id (int): The Last-Event-ID sent by a reconnecting client.
+        heartbeat (float): Seconds of silence before a keepalive comment.
+        retry (int): Milliseconds the browser waits before reconnecting.
+        replay_limit (int): The most missed changes replayed before a reset.
+    """
+    topics = frozenset(topics)
+    subscription = broadcaster.subscribe()
+    try:
+        # Every change after this version reaches the subscription.
+        version = await sync_to_async(broadcaster.position)()
+        yield f'retry: {retry}\n\n'
+        if last_event_id is not None:
+            missed, has_more = None, True
+            if last_event_id <= version:
+                missed, has_more = await sync_to_async(read_changes)(last_event_id, replay_limit)
+            if has_more:
+                yield f'id: {version}\nevent: {RESET}\ndata: {{}}\n\n'
+            else:
+                version = max(version, missed.version)
+                yield format_batch(missed, topics)
+        else:
+            yield f'id: {version}\n\n'
+        while True:
+            if subscription.lost:
+                subscription.drain()
+                version = await sync_to_async(broadcaster.position)()
+                yield f'id: {version}\nevent: {RESET}\ndata: {{}}\n\n'
+            try:
+                batch = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if batch.version > version:
+                version = batch.version
+                yield format_batch(batch, topics)
+    finally:
+        broadcaster.unsubscribe(subscription)
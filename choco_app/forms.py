@@ -1,5 +1,45 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from .models import CustomerSuggestion, Ingredient, AllergyIssue, Inquiry, FlavorSeason
+from .bulk import FORMATS
+from .units import MAX_QUANTITY, format_quantity, to_base
+from .widgets import CatalogueSelectMultiple, LookupSelect
+
+class ModelIdsField(forms.ModelMultipleChoiceField):
+    """
+    A multiple choice of model rows, submitted and cleaned as a list of primary keys.
+
+    The submitted keys are checked with a single ``pk__in`` query that reads the
+    keys alone, instead of loading the chosen model instances; the field's
+    choices are never iterated. A key the primary key field cannot hold (such as
+    one beyond its integer range) is reported as an invalid value before that
+    query. Duplicates are dropped, keeping the submitted order.
+    """
+    def clean(self, value):
+        value = self.prepare_value(value)
+        if not value:
+            if self.required:
+                raise ValidationError(self.error_messages['required'], code='required')
+            return []
+        if not isinstance(value, (list, tuple)):
+            raise ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        pk_field = self.queryset.model._meta.pk
+        ids = []
+        for pk in value:
+            try:
+                ids.append(pk_field.to_python(pk))
+                pk_field.run_validators(ids[-1])
+            except ValidationError:
+                raise ValidationError(self.error_messages['invalid_pk_value'], code='invalid_pk_value', params={'pk': pk})
+        ids = list(dict.fromkeys(ids))
+        found = set(self.queryset.filter(pk__in=ids).values_list('pk', flat=True))
+        for pk in ids:
+            if pk not in found:
+                raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': pk})
+        self.run_validators(ids)
+        return ids
+
 
 class SuggestionForm(forms.ModelForm):
     """
@@ -7,6 +47,8 @@ class SuggestionForm(forms.ModelForm):
 
     This form is based on the CustomerSuggestion model and includes fields for the customer's name,
     email, suggested flavor, reason for the suggestion, and any ingredients associated with the suggestion.
+    Ingredients are picked from a search box over the `ingredient_catalogue` endpoint, so the page never
+    lists the whole ingredient table, and are validated with one query on their ids.
 
     Attributes:
         Meta (class): Contains metadata for the form including the model and fields to include.
@@ -14,17 +56,46 @@ class SuggestionForm(forms.ModelForm):
     class Meta:
         model = CustomerSuggestion  
         fields = ['customer_name', 'customer_email', 'suggested_flavor', 'suggestion_reason', 'ingredients']
+        field_classes = {
+            'ingredients': ModelIdsField,
+        }
         widgets = {
-            'ingredients': forms.CheckboxSelectMultiple(),  # Display ingredients as checkboxes
+            'ingredients': CatalogueSelectMultiple('ingredient_catalogue'),  # Searchable ingredient picker
         }
 
+    def save(self, commit=True):
+        """
+        Save the suggestion and its ingredients.
+
+        The ingredient links of a new suggestion are written with one bulk INSERT
+        through `add()`, skipping the diff against the current links that the
+        `set()` of a plain ModelForm reads first. The m2m_changed signals are
+        sent as usual.
+        """
+        adding = self.instance._state.adding
+        suggestion = super().save(commit=False)
+
+        def save_m2m():
+            if adding:
+                suggestion.ingredients.add(*self.cleaned_data['ingredients'])
+            else:
+                suggestion.ingredients.set(self.cleaned_data['ingredients'])
+
+        self.save_m2m = save_m2m
+        if commit:
+            suggestion.save()
+            save_m2m()
+        return suggestion
+
 
 class AllergyForm(forms.ModelForm):
     """
     A form for submitting allergy issues related to customer suggestions.
 
     This form is based on the AllergyIssue model and includes fields for selecting the customer suggestion,
-    the ingredient causing the allergy issue, and details about the allergy concern.
+    the ingredient causing the allergy issue, and details about the allergy concern. The customer suggestion
+    is picked through a search box backed by the `customer_suggestion_lookup` endpoint, so the page never
+    lists the whole suggestions table and validation is a single primary key lookup.
 
     Attributes:
         Meta (class): Contains metadata for the form including the model and fields to include.
@@ -33,7 +104,7 @@ class AllergyForm(forms.ModelForm):
         model = AllergyIssue 
         fields = ['customer_suggestion', 'ingredient', 'concern_detail']
         widgets = {
-            'customer_suggestion': forms.Select(),  # Dropdown for selecting customer suggestions
+            'customer_suggestion': LookupSelect('customer_suggestion_lookup'),  # Searchable customer suggestion picker
             'ingredient': forms.Select(),  # Dropdown for selecting ingredients
         }
 
@@ -57,14 +128,120 @@ class IngredientForm(forms.ModelForm):
     """
     A form for creating or updating ingredients.
 
-    This form is based on the Ingredient model and includes fields for the ingredient's name and stock quantity.
+    This form is based on the Ingredient model and includes fields for the ingredient's name, unit and
+    stock quantity. The stock is entered in grams or units and stored as whole milligrams or units; the
+    unit can only be chosen when the ingredient is created. When an existing ingredient is edited, the
+    stock is not overwritten: the difference between the submitted value and the value the user started
+    from is applied as a stock movement, so concurrent edits add up instead of the last writer winning.
 
     Attributes:
+        stock (DecimalField): The stock in grams (up to milligram precision) or whole units.
         Meta (class): Contains metadata for the form including the model and fields to include.
     """
+    stock = forms.DecimalField(min_value=0, decimal_places=3, help_text="grams (up to 3 decimals) or units")
+
     class Meta:
         model = Ingredient  
-        fields = ['name', 'stock']
+        fields = ['name', 'unit', 'stock']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Submit the stock value the user saw alongside the edited one.
+        self.fields['stock'].show_hidden_initial = True
+        if self.instance.pk:
+            self.initial['stock'] = self.instance.quantity
+            # Changing the unit would reinterpret the stock history.
+            self.fields['unit'].disabled = True
+
+    def clean(self):
+        """
+        Convert the entered stock to base units (milligrams or units) and, when an
+        existing ingredient is edited, work out the stock movement (`stock_delta`).
+        """
+        cleaned_data = super().clean()
+        self.stock_delta = 0
+        if cleaned_data.get('stock') is not None and cleaned_data.get('unit'):
+            try:
+                cleaned_data['stock'] = to_base(cleaned_data['stock'], cleaned_data['unit'])
+            except ValueError as exc:
+                self.add_error('stock', str(exc))
+            else:
+                if self.instance.pk and 'stock' in self.changed_data:
+                    self._clean_stock_delta(cleaned_data['stock'])
+        return cleaned_data
+
+    def _clean_stock_delta(self, stock):
+        field = self.fields['stock']
+        seen = field.hidden_widget().value_from_datadict(self.data, self.files, self.add_initial_prefix('stock'))
+        try:
+            delta = stock - to_base(field.clean(seen), self.instance.unit)
+        except (ValidationError, ValueError):
+            self.add_error('stock', 'The stock this edit started from is missing or invalid. Reload the page and try again.')
+            return
+        if self.instance.stock + delta < 0:
+            self.add_error('stock', (
+                f'This edit removes {format_quantity(-delta, self.instance.unit)}, '
+                f'but only {format_quantity(self.instance.stock, self.instance.unit)} is in stock.'
+            ))
+            return
+        self.stock_delta = delta
+
+    def save(self, commit=True):
+        """
+        Save the ingredient, applying a stock edit of an existing ingredient as a stock movement.
+
+        Raises:
+            InsufficientStock: If a concurrent movement left too little stock for this one.
+            StockLimitExceeded: If a concurrent movement left too much stock for this one.
+        """
+        if not commit or self.instance._state.adding:
+            return super().save(commit)
+        delta = self.stock_delta
+        with transaction.atomic():
+            self.instance.save(update_fields=['name', 'updated_at'])
+            if delta:
+                self.instance.stock = Ingredient.objects.adjust_stock(self.instance.pk, delta, 'manual edit')
+            else:
+                self.instance.refresh_from_db(fields=['stock'])
+        return self.instance
+
+
+class StockMovementForm(forms.Form):
+    """
+    A form describing one stock movement for an ingredient.
+
+    Attributes:
+        delta (IntegerField): The quantity to add to the stock in base units (milligrams or units);
+            negative to remove stock. Bounded to what the 64-bit stock column holds.
+        reason (CharField): Why the stock changed, e.g. "delivery" or "production".
+    """
+    delta = forms.IntegerField(min_value=-MAX_QUANTITY, max_value=MAX_QUANTITY)
+    reason = forms.CharField(max_length=200)
+
+
+class BatchStockMovementForm(StockMovementForm):
+    """
+    A stock movement within a batch, which also names the ingredient it applies to.
+
+    Attributes:
+        ingredient (IntegerField): The primary key of the ingredient.
+    """
+    ingredient = forms.IntegerField(min_value=1, max_value=MAX_QUANTITY)
+
+
+class IngredientImportForm(forms.Form):
+    """
+    A form for uploading a CSV or JSON Lines file of ingredients to create or update in bulk.
+
+    Attributes:
+        file (FileField): The uploaded feed.
+        format (ChoiceField): The feed format; guessed from the file name when left blank.
+    """
+    file = forms.FileField()
+    format = forms.ChoiceField(
+        choices=[('', 'Detect from file name')] + [(fmt, fmt.upper()) for fmt in FORMATS],
+        required=False,
+    )
 
 
 class SeasonalFlavorForm(forms.ModelForm):
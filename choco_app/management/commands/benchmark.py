@@ -0,0 +1,121 @@
+import json
+import platform
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from choco_app import benchmark
+
+RUNNERS = ('client', 'wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    """
+    Benchmark every choco_app route against a seeded throwaway database.
+
+    The database is a separate SQLite file (see `benchmark.seeded_database`),
+    so the development data is never touched. With --keepdb it is kept and
+    reused by later runs, which avoids reseeding the large scales.
+    """
+    help = "Seed synthetic data and report p50/p95/p99 latency, throughput and queries per route."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=benchmark.SCALES, default='1k',
+                            help='Rows of each model to seed (default 1k).')
+        parser.add_argument('--runner', action='append', choices=RUNNERS,
+                            help='How to send requests; repeat for several (default: client and wsgi). '
+                                 'asgi needs uvicorn.')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per route (default 50).')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Requests in flight at once for the server runners (default 1).')
+        parser.add_argument('--cold', action='store_true', help='Clear the page cache before every request.')
+        parser.add_argument('--route', action='append', help='Only benchmark routes with this label.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the seeded database for the next run.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', help='Compare against the JSON results of a previous run.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative p95 growth flagged as a regression by --compare (default 0.2).')
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        runners = options['runner'] or ['client', 'wsgi']
+        baseline = self.load_baseline(options['compare'])
+
+        with benchmark.seeded_database(scale, options['keepdb'], self.stdout):
+            # The benchmark must not pay for DEBUG query logging; the extra hosts are the test client's and ours.
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver', '127.0.0.1']):
+                results = self.run(runners, options)
+
+        results['scale'] = scale
+        self.report(results)
+        benchmark.write_results(results, options['output'], self.stdout)
+        if baseline is not None:
+            regressions = benchmark.compare(results, baseline, options['threshold'])
+            for line in regressions:
+                self.stderr.write(self.style.ERROR(f'REGRESSION {line}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["compare"]}.')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["compare"]}.'))
+
+    def load_baseline(self, path):
+        if not path:
+            return None
+        try:
+            with open(path, encoding='utf-8') as baseline:
+                return json.load(baseline)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+
+    def run(self, runners, options):
+        routes = benchmark.build_routes()
+        if options['route']:
+            routes = [route for route in routes if route.label in options['route']]
+        results = {
+            'started_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': connection.Database.sqlite_version,
+            'requests_per_route': options['requests'],
+            'concurrency': options['concurrency'],
+            'cold': options['cold'],
+            'runs': {},
+        }
+        for runner in runners:
+            self.stdout.write(f'Running {runner}...')
+            if runner == 'client':
+                results['runs'][runner] = benchmark.run_client(routes, options['requests'], options['cold'])
+                continue
+            server, base_url = self.start_server(runner)
+            try:
+                results['runs'][runner] = benchmark.run_server(
+                    base_url, routes, options['requests'], options['concurrency'], options['cold'],
+                )
+            finally:
+                server.shutdown()
+        return results
+
+    def start_server(self, runner):
+        if runner == 'wsgi':
+            return benchmark.serve_wsgi(WSGIHandler())
+        try:
+            from django.core.asgi import get_asgi_application
+            return benchmark.serve_asgi(get_asgi_application())
+        except ImportError:
+            raise CommandError('The asgi runner needs uvicorn (pip install uvicorn).')
+
+    def report(self, results):
+        header = f"{'route':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'queries':>8}  status"
+        for runner, routes in results['runs'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{runner} ({results['scale']})"))
+            self.stdout.write(header)
+            for label, row in routes.items():
+                queries = '-' if row['queries_per_request'] is None else f"{row['queries_per_request']:g}"
+                self.stdout.write(
+                    f"{label:<32} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+                    f"{row['throughput_rps'] or 0:>9.1f} {queries:>8}  {','.join(map(str, row['statuses']))}"
+                )
@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from choco_app import benchmark
+
+SERVERS = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    """
+    Compare how the WSGI and ASGI deployments cope with many concurrent requests.
+
+    The database is seeded once (as in the `benchmark` command); then each
+    server runs in its own child process so that their memory use can be
+    compared: WSGI with the sync views (chocolate_house/wsgi.py, a thread per
+    request) and ASGI with the async views (chocolate_house/asgi.py, uvicorn).
+    The page cache is off so that every request reaches its view.
+    """
+    help = "Report latency, throughput, errors and memory per in-flight request at rising concurrency, WSGI vs ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=benchmark.SCALES, default='1k',
+                            help='Rows of each model to seed (default 1k).')
+        parser.add_argument('--server', action='append', choices=SERVERS,
+                            help='Server to test; repeat for several (default: both). asgi needs uvicorn.')
+        parser.add_argument('--levels', default='1,8,32,128',
+                            help='Comma-separated concurrency levels (default 1,8,32,128).')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per level (default 200).')
+        parser.add_argument('--path', default='/inventory/ingredients/', help='Page to request.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the seeded database for the next run.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--child', choices=SERVERS, help='Internal: run one server against --database.')
+        parser.add_argument('--database', help='Internal: the seeded database file.')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['levels'].split(',')]
+        except ValueError:
+            raise CommandError(f"Invalid --levels: {options['levels']!r}")
+        if options['child']:
+            return self.run_child(options['child'], options['database'], levels, options)
+
+        with benchmark.seeded_database(options['scale'], options['keepdb'], self.stdout) as database:
+            connection.close()
+            results = {server: self.spawn(server, database, options) for server in options['server'] or SERVERS}
+
+        self.report(results)
+        benchmark.write_results(results, options['output'], self.stdout)
+
+    def spawn(self, server, database, options):
+        self.stdout.write(f'Running {server}...')
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_concurrency', '--child', server, '--database', database,
+            '--levels', options['levels'], '--requests', str(options['requests']), '--path', options['path'],
+        ]
+        env = dict(os.environ, ASYNC_VIEWS='1' if server == 'asgi' else '0')
+        child = subprocess.run(command, env=env, capture_output=True, text=True)
+        if child.returncode:
+            raise CommandError(f'The {server} run failed:\n{child.stderr}')
+        return json.loads(child.stdout.strip().splitlines()[-1])
+
+    def run_child(self, server, database, levels, options):
+        connections.settings['default']['NAME'] = database
+        # The benchmark measures the views, not the page cache or DEBUG query logging.
+        with override_settings(
+            DEBUG=False, ALLOWED_HOSTS=['127.0.0.1'],
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        ):
+            if server == 'wsgi':
+                running, base_url = benchmark.serve_wsgi(WSGIHandler())
+            else:
+                try:
+                    from django.core.asgi import get_asgi_application
+                    running, base_url = benchmark.serve_asgi(get_asgi_application())
+                except ImportError:
+                    raise CommandError('The asgi server needs uvicorn (pip install uvicorn).')
+            try:
+                results = benchmark.run_concurrency(base_url, options['path'], levels, options['requests'])
+            finally:
+                running.shutdown()
+        self.stdout.write(json.dumps(results))
+
+    def report(self, results):
+        header = (f"{'concurrency':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} "
+                  f"{'errors':>7} {'peak MB':>8} {'KB/req':>8}")
+        for server, rows in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(server))
+            self.stdout.write(header)
+            for row in rows:
+                self.stdout.write(
+                    f"{row['concurrency']:>11} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+                    f"{row['throughput_rps'] or 0:>9.1f} {row['errors']:>7} {row['peak_rss_mb']:>8.1f} "
+                    f"{row['kb_per_in_flight_request']:>8.1f}"
+                )
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+
+from choco_app import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Compare concurrent write throughput of Django's default SQLite setup and the tuned one.
+
+    Each profile gets its own freshly migrated database file in a temporary
+    directory, so neither the project database nor its journal mode is touched.
+    """
+    help = "Measure concurrent write throughput and 'database is locked' errors per SQLite profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writers (default 8).')
+        parser.add_argument('--writes', type=int, default=100, help='Writes per writer (default 100).')
+        parser.add_argument('--profile', action='append', choices=benchmark.CONTENTION_PROFILES,
+                            help='Profile to run; repeat for several (default: all).')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options['profile'] or benchmark.CONTENTION_PROFILES:
+                alias = f'contention_{name}'
+                benchmark.add_sqlite_database(
+                    alias, os.path.join(directory, f'{name}.sqlite3'), benchmark.CONTENTION_PROFILES[name],
+                )
+                try:
+                    results[name] = benchmark.run_contention(alias, options['threads'], options['writes'])
+                finally:
+                    benchmark.remove_database(alias)
+
+        self.stdout.write(f"{'profile':<16} {'writes/s':>10} {'committed':>10} {'locked':>8} {'seconds':>8}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<16} {row['writes_per_second']:>10.1f} {row['committed']:>10} "
+                f"{row['locked_errors']:>8} {row['seconds']:>8.2f}"
+            )
+        benchmark.write_results(results, options['output'], self.stdout)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from choco_app import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Measure the fan-out of live update events to many connected clients.
+
+    No database or server is involved: the broadcaster behind the `live_events`
+    stream is handed batches directly, as its RowChange poller does, which
+    isolates the cost of one write notifying every client of a process. Each client that would otherwise reload the ingredient or
+    flavor page on a timer receives the change without sending a request.
+    """
+    help = "Report the latency and per-client cost of delivering one live update event to N clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', default='100,1000,5000',
+                            help='Comma-separated numbers of connected clients (default 100,1000,5000).')
+        parser.add_argument('--events', type=int, default=200, help='Events published per level (default 200).')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['subscribers'].split(',')]
+        except ValueError:
+            raise CommandError(f"Invalid --subscribers: {options['subscribers']!r}")
+        results = [benchmark.run_fanout(level, options['events']) for level in levels]
+
+        self.stdout.write(f"{'clients':>8} {'p50 ms':>9} {'p95 ms':>9} {'us/client':>10} {'events/s':>9}")
+        for row in results:
+            self.stdout.write(
+                f"{row['subscribers']:>8} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+                f"{row['us_per_client']:>10.3f} {row['events_per_second']:>9.1f}"
+            )
+        benchmark.write_results(results, options['output'], self.stdout)
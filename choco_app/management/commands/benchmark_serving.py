@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from choco_app import benchmark
+
+SERVERS = ('runserver', 'gunicorn')
+
+# The static file requested, by its source name.
+STATIC_FILE = 'choco_app/styles.css'
+
+
+class Command(BaseCommand):
+    """
+    Compare the production entry point with the development server.
+
+    The database is seeded once (as in the `benchmark` command) and the static
+    files are collected with the production storage. Then each server runs in
+    its own process tree against the same database:
+
+    - runserver: `manage.py runserver` with DEBUG on, the old DockerFile setup,
+      serving static files uncompressed through django.contrib.staticfiles;
+    - gunicorn: gunicorn.conf.py with DEBUG off, serving the content-hashed,
+      precompressed static files with immutable cache headers.
+
+    Every path is loaded at every concurrency level with a browser-like
+    Accept-Encoding header.
+    """
+    help = "Report latency and throughput of runserver vs the gunicorn entry point, for pages and static files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=benchmark.SCALES, default='1k',
+                            help='Rows of each model to seed (default 1k).')
+        parser.add_argument('--server', action='append', choices=SERVERS,
+                            help='Server to test; repeat for several (default: both). gunicorn must be installed.')
+        parser.add_argument('--path', action='append',
+                            help='Page to load; repeat for several (default: home and ingredient list).')
+        parser.add_argument('--levels', default='1,8,32',
+                            help='Comma-separated concurrency levels (default 1,8,32).')
+        parser.add_argument('--requests', type=int, default=300, help='Requests per path and level (default 300).')
+        parser.add_argument('--workers', type=int, default=3, help='gunicorn worker processes (default 3).')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker (default 4).')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the seeded database for the next run.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['levels'].split(',')]
+        except ValueError:
+            raise CommandError(f"Invalid --levels: {options['levels']!r}")
+        servers = options['server'] or SERVERS
+
+        with benchmark.seeded_database(options['scale'], options['keepdb'], self.stdout) as database:
+            connection.close()
+            self.collect_static()
+            results = {
+                server: self.run_server(server, database, levels, options)
+                for server in servers
+            }
+
+        self.report(results, servers)
+        benchmark.write_results(results, options['output'], self.stdout)
+
+    def collect_static(self):
+        self.stdout.write('Collecting static files...')
+        child = subprocess.run(
+            [sys.executable, sys.argv[0], 'collectstatic', '--noinput', '--clear', '-v', '0'],
+            env=dict(os.environ, DJANGO_DEBUG='0'), capture_output=True, text=True,
+        )
+        if child.returncode:
+            raise CommandError(f'collectstatic failed:\n{child.stderr}')
+
+    def static_path(self, server):
+        """Return the URL path of STATIC_FILE as the server's templates would link it."""
+        name = STATIC_FILE
+        if server == 'gunicorn':
+            name = ManifestStaticFilesStorage(location=settings.STATIC_ROOT).hashed_files[STATIC_FILE]
+        return '/' + settings.STATIC_URL.lstrip('/') + name
+
+    def run_server(self, server, database, levels, options):
+        self.stdout.write(f'Running {server}...')
+        port = benchmark.free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        # A fresh shared page cache, so pages cached against another run's database are never served.
+        env = dict(
+            os.environ, DATABASE_PATH=database, DJANGO_ALLOWED_HOSTS='127.0.0.1', SUBMISSION_QUEUE='sync',
+            PAGE_CACHE_LOCATION=tempfile.mkdtemp(prefix='page-cache-'),
+        )
+        if server == 'runserver':
+            command = [sys.executable, sys.argv[0], 'runserver', '--noreload', f'127.0.0.1:{port}']
+            env.update(DJANGO_DEBUG='1')
+        else:
+            command = [
+                sys.executable, '-m', 'gunicorn', '-c', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+                '--bind', f'127.0.0.1:{port}', 'chocolate_house.wsgi',
+            ]
+            env.update(DJANGO_DEBUG='0', WEB_WORKERS=str(options['workers']), WEB_THREADS=str(options['threads']))
+        paths = options['path'] or ['/inventory/', '/inventory/ingredients/']
+        paths = paths + [self.static_path(server)]
+        try:
+            process = benchmark.start_process_server(command, env, base_url)
+        except RuntimeError as exc:
+            raise CommandError(f'Could not start {server}: {exc}')
+        try:
+            headers = {'Accept-Encoding': 'br, gzip'}
+            return {
+                path: [benchmark.run_load(base_url, path, level, options['requests'], headers) for level in levels]
+                for path in paths
+            }
+        finally:
+            benchmark.stop_process_server(process)
+
+    def report(self, results, servers):
+        header = (f"{'concurrency':>11} {'p50 ms':>9} {'p95 ms':>9} {'req/s':>9} {'errors':>7} "
+                  f"{'bytes':>8} {'vs ' + servers[0]:>14}")
+        baseline = list(results[servers[0]].values())
+        for server, paths in results.items():
+            for number, (path, rows) in enumerate(paths.items()):
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{server} {path}'))
+                self.stdout.write(header)
+                for row, base in zip(rows, baseline[number]):
+                    speedup = row['throughput_rps'] / base['throughput_rps'] if base['throughput_rps'] else 0
+                    self.stdout.write(
+                        f"{row['concurrency']:>11} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+                        f"{row['throughput_rps'] or 0:>9.1f} {row['errors']:>7} {row['bytes_per_response']:>8} "
+                        f"{speedup:>13.2f}x"
+                    )
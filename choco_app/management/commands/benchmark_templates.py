@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from choco_app import benchmark
+
+SETUPS = ('uncached', 'cached_loader', 'fragments')
+
+
+class Command(BaseCommand):
+    """
+    Measure what the cached template loader and fragment caching save per render.
+
+    The database is seeded once (as in the `benchmark` command), then every page
+    template is rendered with the context its view passes, under three setups:
+    the uncached loader without fragment caching (the previous configuration),
+    the cached loader without fragment caching, and the cached loader with warm
+    ``{% cache %}`` fragments (the production configuration).
+    """
+    help = "Report the per-render cost of every page template with and without loader and fragment caching."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=benchmark.SCALES, default='1k',
+                            help='Rows of each model to seed (default 1k).')
+        parser.add_argument('--template', action='append', help='Template to render; repeat for several (default: all).')
+        parser.add_argument('--renders', type=int, default=200, help='Renders per template and setup (default 200).')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the seeded database for the next run.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        with benchmark.seeded_database(options['scale'], options['keepdb'], self.stdout):
+            names = options['template'] or list(benchmark.template_cases())
+            unknown = set(names) - benchmark.template_cases().keys()
+            if unknown:
+                raise CommandError(f"Unknown template(s): {', '.join(sorted(unknown))}")
+            with override_settings(DEBUG=False):
+                results = benchmark.run_templates(names, options['renders'])
+
+        self.report(results)
+        benchmark.write_results(results, options['output'], self.stdout)
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'template':<30} {'uncached us':>12} {'loader us':>10} {'fragments us':>13} "
+            f"{'saved us':>9} {'saved':>6} {'queries':>9}"
+        )
+        for name, setups in results.items():
+            before, after = setups['uncached'], setups['fragments']
+            saved = before['render_us'] - after['render_us']
+            share = saved / before['render_us'] if before['render_us'] else 0
+            self.stdout.write(
+                f"{name:<30} {before['render_us']:>12.1f} {setups['cached_loader']['render_us']:>10.1f} "
+                f"{after['render_us']:>13.1f} {saved:>9.1f} {share:>6.0%} "
+                f"{before['queries']:>4g}->{after['queries']:<3g}"
+            )
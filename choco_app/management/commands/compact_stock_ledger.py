@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from choco_app.models import StockMovement
+
+
+class Command(BaseCommand):
+    """
+    Compact old stock movements into per-ingredient snapshots.
+
+    Meant to run periodically (e.g. nightly from cron); each run writes one
+    snapshot per ingredient that had movements in the compacted range.
+    """
+    help = "Roll stock movements older than the retention window into snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help='Keep this many days of individual movements (default 30).')
+        parser.add_argument('--before', help='Compact movements at or before this ISO datetime instead.')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = datetime.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError(f"Invalid --before: {options['before']!r}")
+            if timezone.is_naive(cutoff):
+                cutoff = timezone.make_aware(cutoff)
+        else:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+
+        written, deleted = StockMovement.objects.compact(cutoff)
+        self.stdout.write(f"{deleted} movement(s) compacted into {written} snapshot(s) at {cutoff.isoformat()}.")
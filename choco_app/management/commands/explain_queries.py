@@ -0,0 +1,109 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from choco_app import benchmark
+from choco_app.models import FlavorSeason, Ingredient
+
+# Statements whose plans are printed; inserts, savepoints and PRAGMAs have no access path to check.
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+# Routes that read every row of a table by design, with the reason; their scans are printed but not flagged.
+FULL_READS = {
+    'ingredient_list (stream)': 'the full ingredient list',
+    'ingredient_export': 'the full ingredient list',
+    'ingredient_catalogue': 'the versioned catalogue of every ingredient',
+    'allergy_concern_create': 'the ingredient dropdown',
+    'production_plan': 'the planner loads every recipe',
+    'production_plan (all, by demand)': 'the planner loads every recipe',
+}
+
+
+def view_queries():
+    """
+    Return the queries the views run, captured by requesting every benchmarked route.
+
+    The routes are those of `benchmark.build_routes()`, which covers every URL
+    of choco_app/urls.py, so a query added to a view is explained without this
+    command being updated. Each distinct statement is returned once, under the
+    first route that ran it.
+
+    Returns:
+        list[tuple[str, str]]: (route label, SQL) pairs.
+    """
+    queries = {}
+    for route, statements in benchmark.capture_queries(benchmark.build_routes()):
+        for sql in statements:
+            if sql.lstrip().split(None, 1)[0].upper() in EXPLAINED:
+                queries.setdefault(sql, route.label)
+    return [(label, sql) for sql, label in queries.items()]
+
+
+class Command(BaseCommand):
+    """
+    Print the SQLite EXPLAIN QUERY PLAN output for every query the views run.
+
+    Plans that read a whole table or index (see `is_full_scan`) are flagged so
+    that regressions to unindexed access paths are easy to spot. The views are
+    requested against the configured database, inside transactions that are
+    rolled back, so it needs some ingredients and flavors to address.
+    """
+    help = "Print EXPLAIN QUERY PLAN output for each view's queries and flag full table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any query plan contains a full table scan.')
+
+    def handle(self, *args, **options):
+        if not Ingredient.objects.exists() or not FlavorSeason.objects.exists():
+            raise CommandError('The database needs at least one ingredient and one seasonal flavor.')
+        scans = []
+        for label, sql in view_queries():
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(sql)
+            for line in plan:
+                if not is_full_scan(line, sql, plan):
+                    self.stdout.write(line)
+                elif label in FULL_READS:
+                    self.stdout.write(f'{line}    <-- full scan (expected: {FULL_READS[label]})')
+                else:
+                    self.stdout.write(self.style.WARNING(f'{line}    <-- full scan'))
+                    scans.append(label)
+            self.stdout.write('')
+
+        if scans and options['fail_on_scan']:
+            raise CommandError(f"Full table scans in: {', '.join(sorted(set(scans)))}")
+
+
+def is_full_scan(plan_line, sql='', plan=()):
+    """
+    Return True if an EXPLAIN QUERY PLAN line reads a whole table or index.
+
+    Every SCAN does, whether of the table or of an index (``SCAN t USING
+    INDEX i`` walks all of i, then reads the table for each entry), except:
+    a virtual table "scan", which is a lookup through the table's own index
+    (an FTS5 MATCH); a covering index walked under a LIMIT; and a table or
+    index read in order under a LIMIT with no WHERE clause and no sort, which
+    stops after LIMIT rows. Anything else should be a SEARCH.
+
+    Parameters:
+        plan_line (str): One line of SQLite query plan output.
+        sql (str): The statement the plan is for.
+        plan (list[str]): Every line of the plan.
+
+    Returns:
+        bool: True when the line is a full table or index scan.
+    """
+    detail = plan_line.split('SCAN ', 1)
+    if len(detail) != 2 or 'VIRTUAL TABLE INDEX' in detail[1] or detail[1].startswith('CONSTANT ROW'):
+        return False
+    if re.search(r'\bLIMIT\b', sql):
+        if 'USING COVERING INDEX' in detail[1]:
+            return False
+        if not re.search(r'\bWHERE\b', sql) and not any('USE TEMP B-TREE' in line for line in plan):
+            return False
+    return True
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from choco_app.bulk import FORMATS, export_ingredients
+
+
+class Command(BaseCommand):
+    """Stream the ingredient inventory to a file or standard output."""
+    help = "Export all ingredients as CSV or JSON Lines without loading the table into memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='Output format (default csv).')
+        parser.add_argument('--output', default='-', help="Output file, or '-' for standard output.")
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            for line in export_ingredients(options['format']):
+                self.stdout.write(line, ending='')
+        else:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(export_ingredients(options['format']))
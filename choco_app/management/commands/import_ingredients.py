@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from choco_app.bulk import FORMATS, decode_lines, guess_format, import_ingredients
+
+
+class Command(BaseCommand):
+    """
+    Upsert ingredients from a CSV or JSON Lines supplier feed.
+
+    The file is streamed in batches; rows that fail validation are reported and
+    skipped while the rest of their batch is still written.
+    """
+    help = "Bulk create or update ingredients from a CSV or JSON Lines file ('-' reads stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for standard input.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format; guessed from the file extension by default.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per batch and transaction (default 1000).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        try:
+            if path == '-':
+                result = import_ingredients(decode_lines(sys.stdin.buffer), fmt, options['batch_size'])
+            else:
+                with open(path, 'rb') as lines:
+                    result = import_ingredients(decode_lines(lines), fmt, options['batch_size'])
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+        for line, message in result.errors:
+            self.stderr.write(f'line {line}: {message}')
+        self.stdout.write(
+            f'{result.imported} ingredient(s) imported from {result.rows} row(s), '
+            f'{len(result.errors)} rejected, in {result.elapsed:.2f}s '
+            f'({result.rows_per_second:,.0f} rows/s).'
+        )
@@ -0,0 +1,45 @@
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from choco_app import planner
+from choco_app.units import format_quantity
+
+
+class Command(BaseCommand):
+    """
+    Print how many batches of each flavor the current stock allows.
+
+    Recipes and stock are read with one query and planned in NumPy (see
+    choco_app/planner.py): the most batches of each flavor on its own, and a
+    plan sharing the stock between all of them.
+    """
+    help = "Plan production from the flavor recipes and the current ingredient stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weights', choices=planner.WEIGHTINGS, default=planner.EQUAL,
+                            help='Share the stock equally or by customer demand (default equal).')
+        parser.add_argument('--all', action='store_true', help='Plan inactive flavors too.')
+        parser.add_argument('--output', help='Write the full plan as JSON to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            plan = planner.plan(options['weights'], active_only=not options['all'])
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Flavors'))
+        self.stdout.write(f"{'flavor':<30} {'max batches':>12} {'planned':>9}  limited by")
+        for row in plan['flavors']:
+            self.stdout.write(f"{row['name']:<30} {row['max_batches']:>12} {row['batches']:>9}  {row['limited_by']}")
+        self.stdout.write(self.style.MIGRATE_HEADING('Ingredients'))
+        for row in plan['ingredients']:
+            self.stdout.write(
+                f"{row['name']:<30} uses {format_quantity(row['used'], row['unit'])} "
+                f"of {format_quantity(row['stock'], row['unit'])}"
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(plan, output, indent=2)
+            self.stdout.write(f"Plan written to {options['output']}.")
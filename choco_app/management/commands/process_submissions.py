@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from choco_app.submissions import drain
+
+
+class Command(BaseCommand):
+    """
+    Drain the write-behind queue of public form submissions.
+
+    Use with SUBMISSION_QUEUE = 'worker', e.g. as a supervised long-running
+    process, or with --once from cron. Several workers may run at once: each
+    batch is claimed and written inside one IMMEDIATE transaction.
+    """
+    help = "Write queued suggestion, allergy concern and contact submissions in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait between polls of an empty queue (default 1).')
+        parser.add_argument('--batch-size', type=int, help='Submissions per transaction (default SUBMISSION_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        while True:
+            delivered = drain(options['batch_size'])
+            if delivered or options['once']:
+                self.stdout.write(f'{delivered} submission(s) delivered.')
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
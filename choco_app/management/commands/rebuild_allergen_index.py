@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from choco_app import allergens
+
+
+class Command(BaseCommand):
+    """
+    Recount the allergen figures of every ingredient.
+
+    The index is kept current by signals and by the submission queue; run this
+    after writing suggestions or allergy issues in bulk outside of those paths
+    (raw SQL, bulk_create, loaddata).
+    """
+    help = "Rebuild the per-ingredient allergen index from the suggestion and allergy issue tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Ingredients recounted per query (default 500).')
+
+    def handle(self, *args, **options):
+        written = allergens.rebuild(options['batch_size'])
+        self.stdout.write(f"Allergen figures recounted for {written} ingredient(s).")
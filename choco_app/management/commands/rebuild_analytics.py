@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from choco_app import allergens, analytics
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the materialized analytics tables from the raw tables.
+
+    The tables are kept current on every write; run this after loading data
+    in bulk outside the ORM, or to repair drift. Each table is recomputed with
+    one GROUP BY and written in batches.
+    """
+    help = "Rebuild the flavor, ingredient and daily activity analytics tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per INSERT (default 1000).')
+
+    def handle(self, *args, **options):
+        flavors, days = analytics.rebuild(batch_size=options['batch_size'])
+        ingredients = allergens.rebuild()
+        self.stdout.write(
+            f"Rebuilt analytics: {flavors} flavor(s), {ingredients} ingredient(s), {days} day(s)."
+        )
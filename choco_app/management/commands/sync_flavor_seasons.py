@@ -0,0 +1,36 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from choco_app.models import FlavorSeason
+
+
+class Command(BaseCommand):
+    """
+    Flip `FlavorSeason.is_active` in bulk so it matches each flavor's availability window.
+
+    Intended to be run from cron shortly after midnight; `--interval` keeps it
+    running as a simple in-process scheduler instead.
+    """
+    help = "Activate flavors entering their availability window and deactivate expired ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Synchronise as of this ISO date instead of today.')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Repeat every INTERVAL seconds until interrupted (0 runs once).')
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid --date: {options['date']!r}")
+
+        while True:
+            changed = FlavorSeason.objects.sync_activation(day)
+            self.stdout.write(f"{changed} flavor(s) updated.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,504 @@
+import atexit
+import heapq
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger('choco_app.slow_requests')
+
+# Bucket upper bounds. Seconds for the timing histograms, a plain count for queries.
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# The file in METRICS_DIR holding the totals of processes that have exited.
+ARCHIVE = 'archive.json'
+
+# (name, help text, buckets) of every histogram, each labelled by view.
+HISTOGRAMS = (
+    ('choco_request_duration_seconds', 'Total time spent handling the request.', DURATION_BUCKETS),
+    ('choco_sql_duration_seconds', 'Time spent executing SQL per request.', DURATION_BUCKETS),
+    ('choco_sql_queries', 'Number of SQL queries executed per request.', QUERY_COUNT_BUCKETS),
+    ('choco_template_render_seconds', 'Time spent rendering templates per request.', DURATION_BUCKETS),
+)
+
+
+class Histogram:
+    """
+    A cumulative-bucket histogram in the shape Prometheus expects.
+
+    Attributes:
+        buckets (tuple): Upper bounds of the buckets, ascending.
+        counts (list[int]): Observations per bucket, plus one for +Inf (not cumulative).
+        sum (float): Sum of all observed values.
+        count (int): Number of observations.
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        """Record one observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Yield (upper bound label, cumulative count) pairs, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """
+    In-process store of the per-view request histograms and counters.
+
+    Each worker process records only the requests it handles, and the workers
+    of one server share its port, so a scrape reaches whichever worker accepts
+    it and Prometheus cannot tell them apart. With METRICS_DIR set, every
+    process therefore writes its totals to a file there (`flush`) and
+    `collect` sums the files of all of them into the document served. Without
+    it, /metrics serves the requests of the answering process only, which is
+    right for a single process such as runserver.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path = None
+        self._dirty = False
+        self._flusher = None
+        self.reset()
+
+    def reset(self):
+        """Drop every recorded observation."""
+        with self._lock:
+            self.histograms = {name: {} for name, _help, _buckets in HISTOGRAMS}
+            self.requests = {}
+
+    def observe(self, view, status, values):
+        """
+        Record one request.
+
+        Parameters:
+            view (str): Label of the view that handled the request.
+            status (int): The response status code.
+            values (dict): One observed value per histogram name.
+        """
+        with self._lock:
+            for name, _help, buckets in HISTOGRAMS:
+                series = self.histograms[name]
+                if view not in series:
+                    series[view] = Histogram(buckets)
+                series[view].observe(values[name])
+            key = (view, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self._dirty = True
+
+    def snapshot(self):
+        """Return every recorded observation as JSON-serializable data, for `merge`."""
+        with self._lock:
+            return {
+                'requests': [[view, status, count] for (view, status), count in self.requests.items()],
+                'histograms': {
+                    name: {
+                        view: {'counts': histogram.counts, 'sum': histogram.sum, 'count': histogram.count}
+                        for view, histogram in series.items()
+                    }
+                    for name, series in self.histograms.items()
+                },
+            }
+
+    def merge(self, snapshot):
+        """Add the observations of a `snapshot` (of another process) to this registry."""
+        with self._lock:
+            for view, status, count in snapshot['requests']:
+                self.requests[view, status] = self.requests.get((view, status), 0) + count
+            for name, _help, buckets in HISTOGRAMS:
+                series = self.histograms[name]
+                for view, data in snapshot['histograms'].get(name, {}).items():
+                    if view not in series:
+                        series[view] = Histogram(buckets)
+                    histogram = series[view]
+                    histogram.counts = [a + b for a, b in zip(histogram.counts, data['counts'])]
+                    histogram.sum += data['sum']
+                    histogram.count += data['count']
+
+    def flush(self, directory):
+        """
+        Write this process's totals to its file in `directory`.
+
+        The file is named after the process id and start time, so it is never
+        overwritten by another process, and replaced atomically.
+
+        Parameters:
+            directory (str): The METRICS_DIR shared by the processes.
+        """
+        self._dirty = False
+        if self._path is None:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            self._path = Path(directory) / f'{os.getpid()}-{time.time_ns()}.json'
+        _write_json(self._path, self.snapshot())
+
+    def start_flushing(self, directory, interval):
+        """
+        Flush to `directory` every `interval` seconds while there are new observations, and at exit.
+
+        A worker recycled after its last request therefore leaves every
+        request it handled in its file.
+        """
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, args=(directory, interval), name='metrics-flush', daemon=True,
+            )
+            self._flusher.start()
+        atexit.register(self._flush_at_exit, directory)
+
+    def _flush_at_exit(self, directory):
+        if self._dirty:
+            self.flush(directory)
+
+    def _flush_periodically(self, directory, interval):
+        while True:
+            time.sleep(interval)
+            if self._dirty:
+                try:
+                    self.flush(directory)
+                except OSError:
+                    logger.exception('Writing the metrics to %s failed; retrying.', directory)
+
+    def render(self):
+        """
+        Return every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics document.
+        """
+        lines = [
+            '# HELP choco_requests_total Requests handled, by view and status code.',
+            '# TYPE choco_requests_total counter',
+        ]
+        with self._lock:
+            for (view, status), count in sorted(self.requests.items()):
+                lines.append(f'choco_requests_total{{view="{_escape(view)}",status="{status}"}} {count}')
+            for name, help_text, _buckets in HISTOGRAMS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histogram in sorted(self.histograms[name].items()):
+                    label = f'view="{_escape(view)}"'
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum:g}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_json(path, data):
+    """Replace `path` with `data` as JSON, atomically, so readers never see a partial file."""
+    handle, temporary = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(handle, 'w', encoding='utf-8') as output:
+        json.dump(data, output)
+    os.replace(temporary, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return None
+
+
+registry = Registry()
+
+
+def collect():
+    """
+    Return the registry to serve: the sum of every process with METRICS_DIR set, this process's otherwise.
+
+    Files of processes that have exited are kept (or folded into ARCHIVE by
+    `archive`), so the counters never go back when a worker is recycled.
+
+    Returns:
+        Registry: The metrics of every process.
+    """
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return registry
+    registry.flush(directory)
+    total = Registry()
+    snapshots = {path.name: _read_json(path) for path in Path(directory).glob('*-*.json')}
+    # Read last: a worker file archived in the meantime is then counted once, through the archive.
+    archived = _read_json(Path(directory) / ARCHIVE)
+    if archived is not None:
+        total.merge(archived)
+        for name in archived['merged']:
+            snapshots.pop(name, None)
+    for snapshot in snapshots.values():
+        if snapshot is not None:
+            total.merge(snapshot)
+    return total
+
+
+def archive(directory, pid):
+    """
+    Fold the files of exited process `pid` into ARCHIVE, so METRICS_DIR does not grow with recycled workers.
+
+    Run by the gunicorn master when a worker exits (see gunicorn.conf.py).
+
+    Parameters:
+        directory (str): The METRICS_DIR shared by the processes.
+        pid (int): The process id of the exited worker.
+    """
+    directory = Path(directory)
+    files = list(directory.glob(f'{pid}-*.json'))
+    if not files:
+        return
+    total = Registry()
+    archived = _read_json(directory / ARCHIVE) or {'merged': []}
+    if archived['merged']:
+        total.merge(archived)
+    for path in files:
+        total.merge(_read_json(path))
+    _write_json(directory / ARCHIVE, dict(total.snapshot(), merged=archived['merged'] + [path.name for path in files]))
+    for path in files:
+        path.unlink()
+
+
+class RequestStats:
+    """
+    Running totals for the request being handled.
+
+    Attributes:
+        queries (int): Number of SQL queries executed.
+        sql_time (float): Seconds spent executing them.
+        render_time (float): Seconds spent rendering templates.
+        slow_queries (list): A heap of (seconds, sql) of the `keep_queries` slowest queries, for the
+            slow-request log. The SQL of faster queries is not kept.
+    """
+    def __init__(self, keep_queries=0):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.keep_queries = keep_queries
+        self.slow_queries = []
+
+    def record_query(self, elapsed, sql):
+        """Add one executed query to the totals."""
+        self.queries += 1
+        self.sql_time += elapsed
+        if len(self.slow_queries) < self.keep_queries:
+            heapq.heappush(self.slow_queries, (elapsed, sql))
+        elif self.keep_queries and elapsed > self.slow_queries[0][0]:
+            heapq.heapreplace(self.slow_queries, (elapsed, sql))
+
+
+# The stats of the request being handled. Context variables follow a request
+# into the threads that sync_to_async runs ORM calls in, so queries issued by
+# async views are attributed to their request as well.
+_current = ContextVar('choco_request_stats', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper timing every query run while a request is being measured."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(time.perf_counter() - start, sql)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    """Install `time_query` on every database connection (once, it survives reconnects)."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing every top-level template render.
+
+    Templates pulled in by ``{% include %}`` or ``{% extends %}`` render inside
+    their parent and are not timed twice.
+    """
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+class InstrumentedTemplate:
+    """Wrapper around a backend template that adds its render time to the current request."""
+
+    def __init__(self, wrapped):
+        self._wrapped = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self._wrapped.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            stats.render_time += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """
+    Record total latency, SQL query count, SQL time and template render time per view.
+
+    Observations are kept in process in `registry` and served by `metrics_view`.
+    Requests slower than SLOW_REQUEST_THRESHOLD seconds are logged with their
+    slowest queries. Set METRICS_ENABLED to False to turn the middleware off.
+
+    Time spent rendering a streaming response happens after the view returns
+    and is not included. The middleware runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+        stats = RequestStats(keep_queries=_kept_queries())
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+        stats = RequestStats(keep_queries=_kept_queries())
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, stats, total):
+        """Add a finished request to the registry and log it if it was slow."""
+        threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD', None)
+        view = _view_label(request)
+        registry.observe(view, response.status_code, {
+            'choco_request_duration_seconds': total,
+            'choco_sql_duration_seconds': stats.sql_time,
+            'choco_sql_queries': stats.queries,
+            'choco_template_render_seconds': stats.render_time,
+        })
+        if threshold is not None and total >= threshold:
+            log_slow_request(request, view, total, stats)
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory:
+            registry.start_flushing(directory, getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0))
+
+
+def _kept_queries():
+    """Return how many of each request's slowest queries the slow-request log needs."""
+    if getattr(settings, 'SLOW_REQUEST_THRESHOLD', None) is None:
+        return 0
+    return getattr(settings, 'SLOW_REQUEST_MAX_QUERIES', 10)
+
+
+def _view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+def log_slow_request(request, view, total, stats):
+    """
+    Log a request that exceeded SLOW_REQUEST_THRESHOLD, with its slowest queries.
+
+    Parameters:
+        request (HttpRequest): The slow request.
+        view (str): Label of the view that handled it.
+        total (float): Seconds the request took.
+        stats (RequestStats): The totals recorded for the request.
+    """
+    slowest = sorted(stats.slow_queries, reverse=True)
+    lines = [
+        f'Slow request {request.method} {request.get_full_path()} ({view}): {total * 1000:.1f} ms, '
+        f'{stats.queries} queries in {stats.sql_time * 1000:.1f} ms, '
+        f'templates {stats.render_time * 1000:.1f} ms',
+    ]
+    lines.extend(f'  {elapsed * 1000:.1f} ms  {sql}' for elapsed, sql in slowest)
+    logger.warning('\n'.join(lines))
+
+
+def metrics_view(request):
+    """
+    Serve the collected metrics in the Prometheus text format.
+
+    The metrics name every view and how busy it is, so they are served only to
+    a scraper sending ``Authorization: Bearer <METRICS_TOKEN>`` or to a
+    logged-in staff user.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: The metrics document, 401 without valid credentials, or
+        404 when METRICS_ENABLED is False.
+    """
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        raise Http404
+    if not _may_read_metrics(request):
+        response = HttpResponse('Authentication required.', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(collect().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _may_read_metrics(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    scheme, _space, credentials = request.headers.get('Authorization', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and constant_time_compare(credentials.strip(), token):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_active and user.is_staff)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0004_allergyissue_flavorseason_rename_contact_inquiry_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customersuggestion',
+            index=models.Index(fields=['customer_email'], name='suggestion_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customersuggestion',
+            index=models.Index(fields=['suggested_flavor'], name='suggestion_flavor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customersuggestion',
+            index=models.Index(fields=['customer_name'], name='suggestion_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flavorseason',
+            index=models.Index(fields=['is_active', 'name'], name='flavor_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flavorseason',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['available_from', 'available_to'], name='flavor_active_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inquiry',
+            index=models.Index(fields=['-created_at'], name='inquiry_created_idx'),
+        ),
+    ]
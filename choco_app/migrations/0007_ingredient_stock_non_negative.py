@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+def clamp_negative_stock(apps, schema_editor):
+    """Existing rows must satisfy the new constraint before it can be added."""
+    Ingredient = apps.get_model('choco_app', 'Ingredient')
+    Ingredient.objects.using(schema_editor.connection.alias).filter(stock__lt=0).update(stock=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_negative_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='ingredient_stock_non_negative'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def open_ledger(apps, schema_editor):
+    """Record each existing ingredient's stock as an opening snapshot so the ledger starts complete."""
+    Ingredient = apps.get_model('choco_app', 'Ingredient')
+    StockSnapshot = apps.get_model('choco_app', 'StockSnapshot')
+    db = schema_editor.connection.alias
+    now = timezone.now()
+    StockSnapshot.objects.using(db).bulk_create(
+        (StockSnapshot(ingredient_id=pk, taken_at=now, stock=stock)
+         for pk, stock in Ingredient.objects.using(db).values_list('pk', 'stock').iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0007_ingredient_stock_non_negative'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.FloatField()),
+                ('reason', models.CharField(max_length=200)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='choco_app.ingredient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ingredient', 'created_at'], name='movement_ingredient_time_idx'), models.Index(fields=['created_at'], name='movement_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('stock', models.FloatField()),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='choco_app.ingredient')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ingredient', 'taken_at'), name='snapshot_ingredient_time_unique')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:33
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def grams_to_milligrams(apps, schema_editor):
+    """
+    Scale float quantities (grams) to whole milligrams before the columns become integers.
+
+    Existing rows are assumed to be measured in grams, the new `unit` default.
+    """
+    for model_name, field in (('Ingredient', 'stock'), ('StockMovement', 'delta'), ('StockSnapshot', 'stock')):
+        model = apps.get_model('choco_app', model_name)
+        model.objects.using(schema_editor.connection.alias).update(**{field: Round(F(field) * 1000)})
+
+
+def milligrams_to_grams(apps, schema_editor):
+    for model_name, field in (('Ingredient', 'stock'), ('StockMovement', 'delta'), ('StockSnapshot', 'stock')):
+        model = apps.get_model('choco_app', model_name)
+        model.objects.using(schema_editor.connection.alias).update(**{field: F(field) / 1000.0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0008_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(grams_to_milligrams, milligrams_to_grams),
+        migrations.AddField(
+            model_name='ingredient',
+            name='unit',
+            field=models.CharField(choices=[('g', 'grams'), ('unit', 'units')], default='g', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='stock',
+            field=models.BigIntegerField(help_text='milligrams for ingredients measured in grams, otherwise units'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='delta',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='stocksnapshot',
+            name='stock',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['unit', 'stock'], name='ingredient_unit_stock_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_allergens(apps, schema_editor):
+    """Fill the allergen index from the existing suggestions and allergy issues."""
+    Ingredient = apps.get_model('choco_app', 'Ingredient')
+    AllergyIssue = apps.get_model('choco_app', 'AllergyIssue')
+    AllergenStats = apps.get_model('choco_app', 'AllergenStats')
+    SuggestionIngredient = apps.get_model('choco_app', 'CustomerSuggestion').ingredients.through
+    db = schema_editor.connection.alias
+    issues = dict(
+        AllergyIssue.objects.using(db).order_by().values_list('ingredient_id').annotate(n=Count('pk'))
+    )
+    uses = dict(
+        SuggestionIngredient.objects.using(db).order_by().values_list('ingredient_id').annotate(n=Count('pk'))
+    )
+    AllergenStats.objects.using(db).bulk_create(
+        (AllergenStats(ingredient_id=pk, allergy_issue_count=issues.get(pk, 0), suggestion_count=uses.get(pk, 0))
+         for pk in Ingredient.objects.using(db).values_list('pk', flat=True).iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0011_submission_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllergenStats',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='allergen_stats', serialize=False, to='choco_app.ingredient')),
+                ('allergy_issue_count', models.PositiveIntegerField(default=0)),
+                ('suggestion_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'allergen stats',
+                'indexes': [models.Index(fields=['-allergy_issue_count'], name='allergen_issue_count_idx')],
+            },
+        ),
+        migrations.RunPython(count_allergens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:20
+
+from importlib import import_module
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+full_text_search = import_module('choco_app.migrations.0010_full_text_search')
+
+
+def recreate_suggestion_index(apps, schema_editor):
+    """
+    Recreate the suggestion FTS5 index and its triggers.
+
+    SQLite adds a column by rebuilding the table, which drops the triggers that
+    keep the index in sync, so this runs after the rebuild in both directions.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for fts, table, columns in full_text_search.FTS_TABLES:
+        if table == 'choco_app_customersuggestion':
+            for statement in full_text_search.drop_sql(fts) + full_text_search.create_sql(fts, table, columns):
+                schema_editor.execute(statement)
+
+
+def fill_analytics(apps, schema_editor):
+    """Fill the analytics tables from the existing suggestions and allergy issues."""
+    CustomerSuggestion = apps.get_model('choco_app', 'CustomerSuggestion')
+    AllergyIssue = apps.get_model('choco_app', 'AllergyIssue')
+    FlavorStats = apps.get_model('choco_app', 'FlavorStats')
+    DailyActivity = apps.get_model('choco_app', 'DailyActivity')
+    db = schema_editor.connection.alias
+    suggestions = CustomerSuggestion.objects.using(db).order_by()
+    FlavorStats.objects.using(db).bulk_create(
+        (FlavorStats(suggested_flavor=flavor, suggestion_count=n)
+         for flavor, n in suggestions.values_list('suggested_flavor').annotate(n=Count('pk'))),
+        batch_size=1000,
+    )
+
+    def per_day(queryset):
+        return dict(queryset.annotate(day=TruncDate('created_at')).values_list('day').annotate(n=Count('pk')))
+
+    made = per_day(suggestions)
+    reported = per_day(AllergyIssue.objects.using(db).order_by())
+    DailyActivity.objects.using(db).bulk_create(
+        (DailyActivity(day=day, suggestion_count=made.get(day, 0), allergy_issue_count=reported.get(day, 0))
+         for day in sorted(made.keys() | reported.keys())),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0012_allergen_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreate_suggestion_index),
+        migrations.AddField(
+            model_name='customersuggestion',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(recreate_suggestion_index, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='allergyissue',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='customersuggestion',
+            index=models.Index(fields=['created_at'], name='suggestion_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='allergyissue',
+            index=models.Index(fields=['created_at'], name='allergy_issue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='allergenstats',
+            index=models.Index(fields=['-suggestion_count'], name='allergen_suggestion_count_idx'),
+        ),
+        migrations.CreateModel(
+            name='FlavorStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('suggested_flavor', models.CharField(max_length=100, unique=True)),
+                ('suggestion_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'flavor stats',
+                'indexes': [models.Index(fields=['-suggestion_count'], name='flavor_stats_count_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('suggestion_count', models.PositiveIntegerField(default=0)),
+                ('allergy_issue_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'daily activity',
+            },
+        ),
+        migrations.RunPython(fill_analytics, migrations.RunPython.noop),
+    ]
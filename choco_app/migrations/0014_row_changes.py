@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+# The tables published by the JSON API, as (table, key column, table logged as).
+# A change to a suggestion's ingredient links is a change to the suggestion.
+# Triggers record every write in choco_app_rowchange; see RowChange.
+TRACKED_TABLES = [
+    ('choco_app_ingredient', 'id', 'choco_app_ingredient'),
+    ('choco_app_flavorseason', 'id', 'choco_app_flavorseason'),
+    ('choco_app_customersuggestion', 'id', 'choco_app_customersuggestion'),
+    ('choco_app_customersuggestion_ingredients', 'customersuggestion_id', 'choco_app_customersuggestion'),
+]
+
+
+def record_sql(logged, row):
+    # DELETE then INSERT rather than INSERT OR REPLACE: an outer INSERT OR IGNORE
+    # (as issued by bulk_create(ignore_conflicts=True)) would override the
+    # trigger's conflict clause and leave the old version in place.
+    return (
+        f"DELETE FROM choco_app_rowchange WHERE table_name = '{logged}' AND row_id = {row}; "
+        f"INSERT INTO choco_app_rowchange (table_name, row_id) VALUES ('{logged}', {row});"
+    )
+
+
+def create_sql(table, column, logged):
+    return [
+        f"CREATE TRIGGER {table}_rc_ai AFTER INSERT ON {table} BEGIN {record_sql(logged, f'new.{column}')} END",
+        f"CREATE TRIGGER {table}_rc_ad AFTER DELETE ON {table} BEGIN {record_sql(logged, f'old.{column}')} END",
+        f"CREATE TRIGGER {table}_rc_au AFTER UPDATE ON {table} BEGIN {record_sql(logged, f'new.{column}')} END",
+    ]
+
+
+def drop_sql(table):
+    return [f"DROP TRIGGER IF EXISTS {table}_rc_{suffix}" for suffix in ('ai', 'ad', 'au')]
+
+
+def create_triggers(apps, schema_editor):
+    """Create the change triggers and record every existing row as changed."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, column, logged in TRACKED_TABLES:
+        for statement in create_sql(table, column, logged):
+            schema_editor.execute(statement)
+        if table == logged:
+            schema_editor.execute(
+                f"INSERT INTO choco_app_rowchange (table_name, row_id) SELECT '{logged}', {column} FROM {table} ORDER BY {column}"
+            )
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, _column, _logged in TRACKED_TABLES:
+        for statement in drop_sql(table):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0013_analytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RowChange',
+            fields=[
+                ('version', models.BigAutoField(primary_key=True, serialize=False)),
+                ('table_name', models.CharField(max_length=64)),
+                ('row_id', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['table_name', 'version'], name='row_change_version_idx')],
+                'constraints': [models.UniqueConstraint(fields=('table_name', 'row_id'), name='row_change_row_unique')],
+            },
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0014_row_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.BigIntegerField(help_text='milligrams per batch for ingredients measured in grams, otherwise units')),
+                ('flavor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe', to='choco_app.flavorseason')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_lines', to='choco_app.ingredient')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('flavor', 'ingredient'), name='recipe_flavor_ingredient_unique'), models.CheckConstraint(condition=models.Q(('quantity__gt', 0)), name='recipe_quantity_positive')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:39
+
+import importlib
+
+from django.db import migrations, models
+
+row_changes = importlib.import_module('choco_app.migrations.0014_row_changes')
+
+MAX_QUANTITY = 2**63 - 1
+
+
+def clamp_overflowed_stock(apps, schema_editor):
+    """Stock that overflowed into a REAL must satisfy the new constraint before it can be added."""
+    Ingredient = apps.get_model('choco_app', 'Ingredient')
+    Ingredient.objects.using(schema_editor.connection.alias).filter(stock__gt=MAX_QUANTITY).update(stock=MAX_QUANTITY)
+
+
+def recreate_triggers(apps, schema_editor):
+    """Adding or removing a check constraint rebuilds the table on SQLite, which drops its RowChange triggers."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    table = 'choco_app_ingredient'
+    for statement in row_changes.drop_sql(table) + row_changes.create_sql(table, 'id', table):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0015_recipes'),
+    ]
+
+    operations = [
+        # Reversed, the triggers are recreated after RemoveConstraint has rebuilt the table.
+        migrations.RunPython(clamp_overflowed_stock, recreate_triggers),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.CheckConstraint(condition=models.Q(('stock__lte', 9223372036854775807)), name='ingredient_stock_max'),
+        ),
+        migrations.RunPython(recreate_triggers, migrations.RunPython.noop),
+    ]
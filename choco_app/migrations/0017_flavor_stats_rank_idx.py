@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0016_ingredient_stock_max'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='flavorstats',
+            name='flavor_stats_count_idx',
+        ),
+        migrations.AddIndex(
+            model_name='flavorstats',
+            index=models.Index(fields=['-suggestion_count', 'suggested_flavor'], name='flavor_stats_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:45
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0017_flavor_stats_rank_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customersuggestion',
+            index=models.Index(django.db.models.functions.text.Lower('customer_name'), name='suggestion_customer_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customersuggestion',
+            index=models.Index(django.db.models.functions.text.Lower('suggested_flavor'), name='suggestion_flavor_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('choco_app', '0018_suggestion_prefix_indexes'),
+    ]
+
+    # Only the Python-side default changes; the column is the same. Altering it
+    # would rebuild the tables on SQLite and drop their row change and full-text
+    # triggers, so the database is left alone.
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='allergyissue',
+                name='created_at',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            ),
+            migrations.AlterField(
+                model_name='customersuggestion',
+                name='created_at',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            ),
+            migrations.AlterField(
+                model_name='inquiry',
+                name='created_at',
+                field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+            ),
+        ]),
+    ]
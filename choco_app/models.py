@@ -1,4 +1,98 @@
-from django.db import models
+import string
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce, Lower
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from .cache import FLAVORS, INGREDIENTS, bump_version
+from .units import GRAMS, MAX_QUANTITY, UNIT_CHOICES, format_quantity, from_base
+
+
+class FlavorSeasonQuerySet(models.QuerySet):
+    """
+    Query helpers for FlavorSeason built around the availability window.
+
+    The window predicate (available_from <= day <= available_to) on active rows is
+    served by the partial index `flavor_active_window_idx`.
+    """
+
+    @staticmethod
+    def _window(day):
+        """Return the Q object matching flavors whose availability window contains `day`."""
+        return models.Q(available_from__lte=day, available_to__gte=day)
+
+    def available_on(self, day=None):
+        """
+        Return flavors whose availability window contains `day`.
+
+        Parameters:
+            day (date): The day to check; defaults to today in the current time zone.
+        """
+        return self.filter(self._window(day or timezone.localdate()))
+
+    def current(self, day=None):
+        """
+        Return active flavors that are available on `day` (today by default).
+
+        Parameters:
+            day (date): The day to check; defaults to today in the current time zone.
+        """
+        return self.filter(is_active=True).available_on(day)
+
+    def sorted_by_name(self):
+        """
+        Return these flavors sorted by name, as a list read on first use.
+
+        The sort is done in Python: given ORDER BY name, SQLite walks the unique
+        name index over every flavor and tests each one against the window,
+        instead of searching `flavor_active_window_idx` for the few on offer.
+        Like a queryset, nothing is read until the list is used, so a cached
+        template fragment listing the flavors runs no query.
+        """
+        return SimpleLazyObject(lambda: sorted(self, key=attrgetter('name')))
+
+    async def asorted_by_name(self):
+        """Async variant of `sorted_by_name`."""
+        return sorted([flavor async for flavor in self], key=attrgetter('name'))
+
+    def stale_activation(self, day=None):
+        """
+        Return flavors whose `is_active` flag disagrees with their window on `day`.
+
+        Parameters:
+            day (date): The day to check; defaults to today in the current time zone.
+        """
+        window = self._window(day or timezone.localdate())
+        return self.filter((window & models.Q(is_active=False)) | (~window & models.Q(is_active=True)))
+
+    def sync_activation(self, day=None):
+        """
+        Make `is_active` match the availability window on `day` with a single UPDATE.
+
+        Only stale rows are touched, so running this repeatedly (e.g. from cron) is
+        cheap when nothing is changing.
+
+        Parameters:
+            day (date): The day to synchronise for; defaults to today.
+
+        Returns:
+            int: The number of flavors whose `is_active` flag was flipped.
+        """
+        day = day or timezone.localdate()
+        changed = self.stale_activation(day).update(
+            is_active=models.ExpressionWrapper(self._window(day), output_field=models.BooleanField()),
+            updated_at=timezone.now(),
+        )
+        if changed:
+            # QuerySet.update() sends no post_save signals, so evict cached flavor pages here.
+            bump_version(FLAVORS)
+        return changed
+
 
 class FlavorSeason(models.Model):
     """
@@ -10,33 +104,417 @@ class FlavorSeason(models.Model):
         available_from (date): The date from which the flavor is available.
         available_to (date): The date until which the flavor is available.
         is_active (bool): Indicates whether the flavor is currently active.
+        updated_at (datetime): The timestamp of the last change to the flavor.
     """
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     available_from = models.DateField()
     available_to = models.DateField()
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = FlavorSeasonQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Listing of active flavors (view_seasonal_flavors), ordered by name.
+            models.Index(fields=['is_active', 'name'], name='flavor_active_name_idx'),
+            # "Active and inside its availability window" lookups only ever touch active rows.
+            models.Index(
+                fields=['available_from', 'available_to'],
+                name='flavor_active_window_idx',
+                condition=models.Q(is_active=True),
+            ),
+        ]
 
     def __str__(self):
         """Return the name of the flavor."""
         return self.name
 
 
+class InsufficientStock(ValueError):
+    """
+    Raised when a stock movement would take an ingredient's stock below zero.
+
+    Attributes:
+        ingredient_ids (list[int]): The ingredients that would go negative.
+    """
+    def __init__(self, ingredient_ids):
+        self.ingredient_ids = list(ingredient_ids)
+        super().__init__(f"Insufficient stock for ingredient(s) {', '.join(map(str, self.ingredient_ids))}")
+
+
+class StockLimitExceeded(ValueError):
+    """
+    Raised when a stock movement would take an ingredient's stock above MAX_QUANTITY.
+
+    Attributes:
+        ingredient_ids (list[int]): The ingredients that would overflow.
+    """
+    def __init__(self, ingredient_ids):
+        self.ingredient_ids = list(ingredient_ids)
+        super().__init__(f"Stock limit exceeded for ingredient(s) {', '.join(map(str, self.ingredient_ids))}")
+
+
+STOCK_LEVELS = ('low', 'ok', 'high')
+
+
+class IngredientQuerySet(models.QuerySet):
+    """
+    Query helpers for Ingredient, including atomic stock movements.
+
+    Stock movements are applied as ``stock = stock + delta`` in a single UPDATE,
+    so concurrent terminals never overwrite each other's changes, and the
+    `ingredient_stock_non_negative` and `ingredient_stock_max` check constraints
+    make the database reject any movement that would leave stock below zero or
+    overflow the 64-bit column.
+    """
+
+    def with_stock_level(self, level):
+        """
+        Return ingredients whose stock falls in a 'low', 'ok' or 'high' bucket.
+
+        Bucket boundaries come from the STOCK_LEVEL_THRESHOLDS setting, per unit,
+        and are matched with range predicates on the (unit, stock) index.
+
+        Parameters:
+            level (str): One of STOCK_LEVELS.
+        """
+        condition = models.Q(pk__in=[])
+        for unit, (low, high) in settings.STOCK_LEVEL_THRESHOLDS.items():
+            if level == 'low':
+                bucket = models.Q(stock__lt=low)
+            elif level == 'ok':
+                bucket = models.Q(stock__gte=low, stock__lt=high)
+            elif level == 'high':
+                bucket = models.Q(stock__gte=high)
+            else:
+                raise ValueError(f'Unknown stock level {level!r}')
+            condition |= models.Q(unit=unit) & bucket
+        return self.filter(condition)
+
+    def adjust_stock(self, pk, delta, reason=''):
+        """
+        Increment (positive `delta`) or decrement (negative `delta`) one ingredient's stock.
+
+        Parameters:
+            pk (int): The ingredient's primary key.
+            delta (int): The quantity to add in base units (milligrams or units); negative to remove.
+            reason (str): Why the stock changed (e.g. "delivery", "production").
+
+        Returns:
+            int: The ingredient's stock after the movement, in base units.
+
+        Raises:
+            Ingredient.DoesNotExist: If there is no ingredient with that key.
+            InsufficientStock: If the movement would make the stock negative.
+            StockLimitExceeded: If the movement would take the stock above MAX_QUANTITY.
+        """
+        return self.apply_movements([(pk, delta, reason)])[pk]
+
+    def apply_movements(self, movements):
+        """
+        Apply many stock movements atomically: either all of them succeed or none does.
+
+        Movements for the same ingredient are summed first, and every ingredient is
+        then updated by one ``UPDATE ... SET stock = stock + CASE id WHEN ... END``
+        statement. Each movement is also appended to the StockMovement ledger in
+        the same transaction.
+
+        Parameters:
+            movements (Iterable[tuple[int, int, str]]): (ingredient pk, delta in base units, reason) triples.
+
+        Returns:
+            dict[int, int]: The resulting stock of each affected ingredient, in base units.
+
+        Raises:
+            Ingredient.DoesNotExist: If any ingredient does not exist.
+            InsufficientStock: If any movement would make a stock negative.
+            StockLimitExceeded: If any movement would take a stock above MAX_QUANTITY.
+        """
+        movements = list(movements)
+        totals = {}
+        for pk, delta, _reason in movements:
+            totals[pk] = totals.get(pk, 0) + delta
+        if not totals:
+            return {}
+        # Totals beyond the stock range cannot be applied whatever the stock, nor bound as SQL integers.
+        overflowing = [pk for pk, delta in totals.items() if delta > MAX_QUANTITY]
+        if overflowing:
+            raise StockLimitExceeded(overflowing)
+        short = [pk for pk, delta in totals.items() if delta < -MAX_QUANTITY]
+        if short:
+            raise InsufficientStock(short)
+
+        increment = models.Case(
+            *(models.When(pk=pk, then=models.Value(delta)) for pk, delta in totals.items()),
+            default=models.Value(0),
+            output_field=models.BigIntegerField(),
+        )
+        try:
+            with transaction.atomic(using=self.db):
+                updated = self.filter(pk__in=totals).update(
+                    stock=models.F('stock') + increment,
+                    updated_at=timezone.now(),
+                )
+                if updated != len(totals):
+                    raise self.model.DoesNotExist(
+                        f"Unknown ingredient(s) in {sorted(totals)}"
+                    )
+                StockMovement.objects.using(self.db).bulk_create(
+                    StockMovement(ingredient_id=pk, delta=delta, reason=reason)
+                    for pk, delta, reason in movements
+                )
+                stocks = dict(self.filter(pk__in=totals).values_list('pk', 'stock'))
+        except IntegrityError:
+            # Nothing was written; work out which ingredients were short or full for the caller.
+            stocks = dict(self.filter(pk__in=totals).values_list('pk', 'stock'))
+            overflowing = [pk for pk, delta in totals.items() if stocks.get(pk, 0) + delta > MAX_QUANTITY]
+            if overflowing:
+                raise StockLimitExceeded(overflowing)
+            raise InsufficientStock(pk for pk, delta in totals.items() if stocks.get(pk, 0) + delta < 0)
+
+        # QuerySet.update() sends no post_save signals, so evict cached ingredient pages here.
+        bump_version(INGREDIENTS)
+        return stocks
+
+
 class Ingredient(models.Model):
     """
     Represents an ingredient used in chocolate flavors.
     
     Attributes:
         name (str): The name of the ingredient.
-        stock (float): The quantity of the ingredient available in grams or units.
+        stock (int): The quantity available in base units: milligrams when `unit` is grams, otherwise units.
+        unit (str): The unit the ingredient is measured in (see choco_app.units).
+        updated_at (datetime): The timestamp of the last change to the ingredient.
     """
     name = models.CharField(max_length=100, unique=True)
-    stock = models.FloatField(help_text="grams or units")
-    
+    stock = models.BigIntegerField(help_text="milligrams for ingredients measured in grams, otherwise units")
+    unit = models.CharField(max_length=10, choices=UNIT_CHOICES, default=GRAMS)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = IngredientQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name='ingredient_stock_non_negative'),
+            # Integer overflow in ``stock + delta`` yields a REAL, which fails this check instead of being stored.
+            models.CheckConstraint(condition=models.Q(stock__lte=MAX_QUANTITY), name='ingredient_stock_max'),
+        ]
+        indexes = [
+            # Serves the stock level (low/ok/high) buckets of the admin changelist filter.
+            models.Index(fields=['unit', 'stock'], name='ingredient_unit_stock_idx'),
+        ]
+
     def __str__(self):
         """Return the name of the ingredient."""
         return self.name
 
+    @property
+    def quantity(self):
+        """Return the stock in display units (grams or units) as an exact Decimal."""
+        return from_base(self.stock, self.unit)
+
+    def get_stock_display(self):
+        """Return the stock formatted with its unit, e.g. "12.5 grams"."""
+        return format_quantity(self.stock, self.unit)
+
+    def stock_as_of(self, when):
+        """
+        Return the ingredient's stock at a point in time, reconstructed from the ledger.
+
+        Reads the latest snapshot taken at or before `when` plus the movements
+        recorded after it, which `compact_stock_ledger` keeps to a bounded tail.
+        For times inside already compacted history the result is exact at each
+        snapshot and otherwise reflects the most recent snapshot before `when`.
+
+        Parameters:
+            when (datetime): The point in time.
+
+        Returns:
+            int: The stock at `when` in base units (0 before the ingredient's first movement).
+        """
+        snapshot = self.stock_snapshots.filter(taken_at__lte=when).order_by('-taken_at').first()
+        tail = self.stock_movements.filter(created_at__lte=when)
+        base = 0
+        if snapshot is not None:
+            base = snapshot.stock
+            tail = tail.filter(created_at__gt=snapshot.taken_at)
+        return base + (tail.aggregate(total=models.Sum('delta'))['total'] or 0)
+
+
+class RecipeIngredient(models.Model):
+    """
+    One line of a flavor's recipe (bill of materials): how much of an ingredient one batch uses.
+
+    The production planner (choco_app/planner.py) reads these lines to work out
+    how many batches of each flavor the current stock allows.
+
+    Attributes:
+        flavor (ForeignKey): The flavor the recipe makes.
+        ingredient (ForeignKey): The ingredient used.
+        quantity (int): The quantity one batch uses, in the ingredient's base units (see Ingredient.stock).
+    """
+    flavor = models.ForeignKey(FlavorSeason, related_name='recipe', on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(Ingredient, related_name='recipe_lines', on_delete=models.CASCADE)
+    quantity = models.BigIntegerField(help_text="milligrams per batch for ingredients measured in grams, otherwise units")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['flavor', 'ingredient'], name='recipe_flavor_ingredient_unique'),
+            models.CheckConstraint(condition=models.Q(quantity__gt=0), name='recipe_quantity_positive'),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the recipe line."""
+        return f"{self.flavor_id}: {format_quantity(self.quantity, self.ingredient.unit)} of {self.ingredient.name}"
+
+
+class StockMovementQuerySet(models.QuerySet):
+    """Query helpers for the StockMovement ledger."""
+
+    def compact(self, cutoff, batch_size=1000):
+        """
+        Roll every movement recorded at or before `cutoff` into per-ingredient snapshots.
+
+        For each ingredient with such movements a StockSnapshot at `cutoff` is
+        written holding its latest earlier snapshot plus the sum of those
+        movements, and the movements are then deleted, all in one transaction.
+        Run periodically (e.g. nightly with a retention window) this keeps the
+        ledger tail that `Ingredient.stock_as_of` has to sum bounded.
+
+        Parameters:
+            cutoff (datetime): Movements recorded at or before this time are compacted.
+            batch_size (int): The number of snapshots written per INSERT.
+
+        Returns:
+            tuple[int, int]: The number of snapshots written and movements deleted.
+        """
+        latest_snapshot = StockSnapshot.objects.filter(
+            ingredient=models.OuterRef('ingredient'), taken_at__lte=cutoff,
+        ).order_by('-taken_at').values('stock')[:1]
+        totals = (
+            self.filter(created_at__lte=cutoff)
+            .order_by()
+            .values('ingredient')
+            .annotate(
+                total=models.Sum('delta'),
+                base=Coalesce(models.Subquery(latest_snapshot), models.Value(0)),
+            )
+            .values_list('ingredient', 'base', 'total')
+        )
+        with transaction.atomic():
+            snapshots = (
+                StockSnapshot(ingredient_id=ingredient, taken_at=cutoff, stock=base + total)
+                for ingredient, base, total in totals.iterator(chunk_size=batch_size)
+            )
+            written = 0
+            while True:
+                batch = list(islice(snapshots, batch_size))
+                if not batch:
+                    break
+                StockSnapshot.objects.bulk_create(
+                    batch, update_conflicts=True,
+                    unique_fields=['ingredient', 'taken_at'], update_fields=['stock'],
+                )
+                written += len(batch)
+            deleted, _ = self.filter(created_at__lte=cutoff).delete()
+        return written, deleted
+
+
+class StockMovement(models.Model):
+    """
+    An append-only ledger entry recording one change to an ingredient's stock.
+
+    `Ingredient.stock` is the materialized sum of an ingredient's ledger and is
+    kept up to date in the same transaction that appends each movement.
+
+    Attributes:
+        ingredient (ForeignKey): The ingredient whose stock changed.
+        delta (int): The change in stock in base units; negative when stock was removed.
+        reason (str): Why the stock changed.
+        created_at (datetime): When the movement was recorded.
+    """
+    ingredient = models.ForeignKey(Ingredient, related_name='stock_movements', on_delete=models.CASCADE)
+    delta = models.BigIntegerField()
+    reason = models.CharField(max_length=200)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = StockMovementQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ingredient', 'created_at'], name='movement_ingredient_time_idx'),
+            models.Index(fields=['created_at'], name='movement_time_idx'),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the stock movement."""
+        return f"{self.delta:+d} ({self.reason})"
+
+
+class StockSnapshot(models.Model):
+    """
+    An ingredient's stock at a point in time, produced by compacting older ledger entries.
+
+    Attributes:
+        ingredient (ForeignKey): The ingredient the snapshot belongs to.
+        taken_at (datetime): The point in time the snapshot describes.
+        stock (int): The ingredient's stock at `taken_at`, in base units.
+    """
+    ingredient = models.ForeignKey(Ingredient, related_name='stock_snapshots', on_delete=models.CASCADE)
+    taken_at = models.DateTimeField()
+    stock = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ingredient', 'taken_at'], name='snapshot_ingredient_time_unique'),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the snapshot."""
+        return f"{self.ingredient_id} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.stock}"
+
+
+# SQLite's LOWER() folds ASCII letters only; terms are folded the same way to match it.
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class CustomerSuggestionQuerySet(models.QuerySet):
+    """Query helpers for CustomerSuggestion that load related rows in bulk instead of per row."""
+
+    def starting_with(self, field, term):
+        """
+        Return the suggestions whose `field` starts with `term`, ignoring ASCII case, ordered by it.
+
+        `istartswith` compiles to LIKE, which SQLite cannot serve from an index
+        on the column, so it scans every row. The prefix is matched instead as
+        a range over LOWER(field), served in order by the functional indexes on
+        the lowercased customer name and suggested flavor: reading the first
+        matches under a LIMIT costs the same however large the table is.
+
+        Parameters:
+            field (str): 'customer_name' or 'suggested_flavor'.
+            term (str): The non-empty prefix.
+        """
+        low = term.translate(ASCII_LOWER)
+        key = f'{field}_lower'
+        matches = self.alias(**{key: Lower(field)}).filter(**{f'{key}__gte': low})
+        if ord(low[-1]) < 0x10FFFF:
+            matches = matches.filter(**{f'{key}__lt': low[:-1] + chr(ord(low[-1]) + 1)})
+        return matches.order_by(key, 'pk')
+
+    def with_ingredients(self):
+        """Prefetch the suggested ingredients of every suggestion in one extra query."""
+        return self.prefetch_related('ingredients')
+
+    def with_allergy_issues(self):
+        """Prefetch the allergy issues, and their ingredients, of every suggestion in one extra query."""
+        return self.prefetch_related(
+            models.Prefetch('allergy_issues', queryset=AllergyIssue.objects.select_related('ingredient'))
+        )
+
 
 class CustomerSuggestion(models.Model):
     """
@@ -48,18 +526,46 @@ class CustomerSuggestion(models.Model):
         suggested_flavor (str): The suggested flavor by the customer.
         suggestion_reason (str): The reason for the suggestion (optional).
         ingredients (ManyToManyField): Ingredients related to the suggested flavor.
+        created_at (datetime): When the suggestion was made (submitted, if it was queued).
     """
     customer_name = models.CharField(max_length=100)
     customer_email = models.EmailField()
     suggested_flavor = models.CharField(max_length=100)
     suggestion_reason = models.TextField(blank=True, null=True)
     ingredients = models.ManyToManyField(Ingredient, related_name='suggestions', blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = CustomerSuggestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer_email'], name='suggestion_email_idx'),
+            models.Index(fields=['suggested_flavor'], name='suggestion_flavor_idx'),
+            models.Index(fields=['customer_name'], name='suggestion_customer_idx'),
+            models.Index(fields=['created_at'], name='suggestion_created_idx'),
+            # Serve the case-insensitive prefix searches of `starting_with`.
+            models.Index(Lower('customer_name'), name='suggestion_customer_lower_idx'),
+            models.Index(Lower('suggested_flavor'), name='suggestion_flavor_lower_idx'),
+        ]
 
     def __str__(self):
         """Return a string representation of the suggestion."""
         return f"{self.customer_name} - {self.suggested_flavor}"
 
 
+class AllergyIssueQuerySet(models.QuerySet):
+    """Query helpers for AllergyIssue."""
+
+    def with_related(self):
+        """
+        Join the customer suggestion and ingredient into the same query.
+
+        `AllergyIssue.__str__` reads both, so listings should use this to avoid
+        two extra queries per row.
+        """
+        return self.select_related('customer_suggestion', 'ingredient')
+
+
 class AllergyIssue(models.Model):
     """
     Represents an allergy concern related to a customer suggestion.
@@ -68,15 +574,102 @@ class AllergyIssue(models.Model):
         customer_suggestion (ForeignKey): The related customer suggestion that the allergy issue is associated with.
         ingredient (ForeignKey): The ingredient that is causing the allergy issue.
         concern_detail (str): Details about the allergy concern.
+        created_at (datetime): When the allergy issue was reported (submitted, if it was queued).
     """
     customer_suggestion = models.ForeignKey(CustomerSuggestion, related_name="allergy_issues", on_delete=models.CASCADE)
     ingredient = models.ForeignKey(Ingredient, related_name="allergy_problems", on_delete=models.CASCADE)
     concern_detail = models.TextField(help_text="Details about the allergy concern")
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = AllergyIssueQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='allergy_issue_created_idx'),
+        ]
 
     def __str__(self):
-        """Return a string representation of the allergy issue."""
+        """Return a string representation of the allergy issue (see `AllergyIssueQuerySet.with_related`)."""
         return f"Allergy Issue: {self.customer_suggestion.customer_name} - {self.ingredient.name}"
-    
+
+
+class AllergenStats(models.Model):
+    """
+    Precomputed allergen figures of one ingredient, kept current by `choco_app.allergens`.
+
+    Attributes:
+        ingredient (OneToOneField): The ingredient the figures describe.
+        allergy_issue_count (int): Allergy issues reported against the ingredient.
+        suggestion_count (int): Customer suggestions that use the ingredient.
+    """
+    ingredient = models.OneToOneField(
+        Ingredient, primary_key=True, related_name='allergen_stats', on_delete=models.CASCADE,
+    )
+    allergy_issue_count = models.PositiveIntegerField(default=0)
+    suggestion_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'allergen stats'
+        indexes = [
+            models.Index(fields=['-allergy_issue_count'], name='allergen_issue_count_idx'),
+            models.Index(fields=['-suggestion_count'], name='allergen_suggestion_count_idx'),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the allergen figures."""
+        return f"{self.ingredient_id}: {self.allergy_issue_count} issue(s), {self.suggestion_count} suggestion(s)"
+
+
+class FlavorStats(models.Model):
+    """
+    Materialized count of the customer suggestions for one flavor, kept current by `choco_app.analytics`.
+
+    Attributes:
+        suggested_flavor (str): The flavor, as typed in the suggestions.
+        suggestion_count (int): Suggestions made for the flavor.
+    """
+    suggested_flavor = models.CharField(max_length=100, unique=True)
+    suggestion_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'flavor stats'
+        indexes = [
+            # In the ranking order of `analytics.top_flavors`, so the top N are read without sorting.
+            models.Index(fields=['-suggestion_count', 'suggested_flavor'], name='flavor_stats_rank_idx'),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the flavor count."""
+        return f"{self.suggested_flavor}: {self.suggestion_count}"
+
+
+class DailyActivity(models.Model):
+    """
+    Materialized counts of one day's suggestions and allergy issues, kept current by `choco_app.analytics`.
+
+    Attributes:
+        day (date): The day, in the current time zone.
+        suggestion_count (int): Suggestions made that day.
+        allergy_issue_count (int): Allergy issues reported that day.
+    """
+    day = models.DateField(primary_key=True)
+    suggestion_count = models.PositiveIntegerField(default=0)
+    allergy_issue_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily activity'
+
+    def __str__(self):
+        """Return a string representation of the day's counts."""
+        return f"{self.day}: {self.suggestion_count} suggestion(s), {self.allergy_issue_count} allergy issue(s)"
+
+    @property
+    def allergy_issue_rate(self):
+        """Allergy issues per suggestion made that day, or None on a day without suggestions."""
+        if not self.suggestion_count:
+            return None
+        return self.allergy_issue_count / self.suggestion_count
+
 
 class Inquiry(models.Model):
     """
@@ -86,13 +679,111 @@ class Inquiry(models.Model):
         name (str): The name of the person making the inquiry.
         email (str): The email address of the person making the inquiry.
         message (str): The content of the inquiry message.
-        created_at (datetime): The timestamp when the inquiry was created.
+        created_at (datetime): The timestamp when the inquiry was submitted.
     """
     name = models.CharField(max_length=100)
     email = models.EmailField()
     message = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='inquiry_created_idx'),
+        ]
 
     def __str__(self):
         """Return a string representation of the inquiry."""
         return f"Inquiry from {self.name} - {self.email}"
+
+
+# Public form submissions that can be queued for write-behind (see choco_app/submissions.py).
+SUBMISSION_KINDS = [
+    ('suggestion', 'Customer suggestion'),
+    ('allergy_issue', 'Allergy issue'),
+    ('inquiry', 'Inquiry'),
+]
+
+
+class PendingSubmissionQuerySet(models.QuerySet):
+    """Query helpers for the submission queue."""
+
+    def ready(self, now=None):
+        """Return the pending submissions due for (another) delivery attempt, oldest first."""
+        return self.filter(
+            status=PendingSubmission.PENDING, available_at__lte=now or timezone.now(),
+        ).order_by('pk')
+
+
+class PendingSubmission(models.Model):
+    """
+    A validated public form submission waiting to be written by the queue worker.
+
+    A submission is deleted in the same transaction that writes the row(s) it
+    describes, so it is delivered at least once and, barring a crash between a
+    failed commit and its retry, exactly once.
+
+    Attributes:
+        kind (str): Which form the submission came from (see SUBMISSION_KINDS).
+        payload (dict): The form's cleaned data, with related objects replaced by their keys.
+        status (str): 'pending' while it will be retried, 'failed' once it has run out of attempts.
+        attempts (int): Failed delivery attempts so far.
+        available_at (datetime): Not delivered before this time (backoff after a failure).
+        last_error (str): The error of the last failed attempt.
+        created_at (datetime): When the submission was queued.
+    """
+    PENDING = 'pending'
+    FAILED = 'failed'
+
+    kind = models.CharField(max_length=20, choices=SUBMISSION_KINDS)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=[(PENDING, 'Pending'), (FAILED, 'Failed')], default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PendingSubmissionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='submission_ready_idx'),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the queued submission."""
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+
+class RowChange(models.Model):
+    """
+    The latest change to one row of a table published by the JSON API.
+
+    Rows are written by SQLite triggers on the published tables (see migration
+    0014_row_changes), so every write path (forms, admin, QuerySet.update(),
+    bulk operations, cascades and raw SQL) is recorded. A change replaces the
+    previous entry of its row and takes a new, higher version, so the table
+    holds one entry per row ever written and "what changed after version N"
+    is a range scan of the (table_name, version) index. A schema change that
+    rebuilds a published table drops its triggers; such migrations must
+    recreate them.
+
+    Attributes:
+        version (int): Auto-incrementing, never reused; the version API clients sync from.
+        table_name (str): The database table of the changed row.
+        row_id (int): The primary key of the changed (possibly deleted) row.
+    """
+    version = models.BigAutoField(primary_key=True)
+    table_name = models.CharField(max_length=64)
+    row_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['table_name', 'row_id'], name='row_change_row_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['table_name', 'version'], name='row_change_version_idx'),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the change."""
+        return f"{self.table_name} #{self.row_id} @ {self.version}"
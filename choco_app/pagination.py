@@ -0,0 +1,199 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    A single page of results produced by keyset (cursor) pagination.
+
+    Attributes:
+        items (list): The objects on this page.
+        next_cursor (str): Opaque cursor for the following page, or None on the last page.
+        page_size (int): The page size that was requested.
+    """
+    def __init__(self, items, next_cursor, page_size):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+
+    @property
+    def has_next(self):
+        """Return True if there is a page after this one."""
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    """
+    Encode the ordering values of the last row on a page into an opaque, URL-safe cursor.
+
+    Parameters:
+        values (Sequence): The values of the ordering fields for the last row.
+
+    Returns:
+        str: The encoded cursor.
+    """
+    raw = json.dumps(list(values), cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, length):
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Parameters:
+        token (str): The cursor taken from the query string.
+        length (int): The number of ordering fields the cursor must contain.
+
+    Returns:
+        list: The decoded ordering values, or None if the cursor is missing or malformed.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+
+def keyset_filter(ordering, values):
+    """
+    Build the "strictly after this row" predicate for a lexicographic ordering.
+
+    For ordering (a, b) and values (x, y) this yields
+    ``a >= x AND (a > x OR (a = x AND b > y))``. The redundant leading ``a >= x``
+    lets SQLite start a range search on an index over `a` instead of walking the
+    index from the beginning, and unlike OFFSET no rows are counted and skipped.
+
+    Parameters:
+        ordering (Sequence[str]): Ascending field names, the last of which must be unique.
+        values (Sequence): The ordering values of the last row already seen.
+
+    Returns:
+        Q: The filter to apply to the queryset.
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        step = Q(**{f'{field}__gt': values[index]})
+        for prior, value in zip(ordering[:index], values[:index]):
+            step &= Q(**{prior: value})
+        condition |= step
+    return Q(**{f'{ordering[0]}__gte': values[0]}) & condition
+
+
+def get_page_size(request, default_setting='INGREDIENT_PAGE_SIZE', max_setting='INGREDIENT_MAX_PAGE_SIZE'):
+    """
+    Read the requested page size from the query string, clamped to the configured bounds.
+
+    Parameters:
+        request (HttpRequest): The request object.
+        default_setting (str): Name of the setting holding the default page size.
+        max_setting (str): Name of the setting holding the largest allowed page size.
+
+    Returns:
+        int: The page size to use.
+    """
+    default = getattr(settings, default_setting, 50)
+    maximum = getattr(settings, max_setting, 500)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def keyset_paginate(queryset, cursor=None, page_size=50, ordering=('name', 'pk')):
+    """
+    Return one page of `queryset` after `cursor`, ordered by `ordering`.
+
+    One extra row is fetched to find out whether a further page exists, so no
+    COUNT(*) query is issued and the cost of a page does not depend on how deep
+    into the table it is.
+
+    Parameters:
+        queryset (QuerySet): The queryset to paginate.
+        cursor (str): The cursor returned with the previous page, if any.
+        page_size (int): The number of rows per page.
+        ordering (Sequence[str]): Ascending field names, the last of which must be unique.
+
+    Returns:
+        KeysetPage: The requested page.
+    """
+    rows = list(_page_queryset(queryset, cursor, page_size, ordering))
+    return _make_page(rows, page_size, ordering)
+
+
+async def akeyset_paginate(queryset, cursor=None, page_size=50, ordering=('name', 'pk')):
+    """Async variant of `keyset_paginate`, reading the rows with the async ORM API."""
+    rows = [row async for row in _page_queryset(queryset, cursor, page_size, ordering)]
+    return _make_page(rows, page_size, ordering)
+
+
+def _page_queryset(queryset, cursor, page_size, ordering):
+    queryset = queryset.order_by(*ordering)
+    values = clean_cursor_values(queryset.model, ordering, decode_cursor(cursor, len(ordering)))
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(ordering, values))
+    return queryset[:page_size + 1]
+
+
+def clean_cursor_values(model, ordering, values):
+    """
+    Convert decoded cursor values to the types of the ordering fields.
+
+    A cursor comes from the query string and may have been edited, so a value
+    the field cannot hold (a word for a primary key, a null, an integer out of
+    range) makes the whole cursor invalid instead of failing the query.
+
+    Parameters:
+        model (type[Model]): The model being paginated.
+        ordering (Sequence[str]): The ordering field names.
+        values (list): The values returned by `decode_cursor`, or None.
+
+    Returns:
+        list: The converted values, or None if `values` is None or any value is invalid.
+    """
+    if values is None:
+        return None
+    cleaned = []
+    for name, value in zip(ordering, values):
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        if value is None:
+            return None
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except ValidationError:
+            return None
+        cleaned.append(value)
+    return cleaned
+
+
+def _make_page(rows, page_size, ordering):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(_ordering_values(last, ordering))
+    return KeysetPage(rows, next_cursor, page_size)
+
+
+def _ordering_values(row, ordering):
+    """Return the values of the ordering fields for a model instance or values() dict."""
+    if isinstance(row, dict):
+        return [row[field] for field in ordering]
+    return [getattr(row, field) for field in ordering]
@@ -0,0 +1,273 @@
+from django.core.exceptions import ImproperlyConfigured
+
+from .models import FlavorStats, RecipeIngredient
+
+try:
+    import numpy as np
+except ImportError:  # Optional: without it the production planner is unavailable.
+    np = None
+
+# How the stock is shared between flavors: equally, or in proportion to the
+# customer suggestions for each flavor (plus one, so every flavor gets a share).
+EQUAL = 'equal'
+DEMAND = 'demand'
+WEIGHTINGS = (EQUAL, DEMAND)
+
+
+def available():
+    """Return whether the planner can run (NumPy is installed)."""
+    return np is not None
+
+
+def _ranges(starts, ends):
+    """Return the concatenation of ``range(start, end)`` for each pair, without a Python loop."""
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+class Recipes:
+    """
+    The recipes of the planned flavors and the stock of their ingredients, as NumPy arrays.
+
+    Recipe lines are kept sparse, one entry per line sorted by flavor: a flavor
+    uses a handful of ingredients, so a dense flavors x ingredients matrix
+    would be mostly zeros and, with thousands of each, hundreds of megabytes.
+    Only the ingredients used by some recipe are loaded. Quantities and stock
+    are int64 base units, so every sum is exact.
+
+    Attributes:
+        flavor_ids (ndarray): Flavor primary keys, ascending.
+        flavor_names (list[str]): The flavor names, by flavor index.
+        ingredient_ids (ndarray): Ingredient primary keys, ascending.
+        ingredient_names (list[str]): The ingredient names, by ingredient index.
+        ingredient_units (list[str]): The ingredient units, by ingredient index.
+        stock (ndarray): The stock of each ingredient.
+        line_flavor (ndarray): The flavor index of each recipe line.
+        line_ingredient (ndarray): The ingredient index of each recipe line.
+        line_quantity (ndarray): The quantity one batch uses, for each recipe line.
+        flavor_starts (ndarray): The index of each flavor's first line.
+        flavor_ends (ndarray): The index after each flavor's last line.
+        by_ingredient (ndarray): The line indices sorted by ingredient.
+        ingredient_starts (ndarray): The position in `by_ingredient` of each ingredient's first line.
+        ingredient_ends (ndarray): The position in `by_ingredient` after each ingredient's last line.
+    """
+    def __init__(self, rows):
+        """
+        Parameters:
+            rows (list[tuple]): (flavor id, flavor name, ingredient id, ingredient name, unit,
+                                stock, quantity) of every recipe line, ordered by flavor id.
+        """
+        columns = list(zip(*rows)) or [()] * 7
+        flavor_ids, flavor_names, ingredient_ids, ingredient_names, units, stock, quantity = columns
+        self.flavor_ids, self.flavor_starts, self.line_flavor = np.unique(
+            np.array(flavor_ids, dtype=np.int64), return_index=True, return_inverse=True,
+        )
+        self.ingredient_ids, first_lines, self.line_ingredient = np.unique(
+            np.array(ingredient_ids, dtype=np.int64), return_index=True, return_inverse=True,
+        )
+        self.flavor_names = [flavor_names[line] for line in self.flavor_starts]
+        self.ingredient_names = [ingredient_names[line] for line in first_lines]
+        self.ingredient_units = [units[line] for line in first_lines]
+        self.stock = np.array(stock, dtype=np.int64)[first_lines]
+        self.line_quantity = np.array(quantity, dtype=np.int64)
+        self.flavor_ends = np.append(self.flavor_starts[1:], len(self.line_quantity)).astype(np.intp)
+        self.by_ingredient = np.argsort(self.line_ingredient, kind='stable')
+        self.ingredient_starts = np.searchsorted(
+            self.line_ingredient[self.by_ingredient], np.arange(len(self.ingredient_ids)),
+        )
+        self.ingredient_ends = np.append(self.ingredient_starts[1:], len(self.line_quantity)).astype(np.intp)
+
+    def __len__(self):
+        return len(self.flavor_ids)
+
+    def usage(self, batches):
+        """
+        Return how much of each ingredient the given batches of each flavor use.
+
+        Parameters:
+            batches (ndarray): Batches (or a rate of batches) of each flavor.
+
+        Returns:
+            ndarray: The quantity of each ingredient, int64 for integer `batches`.
+        """
+        if not len(self.ingredient_ids):
+            return np.zeros(0, dtype=np.int64)
+        per_line = self.line_quantity * batches[self.line_flavor]
+        return np.add.reduceat(per_line[self.by_ingredient], self.ingredient_starts)
+
+    def capacity(self, stock=None):
+        """
+        Return the most batches of each flavor that `stock` allows, each flavor on its own.
+
+        Parameters:
+            stock (ndarray): The stock of each ingredient; the loaded stock by default.
+
+        Returns:
+            tuple[ndarray, ndarray]: The batches of each flavor and the index of the
+            ingredient limiting it (the first such ingredient on ties).
+        """
+        stock = self.stock if stock is None else stock
+        if not len(self):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.intp)
+        per_line = stock[self.line_ingredient] // self.line_quantity
+        batches = np.minimum.reduceat(per_line, self.flavor_starts)
+        lines = np.arange(len(per_line))
+        limiting = np.where(per_line == batches[self.line_flavor], lines, len(per_line))
+        return batches, self.line_ingredient[np.minimum.reduceat(limiting, self.flavor_starts)]
+
+    def allocate(self, weights=None):
+        """
+        Share the stock between the flavors: how many batches of each to make together.
+
+        Progressive filling: every flavor grows at the rate of its weight until
+        one of its ingredients runs out, then the others carry on with what is
+        left. Each round jumps straight to the next ingredient to run out with a
+        few array operations over the recipe lines, so the number of rounds is
+        at most the number of ingredients, however many batches are made. The
+        fill is rounded down to whole batches and the leftovers are handed out a
+        batch at a time by decreasing weight.
+
+        The result never uses more than the stock, and no flavor can make another
+        batch from what is left. It shares fairly rather than maximising the total
+        number of batches, which would hand everything to the cheapest flavor.
+
+        Parameters:
+            weights (ndarray): The share of each flavor; equal by default. Flavors weighted 0 get nothing.
+
+        Returns:
+            tuple[ndarray, ndarray]: The batches of each flavor and the stock left of each ingredient.
+        """
+        weights = np.ones(len(self)) if weights is None else np.asarray(weights, dtype=float)
+        stock = self.stock.astype(float)
+        used = np.zeros(len(stock))
+        level = np.zeros(len(self))
+        fill = 0.0
+        growing = weights > 0
+        # How fast each ingredient drains, and how many growing flavors drain it
+        # (exact, where the float rates may keep a residue once they all stop).
+        rates = self.usage(weights * growing)
+        drains = np.bincount(self.line_ingredient[growing[self.line_flavor]], minlength=len(stock))
+        while growing.any():
+            draining = np.flatnonzero(drains)
+            steps = (stock[draining] - used[draining]) / rates[draining]
+            step = max(steps.min(), 0.0)
+            fill += step
+            used += step * rates
+            # Only the lines of the ingredients running out and of the flavors they stop are read.
+            empty = draining[steps <= step * (1 + 1e-9)]
+            stopping = np.unique(self.line_flavor[self.by_ingredient[
+                _ranges(self.ingredient_starts[empty], self.ingredient_ends[empty])
+            ]])
+            stopping = stopping[growing[stopping]]
+            level[stopping] = fill
+            growing[stopping] = False
+            lines = _ranges(self.flavor_starts[stopping], self.flavor_ends[stopping])
+            ingredients = self.line_ingredient[lines]
+            rates -= np.bincount(
+                ingredients, weights=self.line_quantity[lines] * weights[self.line_flavor[lines]], minlength=len(stock),
+            )
+            drains -= np.bincount(ingredients, minlength=len(stock))
+
+        batches = np.floor(weights * level * (1 + 1e-12)).astype(np.int64)
+        remaining = self.stock - self.usage(batches)
+        while (remaining < 0).any():
+            # Undo a batch wherever float rounding overshot the stock.
+            short = np.logical_or.reduceat((remaining < 0)[self.line_ingredient], self.flavor_starts)
+            batches[short & (batches > 0)] -= 1
+            remaining = self.stock - self.usage(batches)
+        order = np.argsort(-weights, kind='stable')
+        candidates = order[(self.capacity(remaining)[0] > 0)[order] & (weights[order] > 0)]
+        while len(candidates):
+            # Stock only shrinks, so a flavor that does not fit once is done.
+            fitting = []
+            for flavor in candidates:
+                lines = slice(self.flavor_starts[flavor], self.flavor_ends[flavor])
+                ingredients, quantities = self.line_ingredient[lines], self.line_quantity[lines]
+                if (remaining[ingredients] >= quantities).all():
+                    remaining[ingredients] -= quantities
+                    batches[flavor] += 1
+                    fitting.append(flavor)
+            candidates = fitting
+        return batches, remaining
+
+
+def load(active_only=True, using=None):
+    """
+    Read the recipes and ingredient stock with one query.
+
+    Parameters:
+        active_only (bool): Plan only the flavors currently on sale (`is_active`).
+        using (str): The database alias to read.
+
+    Returns:
+        Recipes: The recipes of every flavor that has one.
+
+    Raises:
+        ImproperlyConfigured: If NumPy is not installed.
+    """
+    if not available():
+        raise ImproperlyConfigured('The production planner requires NumPy.')
+    lines = RecipeIngredient.objects.using(using)
+    if active_only:
+        lines = lines.filter(flavor__is_active=True)
+    return Recipes(list(lines.order_by('flavor_id').values_list(
+        'flavor_id', 'flavor__name', 'ingredient_id', 'ingredient__name', 'ingredient__unit', 'ingredient__stock',
+        'quantity',
+    )))
+
+
+def demand_weights(recipes, using=None):
+    """Return the weight of each flavor under DEMAND: its customer suggestions plus one."""
+    counts = dict(
+        FlavorStats.objects.using(using).filter(suggested_flavor__in=recipes.flavor_names)
+        .values_list('suggested_flavor', 'suggestion_count')
+    )
+    return np.array([counts.get(name, 0) + 1 for name in recipes.flavor_names], dtype=float)
+
+
+def plan(weighting=EQUAL, active_only=True, using=None):
+    """
+    Work out what the current stock can produce.
+
+    Parameters:
+        weighting (str): EQUAL or DEMAND, how `Recipes.allocate` shares the stock.
+        active_only (bool): Plan only the flavors currently on sale.
+        using (str): The database alias to read.
+
+    Returns:
+        dict: "flavors", by name: id, name, weight, max_batches (on its own),
+        limited_by (the ingredient that caps max_batches) and batches (in the
+        shared plan); and "ingredients", by name: id, name, unit, stock, used
+        and left, in base units.
+
+    Raises:
+        ImproperlyConfigured: If NumPy is not installed.
+        ValueError: If `weighting` is unknown.
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting {weighting!r}. Choose from {', '.join(WEIGHTINGS)}.")
+    recipes = load(active_only, using)
+    weights = demand_weights(recipes, using) if weighting == DEMAND else np.ones(len(recipes))
+    max_batches, limiting = recipes.capacity()
+    batches, left = recipes.allocate(weights)
+    flavors = [
+        {
+            'id': int(recipes.flavor_ids[index]), 'name': recipes.flavor_names[index],
+            'weight': float(weights[index]), 'max_batches': int(max_batches[index]),
+            'limited_by': recipes.ingredient_names[limiting[index]], 'batches': int(batches[index]),
+        }
+        for index in range(len(recipes))
+    ]
+    ingredients = [
+        {
+            'id': int(recipes.ingredient_ids[index]), 'name': recipes.ingredient_names[index],
+            'unit': recipes.ingredient_units[index], 'stock': int(recipes.stock[index]),
+            'used': int(recipes.stock[index] - left[index]), 'left': int(left[index]),
+        }
+        for index in range(len(recipes.ingredient_ids))
+    ]
+    return {
+        'flavors': sorted(flavors, key=lambda row: row['name']),
+        'ingredients': sorted(ingredients, key=lambda row: row['name']),
+    }
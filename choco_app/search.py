@@ -0,0 +1,132 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+# FTS5 tables created by migration 0010_full_text_search, keyed by the model they index.
+SUGGESTION_INDEX = 'choco_app_suggestion_fts'
+INQUIRY_INDEX = 'choco_app_inquiry_fts'
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def match_expression(term):
+    """
+    Turn free text typed by a user into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix query and the words are ANDed together, so
+    "mint choc" finds rows containing a word starting with "mint" and one starting
+    with "choc". Quoting keeps FTS5 operators and punctuation in the input from
+    being parsed as query syntax.
+
+    Parameters:
+        term (str): The search text.
+
+    Returns:
+        str: The MATCH expression, or an empty string if `term` has no words.
+    """
+    return ' '.join(f'"{word}"*' for word in _WORD.findall(term))
+
+
+def fts_available():
+    """Return True if the database has the FTS5 indexes (SQLite only)."""
+    return connection.vendor == 'sqlite'
+
+
+def match_ids(index, term):
+    """
+    Return a subquery expression selecting the ids of the rows of `index` that match `term`.
+
+    Used as ``queryset.filter(pk__in=match_ids(...))``; SQLite answers it from the
+    FTS5 index instead of scanning the indexed table.
+
+    Parameters:
+        index (str): The FTS5 table name, e.g. SUGGESTION_INDEX.
+        term (str): The search text.
+
+    Returns:
+        RawSQL: The subquery.
+    """
+    return RawSQL(f'SELECT rowid FROM {index} WHERE {index} MATCH %s', (match_expression(term),))
+
+
+def ranked_ids(index, term, limit):
+    """
+    Return the ids of the best `limit` rows of `index` matching `term`, best first.
+
+    Rows are ranked with FTS5's built-in bm25 ``rank``.
+
+    Parameters:
+        index (str): The FTS5 table name, e.g. SUGGESTION_INDEX.
+        term (str): The search text.
+        limit (int): The maximum number of ids to return.
+
+    Returns:
+        list[int]: The matching ids.
+    """
+    expression = match_expression(term)
+    if not expression:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {index} WHERE {index} MATCH %s ORDER BY rank LIMIT %s',
+            [expression, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def filter_queryset(queryset, index, term, fallback_fields):
+    """
+    Restrict `queryset` to rows matching `term`, using the FTS5 index when available.
+
+    On databases without the FTS5 indexes every word must appear (icontains) in
+    one of `fallback_fields` instead.
+
+    Parameters:
+        queryset (QuerySet): The queryset to filter.
+        index (str): The FTS5 table name, e.g. SUGGESTION_INDEX.
+        term (str): The search text.
+        fallback_fields (Sequence[str]): Fields searched when FTS5 is not available.
+
+    Returns:
+        QuerySet: The filtered queryset.
+    """
+    if not match_expression(term):
+        return queryset
+    if fts_available():
+        return queryset.filter(pk__in=match_ids(index, term))
+    for word in _WORD.findall(term):
+        condition = Q()
+        for field in fallback_fields:
+            condition |= Q(**{f'{field}__icontains': word})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def ranked_search(queryset, index, term, limit, fallback_fields):
+    """
+    Return up to `limit` rows of `queryset` matching `term`, most relevant first.
+
+    With FTS5 the ids are ranked by bm25 in the index and the rows are then read by
+    primary key in that order. Without it, matches are ordered by primary key.
+
+    Parameters:
+        queryset (QuerySet): The queryset to search.
+        index (str): The FTS5 table name, e.g. SUGGESTION_INDEX.
+        term (str): The search text.
+        limit (int): The maximum number of rows to return.
+        fallback_fields (Sequence[str]): Fields searched when FTS5 is not available.
+
+    Returns:
+        QuerySet: The matching rows, in relevance order.
+    """
+    if not match_expression(term):
+        return queryset.none()
+    if not fts_available():
+        return filter_queryset(queryset, index, term, fallback_fields).order_by('pk')[:limit]
+    ids = ranked_ids(index, term, limit)
+    if not ids:
+        return queryset.none()
+    position = Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(position)
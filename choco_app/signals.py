@@ -0,0 +1,104 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import allergens, analytics, cache
+from .models import AllergyIssue, CustomerSuggestion, FlavorSeason, Ingredient, RecipeIngredient, StockMovement
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_pages(sender, **kwargs):
+    """Evict cached pages that render ingredient data."""
+    cache.bump_version(cache.INGREDIENTS)
+
+
+@receiver([post_save, post_delete], sender=FlavorSeason)
+def invalidate_flavor_pages(sender, **kwargs):
+    """Evict cached pages that render seasonal flavor data."""
+    cache.bump_version(cache.FLAVORS)
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def invalidate_recipe_pages(sender, **kwargs):
+    """Evict cached pages that render recipe data (the production plan)."""
+    cache.bump_version(cache.RECIPES)
+
+
+@receiver(post_save, sender=Ingredient)
+def record_initial_stock(sender, instance, created, raw=False, using=None, **kwargs):
+    """Open the ledger of a newly created ingredient with its starting stock."""
+    if created and not raw and instance.stock:
+        StockMovement.objects.using(using).create(ingredient=instance, delta=instance.stock, reason='initial stock')
+
+
+@receiver(pre_save, sender=AllergyIssue)
+def remember_allergy_ingredient(sender, instance, raw=False, using=None, **kwargs):
+    """Note the ingredient an existing allergy issue had, so moving it recounts both ingredients."""
+    if instance.pk and not raw:
+        instance._previous_ingredient_id = (
+            AllergyIssue.objects.using(using).filter(pk=instance.pk).values_list('ingredient_id', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=AllergyIssue)
+def update_allergy_counts(sender, instance, raw=False, using=None, **kwargs):
+    """Recount the allergen figures of the ingredient(s) an allergy issue was filed against."""
+    if not raw:
+        ingredient_ids = {instance.ingredient_id, getattr(instance, '_previous_ingredient_id', None)} - {None}
+        allergens.recount(ingredient_ids, using=using)
+
+
+@receiver(m2m_changed, sender=CustomerSuggestion.ingredients.through)
+def update_suggestion_counts(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    """Recount the allergen figures of ingredients added to or removed from suggestions."""
+    if reverse:
+        # instance is an ingredient and pk_set holds suggestions.
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            allergens.recount([instance.pk], using=using)
+    elif action == 'pre_clear':
+        instance._cleared_ingredient_ids = list(instance.ingredients.using(using).values_list('pk', flat=True))
+    elif action == 'post_clear':
+        allergens.recount(instance.__dict__.pop('_cleared_ingredient_ids', ()), using=using)
+    elif action in ('post_add', 'post_remove'):
+        allergens.recount(pk_set, using=using)
+
+
+@receiver(pre_delete, sender=CustomerSuggestion)
+def remember_suggestion_ingredients(sender, instance, using=None, **kwargs):
+    """Note a suggestion's ingredients before its links are deleted along with it."""
+    instance._deleted_ingredient_ids = list(instance.ingredients.using(using).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=CustomerSuggestion)
+def update_deleted_suggestion_counts(sender, instance, using=None, **kwargs):
+    """Recount the allergen figures of the ingredients a deleted suggestion used."""
+    allergens.recount(getattr(instance, '_deleted_ingredient_ids', ()), using=using)
+
+
+@receiver(pre_save, sender=CustomerSuggestion)
+def remember_suggested_flavor(sender, instance, raw=False, using=None, **kwargs):
+    """Note the flavor an existing suggestion had, so renaming it recounts both flavors."""
+    if instance.pk and not raw:
+        instance._previous_flavor = (
+            CustomerSuggestion.objects.using(using).filter(pk=instance.pk)
+            .values_list('suggested_flavor', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=CustomerSuggestion)
+def update_suggestion_analytics(sender, instance, raw=False, using=None, **kwargs):
+    """Recount the flavor and day totals a suggestion counts towards."""
+    if raw:
+        return
+    analytics.recount_flavors(
+        {instance.suggested_flavor, getattr(instance, '_previous_flavor', None)} - {None}, using=using,
+    )
+    if kwargs.get('created', True):
+        # Created or deleted; an edit leaves the day unchanged.
+        analytics.recount_days([analytics.day_of(instance.created_at)], using=using)
+
+
+@receiver([post_save, post_delete], sender=AllergyIssue)
+def update_allergy_analytics(sender, instance, raw=False, using=None, **kwargs):
+    """Recount the day total an allergy issue counts towards when one is reported or deleted."""
+    if not raw and kwargs.get('created', True):
+        analytics.recount_days([analytics.day_of(instance.created_at)], using=using)
@@ -0,0 +1,210 @@
+import gzip
+import mimetypes
+import os
+import posixpath
+from email.utils import formatdate
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only .gz variants are written.
+    brotli = None
+
+# Text-like files worth compressing; images and fonts are already compressed.
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.json', '.svg', '.html', '.txt', '.xml')
+
+# Smaller files gain nothing from compression once headers are counted.
+MIN_COMPRESS_SIZE = 256
+
+# Precompressed variants by preference, as (Content-Encoding, file suffix).
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# One year: the longest lifetime caches honour, for files named after their content.
+IMMUTABLE_MAX_AGE = 31536000
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes gzip (and, with the brotli package, brotli)
+    variants of every compressible file next to it during collectstatic.
+
+    A variant is kept only when it is meaningfully smaller than the original.
+    Both the content-hashed copies and the original names are compressed, so
+    `StaticFilesMiddleware` can serve a compressed response for either.
+    """
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                for variant in self.compress(name):
+                    yield name, variant, True
+
+    def compress(self, name):
+        """
+        Write the compressed variants of one stored file.
+
+        Parameters:
+            name (str): The stored file name.
+
+        Returns:
+            list[str]: The names of the variants written.
+        """
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return []
+        compressed = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            compressed.append(('.br', brotli.compress(content, quality=11)))
+        written = []
+        for suffix, data in compressed:
+            if len(data) < len(content) * 0.95:
+                variant = name + suffix
+                if self.exists(variant):
+                    self.delete(variant)
+                self._save(variant, ContentFile(data))
+                written.append(variant)
+        return written
+
+
+class StaticFile:
+    """
+    One file under STATIC_ROOT and its precompressed variants, resolved once at startup.
+
+    Attributes:
+        path (str): The file's path on disk.
+        content_type (str): Its MIME type.
+        headers (dict): Caching headers sent with every response for it.
+        variants (list[tuple[str, str, int]]): (encoding, path, size) of each precompressed copy, best first.
+        size (int): Size of the uncompressed file.
+    """
+    def __init__(self, path, immutable, max_age):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.variants = [
+            (encoding, path + suffix, os.path.getsize(path + suffix))
+            for encoding, suffix in ENCODINGS if os.path.exists(path + suffix)
+        ]
+        cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable else f'public, max-age={max_age}'
+        # Weak, as the compressed variants are different bytes for the same content.
+        self.etag = f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        self.headers = {
+            'Cache-Control': cache_control,
+            'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+            'ETag': self.etag,
+        }
+        if self.variants:
+            self.headers['Vary'] = 'Accept-Encoding'
+
+    def select(self, accept_encoding):
+        """Return (encoding or None, path, size) of the best copy the client accepts."""
+        accepted = {token.split(';')[0].strip() for token in accept_encoding.lower().split(',')}
+        for encoding, path, size in self.variants:
+            if encoding in accepted:
+                return encoding, path, size
+        return None, self.path, self.size
+
+
+def scan_static_root(root, max_age):
+    """
+    Index every collected file under `root` by its URL path relative to STATIC_URL.
+
+    Files listed as hashed names in the staticfiles.json manifest are served as
+    immutable; everything else (original names, files outside the manifest)
+    gets `max_age`.
+
+    Parameters:
+        root (str): The STATIC_ROOT directory.
+        max_age (int): Cache lifetime in seconds for files whose name is not content-hashed.
+
+    Returns:
+        dict[str, StaticFile]: The files by relative path.
+    """
+    hashed = set()
+    manifest = os.path.join(root, ManifestStaticFilesStorage.manifest_name)
+    if os.path.exists(manifest):
+        hashed = set(ManifestStaticFilesStorage(location=root).hashed_files.values())
+    compressed_suffixes = tuple(suffix for _encoding, suffix in ENCODINGS)
+    files = {}
+    for directory, _dirs, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if name.endswith(compressed_suffixes) and os.path.exists(path[:-3]):
+                continue
+            files[name] = StaticFile(path, name in hashed, max_age)
+    return files
+
+
+class StaticFilesMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT in the application server.
+
+    For production, where Django's own static view (DEBUG only) is not
+    available. Files are indexed once when the worker starts; a request is a
+    dictionary lookup and a file stream. Clients that accept brotli or gzip get
+    the variant written at build time by `CompressedManifestStaticFilesStorage`,
+    content-hashed files are cached for a year as immutable, and conditional
+    requests are answered with 304.
+
+    Enabled by the SERVE_STATIC setting; requires `collectstatic` to have run.
+    Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVE_STATIC', False):
+            raise MiddlewareNotUsed
+        if not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.files = scan_static_root(str(settings.STATIC_ROOT), getattr(settings, 'STATIC_MAX_AGE', 60))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        """Return the response for a static file request, or None for any other request."""
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        name = posixpath.normpath(request.path_info[len(self.prefix):])
+        static_file = self.files.get(name)
+        if static_file is None:
+            return None
+        if static_file.etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+            for header, value in static_file.headers.items():
+                response[header] = value
+            return response
+        encoding, path, size = static_file.select(request.headers.get('Accept-Encoding', ''))
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=static_file.content_type)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            del response['Content-Disposition']
+        response['Content-Length'] = size
+        if encoding:
+            response['Content-Encoding'] = encoding
+        for header, value in static_file.headers.items():
+            response[header] = value
+        return response
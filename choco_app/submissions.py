@@ -0,0 +1,256 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.utils import timezone
+
+from . import allergens, analytics
+from .models import AllergyIssue, CustomerSuggestion, Inquiry, PendingSubmission
+
+logger = logging.getLogger(__name__)
+
+# The model each submission kind is written to, in delivery order: allergy
+# issues refer to suggestions, so suggestions queued earlier are written first.
+KIND_MODELS = {
+    'suggestion': CustomerSuggestion,
+    'allergy_issue': AllergyIssue,
+    'inquiry': Inquiry,
+}
+
+
+def submit(kind, form):
+    """
+    Save a valid public form, directly or through the write-behind queue.
+
+    With SUBMISSION_QUEUE = 'sync' the form is saved in the request as before.
+    Otherwise only its cleaned data is queued, one small INSERT, and the rows are
+    written later in batches by the worker: a thread of this process ('thread')
+    or `manage.py process_submissions` ('worker').
+
+    Parameters:
+        kind (str): The submission kind, a key of KIND_MODELS.
+        form (ModelForm): A bound, valid form for the kind's model.
+    """
+    mode = getattr(settings, 'SUBMISSION_QUEUE', 'thread')
+    if mode == 'sync':
+        with transaction.atomic():
+            form.save()
+        return
+    PendingSubmission.objects.create(kind=kind, payload=form_payload(form))
+    if mode == 'thread':
+        worker.wake()
+
+
+def form_payload(form):
+    """
+    Return the cleaned data of `form` as JSON-serializable values.
+
+    Model instances become ``<field>_id`` keys and many-to-many selections lists
+    of primary keys.
+
+    Parameters:
+        form (ModelForm): A bound, valid form.
+
+    Returns:
+        dict: The payload to queue.
+    """
+    payload = {}
+    for name, value in form.cleaned_data.items():
+        if isinstance(value, models.Model):
+            payload[f'{name}_id'] = value.pk
+        elif isinstance(value, models.QuerySet):
+            # Already evaluated by the field's validation, so this runs no query.
+            payload[name] = [obj.pk for obj in value]
+        else:
+            payload[name] = value
+    return payload
+
+
+def deliver(submissions):
+    """
+    Write the rows described by `submissions`, one bulk_create per model.
+
+    Rows are dated when they were submitted, not when they are written. Many-
+    to-many links to rows deleted since the submission was queued are dropped. A missing foreign key target fails the delivery instead, since the
+    row cannot be written without it.
+
+    Parameters:
+        submissions (list[PendingSubmission]): The submissions to write.
+
+    Raises:
+        ValueError: If a submission refers to a row that no longer exists.
+    """
+    written = {}
+    for kind, model in KIND_MODELS.items():
+        payloads = [
+            dict(submission.payload, created_at=submission.created_at)
+            for submission in submissions if submission.kind == kind
+        ]
+        if payloads:
+            written[kind] = _deliver_rows(model, payloads)
+
+    # bulk_create sends no signals, so update the allergen index and analytics here.
+    touched = set()
+    for submission in submissions:
+        if submission.kind == 'suggestion':
+            touched.update(submission.payload.get('ingredients', ()))
+        elif submission.kind == 'allergy_issue':
+            touched.add(submission.payload['ingredient_id'])
+    allergens.recount(touched)
+    suggestions = written.get('suggestion', [])
+    analytics.recount_flavors({suggestion.suggested_flavor for suggestion in suggestions})
+    analytics.recount_days({
+        analytics.day_of(obj.created_at) for obj in suggestions + written.get('allergy_issue', [])
+    })
+
+
+def _deliver_rows(model, payloads):
+    m2m_fields = model._meta.many_to_many
+    m2m_names = {field.name for field in m2m_fields}
+    for field in model._meta.concrete_fields:
+        if field.is_relation:
+            wanted = {p[field.attname] for p in payloads if p.get(field.attname) is not None}
+            found = set(field.related_model._default_manager.filter(pk__in=wanted).values_list('pk', flat=True))
+            if wanted - found:
+                raise ValueError(f'{field.related_model.__name__} {sorted(wanted - found)} no longer exist(s)')
+
+    objects = model.objects.bulk_create([
+        model(**{key: value for key, value in p.items() if key not in m2m_names})
+        for p in payloads
+    ])
+    for field in m2m_fields:
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        wanted = {pk for p in payloads for pk in p.get(field.name, ())}
+        existing = set(field.related_model._default_manager.filter(pk__in=wanted).values_list('pk', flat=True))
+        through.objects.bulk_create([
+            through(**{f'{source}_id': obj.pk, f'{target}_id': pk})
+            for obj, p in zip(objects, payloads) for pk in dict.fromkeys(p.get(field.name, ())) if pk in existing
+        ])
+    return objects
+
+
+def drain_batch(batch_size=None):
+    """
+    Deliver up to `batch_size` due submissions in one transaction.
+
+    The batch is written and its queue rows deleted together, so a crash at any
+    point leaves the submissions queued for the next attempt. If the batch as a
+    whole fails, each submission is retried on its own so that one bad row does
+    not hold back the others; those that still fail are rescheduled with an
+    exponential backoff and marked failed after SUBMISSION_MAX_ATTEMPTS.
+
+    Transactions take SQLite's write lock as they begin (IMMEDIATE mode), so
+    the queue is first checked with a plain read and an idle worker polling an
+    empty queue never competes with real writes for the lock.
+
+    Parameters:
+        batch_size (int): The maximum number of submissions; SUBMISSION_BATCH_SIZE by default.
+
+    Returns:
+        tuple[int, int]: The number of submissions delivered and failed.
+    """
+    batch_size = batch_size or getattr(settings, 'SUBMISSION_BATCH_SIZE', 500)
+    if not PendingSubmission.objects.ready().exists():
+        return 0, 0
+    with transaction.atomic():
+        batch = list(PendingSubmission.objects.ready()[:batch_size])
+        if not batch:
+            return 0, 0
+        failed = []
+        try:
+            with transaction.atomic():
+                deliver(batch)
+            delivered = batch
+        except Exception:
+            delivered = []
+            for submission in batch:
+                try:
+                    with transaction.atomic():
+                        deliver([submission])
+                    delivered.append(submission)
+                except Exception as exc:
+                    failed.append((submission, exc))
+        PendingSubmission.objects.filter(pk__in=[submission.pk for submission in delivered]).delete()
+        _reschedule(failed)
+    return len(delivered), len(failed)
+
+
+def _reschedule(failed):
+    if not failed:
+        return
+    max_attempts = getattr(settings, 'SUBMISSION_MAX_ATTEMPTS', 5)
+    delay = getattr(settings, 'SUBMISSION_RETRY_DELAY', 30)
+    now = timezone.now()
+    for submission, exc in failed:
+        submission.attempts += 1
+        submission.last_error = f'{type(exc).__name__}: {exc}'
+        if submission.attempts >= max_attempts:
+            submission.status = PendingSubmission.FAILED
+        submission.available_at = now + timedelta(seconds=delay * 2 ** (submission.attempts - 1))
+        logger.warning('Submission %s failed (attempt %s): %s', submission.pk, submission.attempts, exc)
+    PendingSubmission.objects.bulk_update(
+        [submission for submission, _exc in failed], ['attempts', 'last_error', 'status', 'available_at'],
+    )
+
+
+def drain(batch_size=None):
+    """
+    Deliver due submissions batch by batch until none are left.
+
+    Returns:
+        int: The number of submissions delivered.
+    """
+    total = 0
+    while True:
+        delivered, failed = drain_batch(batch_size)
+        if not delivered and not failed:
+            return total
+        total += delivered
+
+
+class Worker:
+    """
+    Background thread that drains the queue inside the web process.
+
+    With SUBMISSION_QUEUE = 'thread' the web entry points (chocolate_house/wsgi.py
+    and asgi.py) start it when the process starts, so submissions queued before
+    a restart, by other processes or awaiting a retry are delivered even if this
+    process never receives a form. It drains whenever woken by `submit` and
+    every SUBMISSION_POLL_INTERVAL seconds otherwise.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the thread if SUBMISSION_QUEUE is 'thread' and it is not running yet."""
+        if getattr(settings, 'SUBMISSION_QUEUE', 'thread') != 'thread':
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.run, name='submission-worker', daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        """Ask the worker to drain the queue, starting its thread if needed."""
+        self.start()
+        self._wakeup.set()
+
+    def run(self):
+        interval = getattr(settings, 'SUBMISSION_POLL_INTERVAL', 1.0)
+        while True:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                drain()
+            except Exception:
+                logger.exception('Draining the submission queue failed; retrying.')
+            finally:
+                close_old_connections()
+
+
+worker = Worker()
@@ -0,0 +1,15 @@
+from django import template
+
+from choco_app.units import format_quantity
+
+register = template.Library()
+
+
+@register.filter
+def quantity(value, unit):
+    """
+    Format a stock value stored in base units for display.
+
+    Usage: ``{{ ingredient.stock|quantity:ingredient.unit }}`` renders e.g. "12.5 grams".
+    """
+    return format_quantity(value, unit)
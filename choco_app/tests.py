@@ -1,3 +1,1561 @@
-from django.test import TestCase
+import asyncio
+import base64
+import codecs
+import importlib
+import io
+import json
+import os
+import re
+import runpy
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Q
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+
+from . import allergens, analytics, api, benchmark, bulk, cache as page_cache, events, planner, submissions, views
+from . import metrics, urls as app_urls
+from .forms import SuggestionForm
+from .management.commands import explain_queries
+from .metrics import registry
+from .models import (
+    AllergenStats, AllergyIssue, CustomerSuggestion, DailyActivity, FlavorSeason, FlavorStats, Ingredient, Inquiry,
+    STOCK_LEVELS, InsufficientStock, PendingSubmission, RecipeIngredient, StockLimitExceeded, StockMovement,
+)
+from .pagination import clean_cursor_values, decode_cursor, encode_cursor, keyset_filter, keyset_paginate
+from .staticfiles import CompressedManifestStaticFilesStorage, StaticFilesMiddleware
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Base class that pins the number of queries a page runs.
+
+    Every check renders the page twice, before and after adding more rows, and
+    requires the same query count both times, so a page whose cost grows with
+    the number of rows (an N+1 pattern) fails the test.
+    """
+    rows_per_seed = 3
+
+    def setUp(self):
+        self.seed()
+
+    def seed(self):
+        """Add `rows_per_seed` rows of every model, linked to each other."""
+        today = timezone.localdate()
+        start = Ingredient.objects.count()
+        ingredients = [
+            Ingredient.objects.create(name=f'Ingredient {start + i}', stock=1000)
+            for i in range(self.rows_per_seed)
+        ]
+        for i in range(self.rows_per_seed):
+            suggestion = CustomerSuggestion.objects.create(
+                customer_name=f'Customer {start + i}', customer_email='customer@example.com',
+                suggested_flavor='Mint', suggestion_reason='Fresh',
+            )
+            suggestion.ingredients.add(*ingredients)
+            flavor = FlavorSeason.objects.create(
+                name=f'Flavor {start + i}', available_from=today - timedelta(days=1),
+                available_to=today + timedelta(days=1),
+            )
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(flavor=flavor, ingredient=ingredient, quantity=100) for ingredient in ingredients
+            ])
+            Inquiry.objects.create(name=f'Visitor {start + i}', email='visitor@example.com', message='Hello')
+        self.suggestion = CustomerSuggestion.objects.order_by('pk').first()
+        for ingredient in ingredients:
+            AllergyIssue.objects.create(
+                customer_suggestion=self.suggestion, ingredient=ingredient, concern_detail='Nut allergy',
+            )
+
+    def get(self, url):
+        """GET `url` with empty caches and return the response, consuming streamed content."""
+        cache.clear()
+        ContentType.objects.clear_cache()
+        response = self.client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def assertStableQueries(self, url, expected):
+        """Assert that `url` runs exactly `expected` queries, however many rows exist."""
+        with self.assertNumQueries(expected):
+            self.get(url)
+        self.seed()
+        with self.assertNumQueries(expected):
+            self.get(url)
+
+
+class PublicViewQueryCountTests(QueryCountTestCase):
+    """Pin the query count of every public page in choco_app/urls.py."""
+
+    def test_home(self):
+        self.assertStableQueries('/inventory/', 0)
+
+    def test_about(self):
+        self.assertStableQueries('/inventory/about/', 0)
+
+    def test_contact(self):
+        self.assertStableQueries('/inventory/contact/', 0)
+
+    def test_ingredient_list(self):
+        self.assertStableQueries('/inventory/ingredients/', 1)
+
+    def test_ingredient_list_stream(self):
+        self.assertStableQueries('/inventory/ingredients/?stream=1', 1)
+
+    def test_ingredient_create(self):
+        self.assertStableQueries('/inventory/ingredients/create/', 0)
+
+    def test_ingredient_update(self):
+        ingredient = Ingredient.objects.first()
+        self.assertStableQueries(f'/inventory/ingredients/update/{ingredient.pk}/', 1)
+
+    def test_ingredient_delete(self):
+        ingredient = Ingredient.objects.first()
+        self.assertStableQueries(f'/inventory/ingredients/delete/{ingredient.pk}/', 1)
+
+    def test_ingredient_import(self):
+        self.assertStableQueries('/inventory/ingredients/import/', 0)
+
+    def test_ingredient_export(self):
+        self.assertStableQueries('/inventory/ingredients/export/', 1)
+
+    def test_seasonal_flavors(self):
+        self.assertStableQueries('/inventory/seasonal_flavors/', 1)
+
+    def test_seasonal_flavor_add(self):
+        self.assertStableQueries('/inventory/seasonal_flavors/add/', 0)
+
+    def test_seasonal_flavor_update(self):
+        flavor = FlavorSeason.objects.first()
+        self.assertStableQueries(f'/inventory/seasonal_flavors/{flavor.pk}/update/', 1)
+
+    def test_seasonal_flavor_delete(self):
+        flavor = FlavorSeason.objects.first()
+        self.assertStableQueries(f'/inventory/seasonal_flavors/{flavor.pk}/delete/', 1)
+
+    def test_customer_suggestion(self):
+        self.assertStableQueries('/inventory/suggest/', 0)
+
+    def test_ingredient_catalogue(self):
+        self.assertStableQueries('/inventory/suggest/ingredients/', 1)
+
+    def test_allergy_concern(self):
+        self.assertStableQueries('/inventory/allergy_concern/', 1)
+
+    def test_customer_suggestion_lookup(self):
+        # One indexed prefix range over the names and, as they leave room, one over the flavors.
+        self.assertStableQueries('/inventory/allergy_concern/suggestions/?q=Cust', 2)
+
+    def test_allergen_check(self):
+        # A fresh index: one read of the known allergens, one of the suggestions using them.
+        self.assertStableQueries('/inventory/allergy_concern/check/?suggestion=1&suggestion=2', 2)
+
+    def test_analytics(self):
+        # One read per materialized table ranking, however many rows are aggregated.
+        self.assertStableQueries('/inventory/analytics/', 4)
+
+    @skipUnless(planner.available(), 'NumPy is not installed')
+    def test_production_plan(self):
+        # One read of every recipe line with its flavor and ingredient; one more for the demand counts.
+        self.assertStableQueries('/inventory/production/', 1)
+        self.assertStableQueries('/inventory/production/?weights=demand', 2)
+
+    def test_api_list(self):
+        self.assertStableQueries('/inventory/api/ingredients/', 2)
+        self.assertStableQueries('/inventory/api/suggestions/', 3)
+
+    def test_api_changes(self):
+        self.assertStableQueries('/inventory/api/flavors/changes/?since=0&page_size=1000', 2)
+
+    def test_suggestion_search(self):
+        # One ranked id lookup in the FTS5 index, one read of the matching rows.
+        self.assertStableQueries('/inventory/suggest/search/?q=mint fre', 2)
+
+
+class AdminQueryCountTests(QueryCountTestCase):
+    """Pin the query count of every admin changelist and change form of choco_app."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def test_changelists(self):
+        for model, expected in [
+            ('flavorseason', 5),
+            ('ingredient', 5),
+            ('customersuggestion', 5),
+            ('allergyissue', 5),
+            ('inquiry', 5),
+            ('stockmovement', 7),
+            ('pendingsubmission', 5),
+        ]:
+            with self.subTest(model=model):
+                self.assertStableQueries(f'/admin/choco_app/{model}/', expected)
+
+    def test_changelist_search(self):
+        for model in ('customersuggestion', 'inquiry'):
+            with self.subTest(model=model):
+                self.assertStableQueries(f'/admin/choco_app/{model}/?q=hello+mint', 5)
+
+    def test_add_forms(self):
+        for model, expected in [
+            # The recipe inline reads its ingredient choices once.
+            ('flavorseason', 4),
+            ('ingredient', 3),
+            ('customersuggestion', 5),
+            ('allergyissue', 3),
+            ('inquiry', 3),
+        ]:
+            with self.subTest(model=model):
+                self.assertStableQueries(f'/admin/choco_app/{model}/add/', expected)
+
+    def test_change_forms(self):
+        for model, obj, expected in [
+            # Plus the recipe lines with their ingredients and one shared ingredient choice list.
+            ('flavorseason', FlavorSeason.objects.first(), 6),
+            ('ingredient', Ingredient.objects.first(), 4),
+            ('allergyissue', AllergyIssue.objects.first(), 8),
+            ('inquiry', Inquiry.objects.first(), 4),
+        ]:
+            with self.subTest(model=model):
+                self.assertStableQueries(f'/admin/choco_app/{model}/{obj.pk}/change/', expected)
+
+    def test_customer_suggestion_change_form_with_allergy_inlines(self):
+        # One query for the inline rows and one shared ingredient choice list,
+        # however many allergy issue rows the suggestion has.
+        self.assertStableQueries(f'/admin/choco_app/customersuggestion/{self.suggestion.pk}/change/', 8)
+
+
+class FullTextSearchTests(TestCase):
+    """The FTS5 indexes follow inserts, updates and deletes and rank the matches."""
+
+    def search(self, term):
+        response = self.client.get('/inventory/suggest/search/', {'q': term})
+        return [row['customer_name'] for row in response.json()['results']]
+
+    def test_index_follows_writes(self):
+        suggestion = CustomerSuggestion.objects.create(
+            customer_name='Ada', customer_email='ada@example.com', suggested_flavor='Raspberry', suggestion_reason='Tart',
+        )
+        self.assertEqual(self.search('rasp'), ['Ada'])
+        suggestion.suggested_flavor = 'Lemon'
+        suggestion.save()
+        self.assertEqual(self.search('rasp'), [])
+        self.assertEqual(self.search('lemon tart'), ['Ada'])
+        suggestion.delete()
+        self.assertEqual(self.search('lemon'), [])
+
+    def test_results_are_ranked(self):
+        CustomerSuggestion.objects.create(
+            customer_name='Once', customer_email='a@example.com', suggested_flavor='Caramel',
+            suggestion_reason='A long reason that mentions hazelnut only once among many other words',
+        )
+        CustomerSuggestion.objects.create(
+            customer_name='Twice', customer_email='b@example.com', suggested_flavor='Hazelnut',
+            suggestion_reason='Hazelnut',
+        )
+        self.assertEqual(self.search('hazelnut'), ['Twice', 'Once'])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"NEAR( OR *'), [])
+
+
+@override_settings(METRICS_TOKEN='scrape-secret', METRICS_DIR=None)
+class MetricsTests(TestCase):
+    """The instrumentation middleware records per-view histograms served at /metrics."""
+
+    def setUp(self):
+        registry.reset()
+        cache.clear()
+
+    def scrape(self):
+        return self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+
+    def test_metrics_endpoint(self):
+        Ingredient.objects.create(name='Cocoa', stock=1000)
+        self.client.get('/inventory/ingredients/')
+        body = self.scrape().content.decode()
+        self.assertIn('choco_requests_total{view="ingredient_list",status="200"} 1', body)
+        self.assertIn('choco_request_duration_seconds_count{view="ingredient_list"} 1', body)
+        # The page runs one query (see PublicViewQueryCountTests).
+        self.assertIn('choco_sql_queries_bucket{view="ingredient_list",le="1"} 1', body)
+        self.assertIn('choco_sql_queries_bucket{view="ingredient_list",le="0"} 0', body)
+        self.assertIn('choco_template_render_seconds_count{view="ingredient_list"} 1', body)
+
+    def test_metrics_require_the_token_or_a_staff_user(self):
+        for headers in ({}, {'Authorization': 'Bearer wrong'}, {'Authorization': 'Basic scrape-secret'}):
+            with self.subTest(headers=headers):
+                response = self.client.get('/metrics', headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="metrics"')
+        self.assertEqual(self.scrape().status_code, 200)
+        self.client.force_login(User.objects.create_user('clerk'))
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.client.force_login(User.objects.create_user('manager', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        with self.settings(METRICS_TOKEN=''):
+            self.client.logout()
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code, 401)
+
+    def test_every_process_is_reported(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(setattr, registry, '_path', None)
+        # /metrics flushes this process itself; no thread is left writing to the directory.
+        flushing = mock.patch.object(registry, 'start_flushing')
+        flushing.start()
+        self.addCleanup(flushing.stop)
+        other = metrics.Registry()
+        values = {name: 0.5 for name, _help, _buckets in metrics.HISTOGRAMS}
+        for _ in range(2):
+            other.observe('ingredient_list', 200, values)
+        with open(os.path.join(directory, '4242-1.json'), 'w', encoding='utf-8') as output:
+            json.dump(other.snapshot(), output)
+        with self.settings(METRICS_DIR=directory):
+            self.client.get('/inventory/ingredients/')
+            body = self.scrape().content.decode()
+            self.assertIn('choco_requests_total{view="ingredient_list",status="200"} 3', body)
+            self.assertIn('choco_request_duration_seconds_count{view="ingredient_list"} 3', body)
+
+            # Process 4242 exits: its totals move to the archive and are still counted, once.
+            metrics.archive(directory, 4242)
+            self.assertEqual(sorted(os.listdir(directory)), sorted([metrics.ARCHIVE, registry._path.name]))
+            self.assertIn('choco_requests_total{view="ingredient_list",status="200"} 3', self.scrape().content.decode())
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_request_log(self):
+        with self.assertLogs('choco_app.slow_requests', 'WARNING') as logs:
+            self.client.get('/inventory/ingredients/')
+        self.assertIn('ingredient_list', logs.output[0])
+        self.assertIn('choco_app_ingredient', logs.output[0])
+
+    def test_only_the_slowest_queries_are_kept(self):
+        stats = metrics.RequestStats(keep_queries=2)
+        for elapsed in (0.3, 0.1, 0.5, 0.2, 0.4):
+            stats.record_query(elapsed, f'SELECT {elapsed}')
+        self.assertEqual(sorted(stats.slow_queries, reverse=True), [(0.5, 'SELECT 0.5'), (0.4, 'SELECT 0.4')])
+        self.assertEqual((stats.queries, round(stats.sql_time, 6)), (5, 1.5))
+        self.assertEqual(metrics.RequestStats().slow_queries, [])
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.client.get('/inventory/')
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(registry.requests, {})
+
+
+class BenchmarkTests(TestCase):
+    """The benchmark suite covers every route and flags regressions."""
+
+    def test_every_route_is_benchmarked(self):
+        benchmark.seed(4, batch_size=2)
+        routes = benchmark.build_routes()
+        self.assertEqual(benchmark.missing_routes(routes), [])
+        results = benchmark.run_client(routes, requests=1)
+        self.assertEqual({label: row['statuses'] for label, row in results.items()},
+                         {route.label: [200] for route in routes})
+
+    def test_compare(self):
+        row = {'p95_ms': 10.0, 'queries_per_request': 1}
+        baseline = {'runs': {'client': {'home': row}}}
+        self.assertEqual(benchmark.compare({'runs': {'client': {'home': dict(row, p95_ms=11.0)}}}, baseline, 0.2), [])
+        self.assertEqual(len(benchmark.compare(
+            {'runs': {'client': {'home': {'p95_ms': 13.0, 'queries_per_request': 2}}}}, baseline, 0.2,
+        )), 2)
+
+
+class ExplainQueriesTests(TestCase):
+    """explain_queries explains the SQL the views actually run and flags every unbounded scan."""
+
+    def test_is_full_scan(self):
+        limited, filtered = 'SELECT * FROM t ORDER BY a LIMIT 5', 'SELECT * FROM t WHERE b = 1 ORDER BY a LIMIT 5'
+        for line, sql, plan, expected in [
+            ('SEARCH t USING INDEX t_a (a=?)', filtered, (), False),
+            ('SCAN t', 'SELECT * FROM t', (), True),
+            ('SCAN t USING INDEX t_a', filtered, (), True),
+            ('SCAN t USING INDEX t_a', limited, (), False),
+            ('SCAN t USING INDEX t_a', limited, ['USE TEMP B-TREE FOR RIGHT PART OF ORDER BY'], True),
+            ('SCAN t USING COVERING INDEX t_a', filtered, (), False),
+            ('SCAN t USING COVERING INDEX t_a', 'SELECT a FROM t', (), True),
+            ('SCAN t VIRTUAL TABLE INDEX 0:M1', 'SELECT rowid FROM t WHERE t MATCH ?', (), False),
+        ]:
+            with self.subTest(line=line, sql=sql):
+                self.assertEqual(explain_queries.is_full_scan(line, sql, plan), expected)
+
+    def test_views_are_requested_and_rolled_back(self):
+        benchmark.seed(4, batch_size=2)
+        stock = dict(Ingredient.objects.values_list('pk', 'stock'))
+        queries = explain_queries.view_queries()
+        self.assertEqual(dict(Ingredient.objects.values_list('pk', 'stock')), stock)
+        labels = {label for label, _sql in queries}
+        self.assertLessEqual({'ingredient_list (next page)', 'customer_suggestion_lookup', 'analytics'}, labels)
+        self.assertEqual(len(queries), len({sql for _label, sql in queries}))
+
+
+class AllergenIndexTests(TestCase):
+    """The allergen index follows writes and answers safety checks from memory."""
+
+    def setUp(self):
+        self.nuts, self.milk, self.mint = (
+            Ingredient.objects.create(name=name, stock=1000) for name in ('Nuts', 'Milk', 'Mint')
+        )
+        self.praline = CustomerSuggestion.objects.create(
+            customer_name='Ada', customer_email='ada@example.com', suggested_flavor='Praline',
+        )
+        self.praline.ingredients.add(self.nuts, self.milk)
+        self.fresh = CustomerSuggestion.objects.create(
+            customer_name='Bo', customer_email='bo@example.com', suggested_flavor='Fresh mint',
+        )
+        self.fresh.ingredients.add(self.mint)
+
+    def counts(self, ingredient):
+        stats = AllergenStats.objects.get(ingredient=ingredient)
+        return stats.allergy_issue_count, stats.suggestion_count
+
+    def test_counts_follow_writes(self):
+        self.assertEqual(self.counts(self.nuts), (0, 1))
+        issue = AllergyIssue.objects.create(
+            customer_suggestion=self.praline, ingredient=self.nuts, concern_detail='Nut allergy',
+        )
+        self.assertEqual(self.counts(self.nuts), (1, 1))
+        issue.ingredient = self.milk
+        issue.save()
+        self.assertEqual((self.counts(self.nuts), self.counts(self.milk)), ((0, 1), (1, 1)))
+
+        self.mint.suggestions.add(self.praline)
+        self.assertEqual(self.counts(self.mint), (0, 2))
+        self.praline.ingredients.clear()
+        self.assertEqual([self.counts(i) for i in (self.nuts, self.milk, self.mint)], [(0, 0), (1, 0), (0, 1)])
+        self.fresh.delete()
+        self.assertEqual(self.counts(self.mint), (0, 0))
+
+        AllergenStats.objects.all().delete()
+        self.assertEqual(allergens.rebuild(), 3)
+        self.assertEqual(self.counts(self.milk), (1, 0))
+
+    def test_safety_checks(self):
+        index = allergens.get_index()
+        with self.assertNumQueries(1):
+            self.assertFalse(index.is_safe(self.praline.pk, [self.nuts.pk]))
+            self.assertTrue(index.is_safe(self.fresh.pk, [self.nuts.pk]))
+            self.assertEqual(index.safe_suggestions([self.praline.pk, self.fresh.pk], {self.nuts.pk}), [self.fresh.pk])
+        self.assertIs(allergens.get_index(), index)
+
+        self.fresh.ingredients.add(self.milk)
+        index = allergens.get_index()
+        self.assertFalse(index.is_safe(self.fresh.pk, [self.milk.pk]))
+
+        AllergyIssue.objects.create(customer_suggestion=self.praline, ingredient=self.nuts, concern_detail='Nuts')
+        response = self.client.get(
+            '/inventory/allergy_concern/check/', {'suggestion': [self.praline.pk, self.fresh.pk]},
+        )
+        self.assertEqual(response.json(), {'safe': [self.fresh.pk], 'unsafe': [self.praline.pk]})
+        response = self.client.get('/inventory/allergy_concern/check/', {'suggestion': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_check_rejects_ids_out_of_range(self):
+        for params in (
+            {'suggestion': self.fresh.pk, 'allergen': 10**23},
+            {'suggestion': [self.fresh.pk, 2**63]},
+            {'suggestion': self.fresh.pk, 'allergen': -2**63 - 1},
+            {'suggestion': self.fresh.pk, 'allergen': 'nuts'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get('/inventory/allergy_concern/check/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.json()['errors']), [next(reversed(params))])
+        response = self.client.get('/inventory/allergy_concern/check/', {'suggestion': 2**63 - 1, 'allergen': 2**63 - 1})
+        self.assertEqual(response.json(), {'safe': [2**63 - 1], 'unsafe': []})
+
+
+class AnalyticsTests(TestCase):
+    """The analytics tables follow writes and match a full rebuild."""
+
+    def setUp(self):
+        self.cocoa = Ingredient.objects.create(name='Cocoa', stock=1000)
+        for flavor in ('Mint', 'Mint', 'Chili'):
+            suggestion = CustomerSuggestion.objects.create(
+                customer_name='Ada', customer_email='ada@example.com', suggested_flavor=flavor,
+            )
+            suggestion.ingredients.add(self.cocoa)
+        AllergyIssue.objects.create(customer_suggestion=suggestion, ingredient=self.cocoa, concern_detail='Cocoa')
+
+    def snapshot(self):
+        return (
+            list(FlavorStats.objects.order_by('suggested_flavor').values_list('suggested_flavor', 'suggestion_count')),
+            list(DailyActivity.objects.values_list('day', 'suggestion_count', 'allergy_issue_count')),
+        )
+
+    def test_tables_follow_writes(self):
+        today = timezone.localdate()
+        self.assertEqual(self.snapshot(), ([('Chili', 1), ('Mint', 2)], [(today, 3, 1)]))
+        self.assertEqual(DailyActivity.objects.get().allergy_issue_rate, 1 / 3)
+
+        chili = CustomerSuggestion.objects.get(suggested_flavor='Chili')
+        chili.suggested_flavor = 'Mint'
+        chili.save()
+        self.assertEqual(self.snapshot(), ([('Mint', 3)], [(today, 3, 1)]))
+        chili.delete()
+        self.assertEqual(self.snapshot(), ([('Mint', 2)], [(today, 2, 0)]))
+
+        expected = self.snapshot()
+        FlavorStats.objects.all().delete()
+        DailyActivity.objects.all().delete()
+        self.assertEqual(analytics.rebuild(), (1, 1))
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_dashboard(self):
+        response = self.client.get('/inventory/analytics/', {'days': 7})
+        self.assertEqual(response.context['days'], 7)
+        self.assertEqual([f.suggested_flavor for f in response.context['flavors']], ['Mint', 'Chili'])
+        self.assertEqual([s.ingredient for s in response.context['ingredients']], [self.cocoa])
+        self.assertEqual([s.ingredient for s in response.context['allergens']], [self.cocoa])
+
+
+@override_settings(SUBMISSION_QUEUE='worker')
+class SubmissionQueueTests(TestCase):
+    """Public form submissions are queued and written in batches by the worker."""
+
+    def setUp(self):
+        self.ingredient = Ingredient.objects.create(name='Cocoa', stock=1000)
+
+    def test_submissions_are_queued_then_delivered(self):
+        self.client.post('/inventory/suggest/', {
+            'customer_name': 'Ada', 'customer_email': 'ada@example.com', 'suggested_flavor': 'Mint',
+            'suggestion_reason': 'Fresh', 'ingredients': [self.ingredient.pk],
+        })
+        self.client.post('/inventory/contact/', {'name': 'Ada', 'email': 'ada@example.com', 'message': 'Hi'})
+        self.assertEqual(PendingSubmission.objects.count(), 2)
+        self.assertFalse(CustomerSuggestion.objects.exists())
+
+        # Check for due submissions, then read the batch, write both rows and the
+        # ingredient link (after checking the ingredient still exists), recount the
+        # ingredient's allergen figures, the flavor and the day, and dequeue,
+        # inside a transaction and a savepoint.
+        with self.assertNumQueries(18):
+            self.assertEqual(submissions.drain_batch(), (2, 0))
+        self.assertEqual(AllergenStats.objects.get(ingredient=self.ingredient).suggestion_count, 1)
+        suggestion = CustomerSuggestion.objects.get()
+        self.assertEqual(list(suggestion.ingredients.all()), [self.ingredient])
+        self.assertEqual(Inquiry.objects.get().message, 'Hi')
+        self.assertFalse(PendingSubmission.objects.exists())
+
+    def test_an_empty_queue_is_polled_without_a_transaction(self):
+        self.client.post('/inventory/contact/', {'name': 'Ada', 'email': 'ada@example.com', 'message': 'Hi'})
+        PendingSubmission.objects.update(available_at=timezone.now() + timedelta(minutes=1))
+        # One read; no savepoint (a write-locking transaction outside tests).
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(submissions.drain_batch(), (0, 0))
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('SELECT'))
+
+    @override_settings(SUBMISSION_MAX_ATTEMPTS=2)
+    def test_failed_submissions_are_retried_then_marked_failed(self):
+        suggestion = CustomerSuggestion.objects.create(
+            customer_name='Ada', customer_email='ada@example.com', suggested_flavor='Mint', suggestion_reason='Fresh',
+        )
+        self.client.post('/inventory/allergy_concern/', {
+            'customer_suggestion': suggestion.pk, 'ingredient': self.ingredient.pk, 'concern_detail': 'Nuts',
+        })
+        self.client.post('/inventory/contact/', {'name': 'Ada', 'email': 'ada@example.com', 'message': 'Hi'})
+        suggestion.delete()
+
+        with self.assertLogs('choco_app.submissions', 'WARNING'):
+            self.assertEqual(submissions.drain_batch(), (1, 1))
+        pending = PendingSubmission.objects.get()
+        self.assertEqual((pending.status, pending.attempts), (PendingSubmission.PENDING, 1))
+        self.assertIn('CustomerSuggestion', pending.last_error)
+        self.assertEqual(submissions.drain_batch(), (0, 0))  # backing off
+
+        PendingSubmission.objects.update(available_at=timezone.now())
+        with self.assertLogs('choco_app.submissions', 'WARNING'):
+            submissions.drain()
+        self.assertEqual(PendingSubmission.objects.get().status, PendingSubmission.FAILED)
+        self.assertEqual(Inquiry.objects.count(), 1)
+
+    def test_rows_are_dated_when_submitted(self):
+        self.client.post('/inventory/contact/', {'name': 'Ada', 'email': 'ada@example.com', 'message': 'Hi'})
+        submitted = timezone.now() - timedelta(hours=2)
+        PendingSubmission.objects.update(created_at=submitted)
+        submissions.drain()
+        self.assertEqual(Inquiry.objects.get().created_at, submitted)
+
+    def test_worker_starts_with_the_process_in_thread_mode(self):
+        for mode, started in [('thread', True), ('worker', False), ('sync', False)]:
+            with self.subTest(mode=mode), self.settings(SUBMISSION_QUEUE=mode), \
+                    mock.patch('choco_app.submissions.threading.Thread') as thread:
+                submissions.Worker().start()
+                self.assertEqual(thread.return_value.start.called, started)
+
+
+class StaticFilesTests(SimpleTestCase):
+    """collectstatic writes hashed, precompressed files that the middleware serves with cache headers."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        storage = CompressedManifestStaticFilesStorage(location=self.root)
+        storage.save('site.css', ContentFile(b'body { color: #333; }\n' * 40))
+        list(storage.post_process({'site.css': (storage, 'site.css')}))
+        self.hashed = storage.hashed_files['site.css']
+        with override_settings(SERVE_STATIC=True, STATIC_ROOT=self.root, STATIC_URL='/static/'):
+            self.middleware = StaticFilesMiddleware(lambda request: HttpResponse('page'))
+        self.factory = RequestFactory()
+
+    def get(self, path, **headers):
+        return self.middleware(self.factory.get(path, headers=headers))
+
+    def test_hashed_files_are_immutable_and_compressed(self):
+        self.assertTrue(os.path.exists(os.path.join(self.root, self.hashed + '.gz')))
+        response = self.get(f'/static/{self.hashed}', accept_encoding='gzip, deflate, br')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        expected = 'br' if os.path.exists(os.path.join(self.root, self.hashed + '.br')) else 'gzip'
+        self.assertEqual(response['Content-Encoding'], expected)
+        self.assertLess(int(response['Content-Length']), 40 * 22)
+
+        response = self.get(f'/static/{self.hashed}')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), b'body { color: #333; }\n' * 40)
+        self.assertEqual(self.get(f'/static/{self.hashed}', if_none_match=response['ETag']).status_code, 304)
+
+    def test_other_requests_pass_through(self):
+        self.assertEqual(self.get('/static/site.css')['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.get('/static/missing.css').content, b'page')
+        self.assertEqual(self.get('/static/../site.css').content, b'page')
+        self.assertEqual(self.get('/inventory/').content, b'page')
+
+
+class SuggestionFormTests(TestCase):
+    """The suggestion form picks ingredients from the versioned catalogue and checks their ids in one query."""
+
+    def setUp(self):
+        cache.clear()
+        self.cocoa = Ingredient.objects.create(name='Cocoa', stock=1000)
+        self.mint = Ingredient.objects.create(name='Mint', stock=1000)
+        self.data = {
+            'customer_name': 'Ada', 'customer_email': 'ada@example.com', 'suggested_flavor': 'Mint',
+            'suggestion_reason': 'Fresh',
+        }
+
+    def test_catalogue(self):
+        page = self.client.get('/inventory/suggest/').content.decode()
+        self.assertNotIn('Cocoa', page)
+        version = page_cache.get_version(page_cache.INGREDIENTS)
+        self.assertIn(f'/inventory/suggest/ingredients/?v={version}', page)
+        response = self.client.get(f'/inventory/suggest/ingredients/?v={version}')
+        self.assertEqual(response.json()['ingredients'], [[self.cocoa.pk, 'Cocoa'], [self.mint.pk, 'Mint']])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertNotIn('Cache-Control', self.client.get('/inventory/suggest/ingredients/?v=1'))
+
+    def test_ingredient_ids_are_validated_in_one_query(self):
+        form = SuggestionForm({**self.data, 'ingredients': [self.mint.pk, self.cocoa.pk, self.mint.pk]})
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['ingredients'], [self.mint.pk, self.cocoa.pk])
+        form = SuggestionForm({**self.data, 'ingredients': [self.cocoa.pk, self.mint.pk + 1]})
+        self.assertFalse(form.is_valid())
+        self.assertIn('ingredients', form.errors)
+        self.assertFalse(SuggestionForm({**self.data, 'ingredients': ['x']}).is_valid())
+        self.assertIn('Cocoa', str(form['ingredients']))
+
+    def test_ingredient_ids_out_of_range_are_invalid_values(self):
+        for pk in (10**23, 2**63, -2**63 - 1):
+            with self.subTest(pk=pk):
+                form = SuggestionForm({**self.data, 'ingredients': [self.cocoa.pk, pk]})
+                with self.assertNumQueries(0):
+                    self.assertFalse(form.is_valid())
+                self.assertEqual(form.errors.as_data()['ingredients'][0].code, 'invalid_pk_value')
+        response = self.client.post('/inventory/suggest/', {**self.data, 'ingredients': [str(10**23)]})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CustomerSuggestion.objects.exists())
+
+    @override_settings(SUBMISSION_QUEUE='sync')
+    def test_links_are_inserted_in_bulk(self):
+        form = SuggestionForm({**self.data, 'ingredients': [self.cocoa.pk, self.mint.pk]})
+        self.assertTrue(form.is_valid())
+        with CaptureQueriesContext(connection) as queries:
+            suggestion = form.save()
+        inserts = [
+            q['sql'] for q in queries
+            if q['sql'].startswith('INSERT') and '"choco_app_customersuggestion_ingredients"' in q['sql']
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(set(suggestion.ingredients.values_list('pk', flat=True)), {self.cocoa.pk, self.mint.pk})
+        self.assertEqual(AllergenStats.objects.get(ingredient=self.mint).suggestion_count, 1)
+
+
+class StockMovementTests(TestCase):
+    """Stock movements are applied atomically with ``stock = stock + delta`` and bounded to a 64-bit integer."""
+
+    def setUp(self):
+        self.cocoa = Ingredient.objects.create(name='Cocoa', stock=1000)
+        self.milk = Ingredient.objects.create(name='Milk', stock=500)
+
+    def stocks(self):
+        return dict(Ingredient.objects.values_list('name', 'stock'))
+
+    def test_movements_are_applied_in_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            stock = Ingredient.objects.apply_movements([
+                (self.cocoa.pk, 300, 'delivery'), (self.milk.pk, -200, 'production'), (self.cocoa.pk, -100, 'waste'),
+            ])
+        self.assertEqual(stock, {self.cocoa.pk: 1200, self.milk.pk: 300})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "choco_app_ingredient"')]), 1)
+        self.assertEqual(
+            list(StockMovement.objects.filter(ingredient=self.cocoa).order_by('pk').values_list('delta', flat=True)),
+            [1000, 300, -100],
+        )
+
+    def test_failed_movements_write_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            Ingredient.objects.apply_movements([(self.cocoa.pk, 100, 'delivery'), (self.milk.pk, -501, 'production')])
+        self.assertEqual(raised.exception.ingredient_ids, [self.milk.pk])
+        with self.assertRaises(StockLimitExceeded):
+            Ingredient.objects.apply_movements([(self.cocoa.pk, 2**62, 'delivery'), (self.cocoa.pk, 2**62, 'delivery')])
+        Ingredient.objects.adjust_stock(self.milk.pk, 2**62, 'delivery')
+        with self.assertRaises(StockLimitExceeded):
+            Ingredient.objects.adjust_stock(self.milk.pk, 2**62, 'delivery')
+        self.assertEqual(self.stocks(), {'Cocoa': 1000, 'Milk': 500 + 2**62})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT typeof(stock) FROM choco_app_ingredient WHERE id = %s', [self.milk.pk])
+            self.assertEqual(cursor.fetchone(), ('integer',))
+        self.assertEqual(StockMovement.objects.filter(delta=2**62).count(), 1)
+
+    def test_views_bound_their_input(self):
+        url = f'/inventory/ingredients/{self.cocoa.pk}/stock/'
+        self.assertEqual(self.client.post(url, {'delta': 10**20, 'reason': 'delivery'}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'delta': 2**62, 'reason': 'delivery'}).status_code, 200)
+        self.assertEqual(self.client.post(url, {'delta': 2**62, 'reason': 'delivery'}).status_code, 409)
+        for movement in [{'ingredient': 10**20, 'delta': 1}, {'ingredient': self.milk.pk, 'delta': -10**20}]:
+            with self.subTest(movement=movement):
+                response = self.client.post(
+                    '/inventory/ingredients/stock/batch/', {'movements': [{**movement, 'reason': 'delivery'}]},
+                    content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stocks(), {'Cocoa': 1000 + 2**62, 'Milk': 500})
+
+
+class FixedPointStockMigrationTests(TransactionTestCase):
+    """Migration 0009 turns float gram quantities into whole milligrams."""
+
+    before = [('choco_app', '0008_stock_ledger')]
+    after = [('choco_app', '0009_fixed_point_stock')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('choco_app'))
+
+    def column(self, table, field):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {field}, typeof({field}) FROM choco_app_{table} ORDER BY id')
+            return cursor.fetchall()
+
+    def test_quantities_are_rounded_to_milligrams(self):
+        apps = self.migrate(self.before)
+        Ingredient = apps.get_model('choco_app', 'Ingredient')
+        ingredients = [
+            Ingredient.objects.create(name=name, stock=grams)
+            for name, grams in [('Cocoa', 2.5), ('Sugar', 12.3456), ('Salt', 0.0004), ('Milk', 7)]
+        ]
+        apps.get_model('choco_app', 'StockMovement').objects.create(
+            ingredient_id=ingredients[0].pk, delta=-1.2344, reason='Used',
+        )
+        apps.get_model('choco_app', 'StockSnapshot').objects.create(
+            ingredient_id=ingredients[0].pk, stock=3.7345, taken_at=timezone.now(),
+        )
+
+        self.migrate(self.after)
+        # Half a milligram or more rounds up; less rounds down, to zero for a trace.
+        self.assertEqual(self.column('ingredient', 'stock'),
+                         [(2500, 'integer'), (12346, 'integer'), (0, 'integer'), (7000, 'integer')])
+        self.assertEqual(self.column('stockmovement', 'delta'), [(-1234, 'integer')])
+        self.assertEqual(self.column('stocksnapshot', 'stock'), [(3735, 'integer')])
+        # Existing ingredients were measured in grams.
+        self.assertEqual(self.column('ingredient', 'unit'), [('g', 'text')] * 4)
+
+        self.migrate(self.before)
+        self.assertEqual(self.column('ingredient', 'stock'),
+                         [(2.5, 'real'), (12.346, 'real'), (0.0, 'real'), (7.0, 'real')])
+
+
+class BulkImportTests(TestCase):
+    """Bad rows of an ingredient feed are reported per row; they never abort the import."""
+
+    def test_invalid_rows_are_reported(self):
+        lines = [
+            '{"name": "Cocoa", "stock": "1.5"}\n',
+            '{"name": "Sugar", "stock": 1e30}\n',
+            '{"name": ["Milk"], "stock": 1}\n',
+            '{"name": "Nuts", "stock": 2, "unit": 3}\n',
+            '{"name": "Vanilla", "stock": "1e999999"}\n',
+            '{"name": "Salt", "stock": "9223372036854775.807"}\n',
+        ]
+        result = bulk.import_ingredients(lines, 'jsonl')
+        self.assertEqual((result.rows, result.imported), (6, 2))
+        errors = sorted(result.errors)
+        self.assertEqual([line for line, _message in errors], [2, 3, 4, 5])
+        self.assertIn('beyond the largest storable quantity', errors[0][1])
+        self.assertEqual(errors[1][1], 'name: expected text, not list.')
+        self.assertEqual(
+            dict(Ingredient.objects.values_list('name', 'stock')), {'Cocoa': 1500, 'Salt': 2**63 - 1},
+        )
+
+    def test_undecodable_upload_is_reported(self):
+        content = 'name,stock\nCocoa,1\n'.encode() + 'Crème,2\n'.encode('latin-1')
+        response = self.client.post('/inventory/ingredients/import/', {
+            'file': ContentFile(content, name='feed.csv'), 'format': '',
+        })
+        self.assertEqual(response.status_code, 200)
+        result = response.context['result']
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(result.errors[0][0], 3)
+        self.assertIn('not valid UTF-8', result.errors[0][1])
+        with tempfile.NamedTemporaryFile(suffix='.jsonl') as feed:
+            feed.write(b'{"name": "Milk", "stock": 1}\n{"name": "Cr\xe8me", "stock": 2}\n')
+            feed.flush()
+            stderr = io.StringIO()
+            call_command('import_ingredients', feed.name, stdout=io.StringIO(), stderr=stderr)
+        self.assertIn('not valid UTF-8', stderr.getvalue())
+        self.assertTrue(Ingredient.objects.filter(name='Milk').exists())
+
+
+    def test_byte_order_mark_is_ignored(self):
+        # Spreadsheet programs save "CSV UTF-8" with a BOM before the header.
+        content = codecs.BOM_UTF8 + 'name,stock\nCocoa,1\nCrème,2\n'.encode()
+        response = self.client.post('/inventory/ingredients/import/', {
+            'file': ContentFile(content, name='feed.csv'), 'format': '',
+        })
+        result = response.context['result']
+        self.assertEqual((result.imported, result.errors), (2, []))
+        self.assertEqual(dict(Ingredient.objects.values_list('name', 'stock')), {'Cocoa': 1000, 'Crème': 2000})
+        lines = bulk.decode_lines([codecs.BOM_UTF8 + b'{"name": "Milk", "stock": 1}\n'])
+        self.assertEqual(list(lines), ['{"name": "Milk", "stock": 1}\n'])
+
+    def test_missing_header_column_is_reported_once(self):
+        lines = ['name,quantity\n'] + [f'Ingredient {i},{i}\n' for i in range(5)]
+        result = bulk.import_ingredients(lines, 'csv')
+        self.assertEqual(result.imported, 0)
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(result.errors[0][0], 1)
+        self.assertIn('no stock column', result.errors[0][1])
+        self.assertEqual(bulk.import_ingredients([], 'csv').errors, [])
+
+
+class IngredientFormTests(TestCase):
+    """A stock edit is applied as the difference from the stock shown, validated with the form."""
+
+    def setUp(self):
+        self.cocoa = Ingredient.objects.create(name='Cocoa', stock=5000)
+        self.url = f'/inventory/ingredients/update/{self.cocoa.pk}/'
+
+    def test_stock_edit_is_a_movement(self):
+        Ingredient.objects.adjust_stock(self.cocoa.pk, 1000, 'delivery')
+        response = self.client.post(self.url, {'name': 'Cocoa', 'stock': '3', 'initial-stock': '5'})
+        self.assertEqual(response.status_code, 302)
+        self.cocoa.refresh_from_db()
+        self.assertEqual(self.cocoa.stock, 4000)
+        self.assertEqual(self.cocoa.stock_movements.latest('pk').delta, -2000)
+
+    def test_invalid_initial_stock_is_a_form_error(self):
+        for initial in [{}, {'initial-stock': 'abc'}, {'initial-stock': '-1'}]:
+            with self.subTest(initial=initial):
+                response = self.client.post(self.url, {'name': 'Cocoa', 'stock': '3', **initial})
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('stock', response.context['form'].errors)
+        self.cocoa.refresh_from_db()
+        self.assertEqual(self.cocoa.stock, 5000)
+
+    def test_admin_rejects_negative_stock(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post(f'/admin/choco_app/ingredient/{self.cocoa.pk}/change/', {
+            'name': 'Dark cocoa', 'stock': '0', 'initial-stock': '9',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('removes 9 grams, but only 5 grams is in stock', str(response.context['adminform'].form.errors['stock']))
+        self.cocoa.refresh_from_db()
+        self.assertEqual((self.cocoa.name, self.cocoa.stock), ('Cocoa', 5000))
+
+
+class StockLevelFilterTests(TestCase):
+    """The admin's stock level filter buckets ingredients by the thresholds of their unit."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        # STOCK_LEVEL_THRESHOLDS: 'g' (1 kg, 10 kg) in milligrams, 'unit' (10, 100).
+        for name, stock, unit in [
+            ('Cocoa', 999_999, 'g'), ('Sugar', 1_000_000, 'g'), ('Milk', 9_999_999, 'g'), ('Salt', 10_000_000, 'g'),
+            ('Eggs', 9, 'unit'), ('Vanilla pods', 10, 'unit'), ('Boxes', 99, 'unit'), ('Ribbons', 100, 'unit'),
+        ]:
+            Ingredient.objects.create(name=name, stock=stock, unit=unit)
+
+    def listed(self, query):
+        response = self.client.get(f'/admin/choco_app/ingredient/{query}')
+        self.assertEqual(response.status_code, 200)
+        return {ingredient.name for ingredient in response.context['cl'].result_list}
+
+    def test_buckets(self):
+        self.assertEqual(self.listed('?stock_level=low'), {'Cocoa', 'Eggs'})
+        self.assertEqual(self.listed('?stock_level=ok'), {'Sugar', 'Milk', 'Vanilla pods', 'Boxes'})
+        self.assertEqual(self.listed('?stock_level=high'), {'Salt', 'Ribbons'})
+        self.assertEqual(self.listed('?stock_level=low&unit=unit'), {'Eggs'})
+        self.assertEqual(len(self.listed('')), 8)
+
+    def test_every_bucket_is_an_index_range(self):
+        for level in STOCK_LEVELS:
+            with self.subTest(level=level):
+                sql, params = Ingredient.objects.with_stock_level(level).query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertIn('ingredient_unit_stock_idx', plan)
+                self.assertNotIn('SCAN', plan)
+
+    def test_unknown_level(self):
+        with self.assertRaises(ValueError):
+            Ingredient.objects.with_stock_level('empty')
+
+
+class SuggestionLookupTests(TestCase):
+    """The suggestion picker matches name and flavor prefixes, ignoring case, through indexed ranges."""
+
+    def lookup(self, term):
+        return [row['text'] for row in self.client.get('/inventory/allergy_concern/suggestions/', {'q': term}).json()['results']]
+
+    def test_prefix_matches(self):
+        for name, flavor in [('Mina', 'Lemon'), ('ada', 'Mint'), ('Ada', 'Minty'), ('Bob', 'Mango'), ('50% Off', 'Mint')]:
+            CustomerSuggestion.objects.create(customer_name=name, customer_email='a@example.com', suggested_flavor=flavor)
+        self.assertEqual(self.lookup('AD'), ['ada - Mint', 'Ada - Minty'])
+        # Name matches come first, then flavor matches; a row matching both is listed once.
+        self.assertEqual(self.lookup('mi'), ['Mina - Lemon', 'ada - Mint', '50% Off - Mint', 'Ada - Minty'])
+        self.assertEqual(self.lookup('50%'), ['50% Off - Mint'])
+        self.assertEqual(self.lookup('%'), [])
+        with self.settings(SUGGESTION_LOOKUP_LIMIT=1), self.assertNumQueries(1):
+            self.assertEqual(self.lookup('mi'), ['Mina - Lemon'])
+
+
+class KeysetPaginationTests(TestCase):
+    """The ingredient list pages by (name, pk) cursors and streams the full list with ?stream=1."""
+
+    def setUp(self):
+        cache.clear()
+        for name in ['Vanilla', 'Cocoa', 'Sugar', 'Milk', 'Almond']:
+            Ingredient.objects.create(name=name, stock=1000)
+        self.ordered = list(Ingredient.objects.order_by('name', 'pk').values_list('pk', flat=True))
+
+    def listed(self, html):
+        """Return the primary keys of the ingredients listed in `html`, in order."""
+        return [int(pk) for pk in re.findall(r'/inventory/ingredients/update/(\d+)/', html)]
+
+    def test_pages_break_ties_on_the_primary_key(self):
+        # Four suggestions share a customer name, so pages must order them by primary key.
+        for name in ['Cy', 'Ada', 'Ada', 'Bo', 'Ada', 'Ada']:
+            CustomerSuggestion.objects.create(
+                customer_name=name, customer_email='x@example.com', suggested_flavor='Mint',
+            )
+        ordering = ('customer_name', 'pk')
+        expected = list(CustomerSuggestion.objects.order_by(*ordering).values_list('pk', flat=True))
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(CustomerSuggestion.objects.all(), cursor=cursor, page_size=3, ordering=ordering)
+            seen.extend(suggestion.pk for suggestion in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+        # The first page ended inside the run of ties; the second picks up after its last row.
+        page = keyset_paginate(
+            CustomerSuggestion.objects.all(), cursor=encode_cursor(['Ada', expected[0]]), page_size=2,
+            ordering=ordering,
+        )
+        self.assertEqual([suggestion.pk for suggestion in page], expected[1:3])
+
+    def test_malformed_cursors_are_ignored(self):
+        for token in [None, '', '!!!', 'e30', encode_cursor(['Milk']), encode_cursor(['Milk', 1, 2]),
+                      base64.urlsafe_b64encode(b'not json').decode()]:
+            with self.subTest(token=token):
+                self.assertIsNone(decode_cursor(token, 2))
+        self.assertEqual(decode_cursor(encode_cursor(['Milk', 3]), 2), ['Milk', 3])
+
+    def test_tampered_cursors_start_from_the_first_page(self):
+        self.assertEqual(self.listed(self.client.get('/inventory/ingredients/?page_size=2').content.decode()),
+                         self.ordered[:2])
+        for values in [['Milk', 'x'], [None, 1], ['Milk', [1]], ['Milk', 2 ** 70], ['Milk', None]]:
+            with self.subTest(values=values):
+                self.assertIsNone(clean_cursor_values(Ingredient, ('name', 'pk'), values))
+                cache.clear()
+                response = self.client.get('/inventory/ingredients/', {'page_size': 2, 'cursor': encode_cursor(values)})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.listed(response.content.decode()), self.ordered[:2])
+        self.assertEqual(clean_cursor_values(Ingredient, ('name', 'pk'), ['Milk', '3']), ['Milk', 3])
+
+    def test_keyset_filter_starts_a_range_on_the_first_field(self):
+        condition = keyset_filter(('name', 'pk'), ['Milk', 3])
+        self.assertEqual(
+            condition,
+            Q(name__gte='Milk') & (Q(name__gt='Milk') | Q(pk__gt=3) & Q(name='Milk')),
+        )
+
+    @override_settings(INGREDIENT_STREAM_CHUNK_SIZE=2)
+    def test_stream_lists_every_ingredient_in_order(self):
+        response = self.client.get('/inventory/ingredients/?stream=1')
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        # The page head, the five rows in chunks of two, and the page foot.
+        self.assertEqual(len(chunks), 1 + 3 + 1)
+        html = ''.join(chunks)
+        self.assertEqual(self.listed(html), self.ordered)
+        self.assertEqual(html.count('<html'), 1)
+        self.assertTrue(html.rstrip().endswith('</html>'))
+
+
+class ApiTests(TestCase):
+    """The JSON API serves sparse rows, bulk fetches by id, keyset pages and deltas since a version."""
+
+    def setUp(self):
+        self.cocoa = Ingredient.objects.create(name='Cocoa', stock=1000)
+        self.mint = Ingredient.objects.create(name='Mint', stock=2000)
+        self.salt = Ingredient.objects.create(name='Salt', stock=3000)
+
+    def get(self, url, status=200):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def test_sparse_fields_and_pages(self):
+        first = self.get('/inventory/api/ingredients/?fields=name,stock&page_size=2')
+        self.assertEqual(first['results'], [
+            {'id': self.cocoa.pk, 'name': 'Cocoa', 'stock': 1000}, {'id': self.mint.pk, 'name': 'Mint', 'stock': 2000},
+        ])
+        second = self.get(f"/inventory/api/ingredients/?fields=name&page_size=2&cursor={first['next_cursor']}")
+        self.assertEqual(second['results'], [{'id': self.salt.pk, 'name': 'Salt'}])
+        self.assertIsNone(second['next_cursor'])
+        self.assertIn('errors', self.get('/inventory/api/ingredients/?fields=name,secret', status=400))
+        self.assertEqual(self.client.get('/inventory/api/customers/').status_code, 404)
+
+    def test_bulk_fetch(self):
+        url = f'/inventory/api/ingredients/?fields=name&id={self.salt.pk}&id=999&id={self.cocoa.pk}'
+        data = self.get(url)
+        self.assertEqual([row['name'] for row in data['results']], ['Salt', 'Cocoa'])
+        self.assertEqual(data['missing'], [999])
+        self.assertIn('errors', self.get('/inventory/api/ingredients/?id=x', status=400))
+
+    def test_ids_out_of_the_primary_key_range_are_rejected(self):
+        data = self.get(f'/inventory/api/ingredients/?id={2**63 - 1}&id={-2**63}')
+        self.assertEqual(data['missing'], [2**63 - 1, -2**63])
+        for pk in (2**63, -2**63 - 1, 10**23):
+            with self.subTest(pk=pk):
+                errors = self.get(f'/inventory/api/ingredients/?id={self.cocoa.pk}&id={pk}', status=400)['errors']
+                self.assertIn(f'Id {pk} is out of range.', errors['id'][0])
+        self.assertIn('errors', self.get(f'/inventory/api/ingredients/changes/?since={2**63}', status=400))
+
+    def test_suggestions(self):
+        suggestion = CustomerSuggestion.objects.create(
+            customer_name='Ada', customer_email='ada@example.com', suggested_flavor='Mint', suggestion_reason='Fresh',
+        )
+        suggestion.ingredients.add(self.salt, self.cocoa)
+        row = self.get('/inventory/api/suggestions/')['results'][0]
+        self.assertEqual(row['ingredients'], sorted([self.cocoa.pk, self.salt.pk]))
+        self.assertNotIn('customer_email', row)
+
+    def test_changes_since_version(self):
+        version = self.get('/inventory/api/ingredients/')['version']
+        self.assertEqual(self.get(f'/inventory/api/ingredients/changes/?since={version}'), {
+            'version': version, 'changed': [], 'deleted': [], 'has_more': False,
+        })
+        # Writes that send no signals are recorded too.
+        Ingredient.objects.adjust_stock(self.mint.pk, 500, 'delivery')
+        Ingredient.objects.bulk_create([Ingredient(name='Vanilla', stock=10)])
+        cocoa_id = self.cocoa.pk
+        self.cocoa.delete()
+        Ingredient.objects.adjust_stock(self.mint.pk, 500, 'delivery')
+
+        delta = self.get(f'/inventory/api/ingredients/changes/?since={version}&fields=stock&page_size=2')
+        self.assertTrue(delta['has_more'])
+        self.assertEqual(delta['changed'], [{'id': Ingredient.objects.get(name='Vanilla').pk, 'stock': 10}])
+        self.assertEqual(delta['deleted'], [cocoa_id])
+        rest = self.get(f"/inventory/api/ingredients/changes/?since={delta['version']}&fields=stock")
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(rest['changed'], [{'id': self.mint.pk, 'stock': 3000}])
+        self.assertEqual(self.get('/inventory/api/flavors/changes/')['changed'], [])
+        self.assertIn('errors', self.get('/inventory/api/ingredients/changes/?since=-1', status=400))
+
+
+class FlavorSeasonTests(TestCase):
+    """`is_active` follows the availability window, whose first and last days are both included."""
+
+    def setUp(self):
+        self.day = date(2026, 6, 15)
+        for name, start, end, active in [
+            ('Starts today', 0, 10, False),
+            ('Ends today', -10, 0, True),
+            ('Ended yesterday', -10, -1, True),
+            ('Starts tomorrow', 1, 5, True),
+            ('Running', -1, 1, True),
+            ('Off season', 5, 10, False),
+        ]:
+            FlavorSeason.objects.create(
+                name=name, is_active=active,
+                available_from=self.day + timedelta(days=start), available_to=self.day + timedelta(days=end),
+            )
+
+    def names(self, queryset):
+        return set(queryset.values_list('name', flat=True))
+
+    def test_stale_activation(self):
+        self.assertEqual(
+            self.names(FlavorSeason.objects.stale_activation(self.day)),
+            {'Starts today', 'Ended yesterday', 'Starts tomorrow'},
+        )
+
+    def test_sync_activation_flips_only_stale_flavors(self):
+        before = dict(FlavorSeason.objects.values_list('name', 'updated_at'))
+        version = page_cache.get_version(page_cache.FLAVORS)
+        self.assertEqual(FlavorSeason.objects.sync_activation(self.day), 3)
+        self.assertEqual(
+            self.names(FlavorSeason.objects.filter(is_active=True)), {'Starts today', 'Ends today', 'Running'},
+        )
+        self.assertEqual(self.names(FlavorSeason.objects.current(self.day)), {'Starts today', 'Ends today', 'Running'})
+        after = dict(FlavorSeason.objects.values_list('name', 'updated_at'))
+        self.assertEqual({name for name in before if before[name] != after[name]},
+                         {'Starts today', 'Ended yesterday', 'Starts tomorrow'})
+        self.assertNotEqual(page_cache.get_version(page_cache.FLAVORS), version)
+
+        version = page_cache.get_version(page_cache.FLAVORS)
+        with self.assertNumQueries(1):
+            self.assertEqual(FlavorSeason.objects.sync_activation(self.day), 0)
+        self.assertEqual(page_cache.get_version(page_cache.FLAVORS), version)
+
+    def test_window_moves_with_the_day(self):
+        FlavorSeason.objects.sync_activation(self.day)
+        next_day = self.day + timedelta(days=1)
+        self.assertEqual(
+            self.names(FlavorSeason.objects.stale_activation(next_day)), {'Starts tomorrow', 'Ends today'},
+        )
+        out = io.StringIO()
+        call_command('sync_flavor_seasons', date=next_day.isoformat(), stdout=out)
+        self.assertEqual(out.getvalue(), '2 flavor(s) updated.\n')
+        self.assertEqual(self.names(FlavorSeason.objects.current(next_day)), {'Starts today', 'Starts tomorrow', 'Running'})
+
+    def test_listing_is_sorted_by_name(self):
+        FlavorSeason.objects.sync_activation(self.day)
+        self.assertEqual(
+            [flavor.name for flavor in FlavorSeason.objects.current(self.day).sorted_by_name()],
+            ['Ends today', 'Running', 'Starts today'],
+        )
+
+
+class TemplateFragmentTests(TestCase):
+    """Pages share the base layout and reuse cached fragments until their cache group changes."""
+
+    def setUp(self):
+        cache.clear()
+        today = timezone.localdate()
+        FlavorSeason.objects.create(
+            name='Hazelnut', available_from=today - timedelta(days=1), available_to=today + timedelta(days=1),
+        )
+        self.request = RequestFactory().get('/')
+
+    def render_flavors(self):
+        return render_to_string(
+            'season_flavor.html', {'flavors': FlavorSeason.objects.current().sorted_by_name()}, self.request,
+        )
+
+    def test_layout(self):
+        html = self.client.get('/inventory/').content.decode()
+        self.assertEqual(html.count('<html'), 1)
+        self.assertEqual(html.count('<header>'), 1)
+        self.assertEqual(html.count('<footer>'), 1)
+        stream = b''.join(self.client.get('/inventory/ingredients/?stream=1').streaming_content).decode()
+        self.assertEqual(stream.count('<html'), 1)
+        self.assertNotIn(views.STREAM_ROWS_MARKER, stream)
+
+    def test_listing_fragment_follows_versions(self):
+        self.assertIn('Hazelnut', self.render_flavors())
+        with self.assertNumQueries(0):
+            self.assertIn('Hazelnut', self.render_flavors())
+        today = timezone.localdate()
+        FlavorSeason.objects.create(name='Praline', available_from=today, available_to=today)
+        self.request = RequestFactory().get('/')
+        self.assertIn('Praline', self.render_flavors())
+
+
+class AsyncViewTests(TestCase):
+    """The async variants served under ASGI render the same pages as the sync views."""
+
+    def setUp(self):
+        today = timezone.localdate()
+        for i in range(3):
+            Ingredient.objects.create(name=f'Ingredient {i}', stock=1000)
+            FlavorSeason.objects.create(
+                name=f'Flavor {i}', available_from=today - timedelta(days=1), available_to=today + timedelta(days=1),
+            )
+
+    def render_sync(self, view, url):
+        cache.clear()
+        response = view(RequestFactory().get(url))
+        return b''.join(response) if response.streaming else response.content
+
+    async def render_async(self, view, url):
+        await cache.aclear()
+        response = await view(RequestFactory().get(url))
+        return b''.join([chunk async for chunk in response]) if response.streaming else response.content
+
+    async def test_async_views_match_sync_views(self):
+        for sync_view, async_view, url in [
+            (views.list_ingredients, views.list_ingredients_async, '/inventory/ingredients/?page_size=2'),
+            (views.list_ingredients, views.list_ingredients_async, '/inventory/ingredients/?stream=1'),
+            (views.view_seasonal_flavors, views.view_seasonal_flavors_async, '/inventory/seasonal_flavors/'),
+            (views.home_view, views.home_view_async, '/inventory/'),
+        ]:
+            with self.subTest(url=url):
+                expected = await sync_to_async(self.render_sync)(sync_view, url)
+                self.assertEqual(await self.render_async(async_view, url), expected)
+
+    def serve_async_views(self):
+        """Reload the URLconfs as under ASGI; the configured views are restored after the test."""
+        modules = [app_urls, importlib.import_module(settings.ROOT_URLCONF)]
+        with self.settings(ASYNC_VIEWS=True):
+            for module in modules:
+                importlib.reload(module)
+        clear_url_caches()
+        self.addCleanup(clear_url_caches)
+        for module in reversed(modules):
+            self.addCleanup(importlib.reload, module)
+
+    def get_sync(self, url):
+        cache.clear()
+        response = self.client.get(url)
+        return response.status_code, b''.join(response) if response.streaming else response.content
+
+    async def test_asgi_urlconf_serves_the_sync_pages(self):
+        await self.assert_asgi_serves_sync_pages()
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'choco_cache'},
+    })
+    async def test_asgi_pages_render_with_the_database_cache(self):
+        # {% cache %} fragments read this backend synchronously, which the event loop forbids.
+        await sync_to_async(call_command)('createcachetable', verbosity=0)
+        await self.assert_asgi_serves_sync_pages()
+
+    async def assert_asgi_serves_sync_pages(self):
+        """Assert that the async views, served through AsyncClient, answer as the sync views do."""
+        urls = ['/inventory/ingredients/?page_size=2', '/inventory/ingredients/?stream=1',
+                '/inventory/seasonal_flavors/', '/inventory/']
+        expected = {url: await sync_to_async(self.get_sync)(url) for url in urls}
+        self.serve_async_views()
+        self.assertIs(resolve('/inventory/').func, views.home_view_async)
+        for url in urls:
+            with self.subTest(url=url):
+                await cache.aclear()
+                response = await self.async_client.get(url)
+                if response.streaming:
+                    content = b''.join([chunk async for chunk in response.streaming_content])
+                else:
+                    content = response.content
+                self.assertEqual((response.status_code, content), expected[url])
+
+
+class LiveEventsTests(TestCase):
+    """Writes recorded in the RowChange log by any process are pushed to live update clients."""
+
+    def setUp(self):
+        # A fresh broadcaster without its polling thread: the tests poll it themselves.
+        self.broadcaster = events.Broadcaster(queue_size=2)
+        for patcher in (
+            mock.patch.object(events, 'broadcaster', self.broadcaster),
+            mock.patch.object(events.Broadcaster, '_ensure_polling'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_changes_from_every_write_path(self):
+        today = timezone.localdate()
+        since = api.current_version()
+        cocoa = Ingredient.objects.create(name='Cocoa', stock=1000)
+        milk = Ingredient.objects.create(name='Milk', stock=10)
+        Ingredient.objects.filter(pk=cocoa.pk).update(stock=600)
+        milk_pk = milk.pk
+        milk.delete()
+        flavor = FlavorSeason.objects.create(name='Hazelnut', available_from=today, available_to=today)
+        FlavorSeason.objects.filter(pk=flavor.pk).update(is_active=False)
+        FlavorSeason.objects.sync_activation(today)
+        batch, has_more = events.read_changes(since, 10)
+        self.assertFalse(has_more)
+        self.assertEqual(batch.version, api.current_version())
+        self.assertEqual(batch.events, [
+            events.Event(events.INGREDIENTS, {
+                'changed': [{'id': cocoa.pk, 'name': 'Cocoa', 'stock': 600, 'unit': cocoa.unit}],
+                'deleted': [milk_pk],
+            }),
+            events.Event(events.FLAVORS, {
+                'changed': [{
+                    'id': flavor.pk, 'name': 'Hazelnut', 'available_from': today, 'available_to': today,
+                    'is_active': True,
+                }],
+                'deleted': [],
+            }),
+        ])
+        batch, has_more = events.read_changes(since, 1)
+        self.assertTrue(has_more)
+        self.assertEqual(len(batch.events[0].data['changed']), 1)
+        version = api.current_version()
+        self.assertEqual(events.read_changes(version, 10), (events.Batch(version, version, []), False))
+
+    async def test_poll_fans_out_to_subscriptions(self):
+        subscription = self.broadcaster.subscribe()
+        start = await sync_to_async(self.broadcaster.position)()
+        cocoa = await Ingredient.objects.acreate(name='Cocoa', stock=1000)
+        await sync_to_async(self.broadcaster.poll)()
+        await asyncio.sleep(0)
+        batch = subscription.queue.get_nowait()
+        self.assertEqual((batch.since, batch.version), (start, await sync_to_async(api.current_version)()))
+        self.assertEqual(batch.events[0].data['changed'][0]['id'], cocoa.pk)
+        await sync_to_async(self.broadcaster.poll)()
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.queue.empty())
+        for stock in range(3):
+            await Ingredient.objects.filter(pk=cocoa.pk).aupdate(stock=stock)
+            await sync_to_async(self.broadcaster.poll)()
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.lost)
+        self.broadcaster.unsubscribe(subscription)
+        self.assertEqual(self.broadcaster.subscriber_count(), 0)
+
+    async def test_stream_replays_missed_changes(self):
+        since = await sync_to_async(api.current_version)()
+        cocoa = await Ingredient.objects.acreate(name='Cocoa', stock=1000)
+        await FlavorSeason.objects.acreate(
+            name='Hazelnut', available_from=timezone.localdate(), available_to=timezone.localdate(),
+        )
+        version = await sync_to_async(api.current_version)()
+        chunks = events.stream([events.INGREDIENTS], since)
+        self.assertEqual(await anext(chunks), 'retry: 3000\n\n')
+        self.assertEqual(await anext(chunks), (
+            f'id: {version}\nevent: ingredients\n'
+            f'data: {{"changed":[{{"id":{cocoa.pk},"name":"Cocoa","stock":1000,"unit":"{cocoa.unit}"}}],"deleted":[]}}\n\n'
+        ))
+        await chunks.aclose()
+
+    async def test_stream_resets_after_too_many_changes(self):
+        since = await sync_to_async(api.current_version)()
+        for name in ('Cocoa', 'Milk'):
+            await Ingredient.objects.acreate(name=name, stock=1)
+        version = await sync_to_async(api.current_version)()
+        for last_event_id in (since, version + 1):
+            chunks = events.stream(events.TOPICS, last_event_id, replay_limit=1)
+            await anext(chunks)
+            self.assertEqual(await anext(chunks), f'id: {version}\nevent: reset\ndata: {{}}\n\n')
+            await chunks.aclose()
+
+    def test_view_requires_asgi(self):
+        with self.settings(ASYNC_VIEWS=False):
+            self.assertEqual(self.client.get('/inventory/events/').status_code, 501)
+
+    @override_settings(ASYNC_VIEWS=True)
+    async def test_view_streams_events(self):
+        version = await sync_to_async(api.current_version)()
+        response = await self.async_client.get('/inventory/events/?topics=flavors')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        self.assertEqual(await anext(chunks), f'id: {version}\n\n'.encode())
+        await Ingredient.objects.acreate(name='Cocoa', stock=1)
+        flavor = await FlavorSeason.objects.acreate(
+            name='Hazelnut', available_from=timezone.localdate(), available_to=timezone.localdate(),
+        )
+        await sync_to_async(self.broadcaster.poll)()
+        chunk = await anext(chunks)
+        version = await sync_to_async(api.current_version)()
+        self.assertTrue(chunk.startswith(b'id: %d\nevent: flavors\ndata: {"changed":[{"id":%d,' % (version, flavor.pk)))
+        self.assertNotIn(b'ingredients', chunk)
+        await chunks.aclose()
+        bad = await self.async_client.get('/inventory/events/?topics=suggestions')
+        self.assertEqual(bad.status_code, 400)
+
+
+@skipUnless(planner.available(), 'NumPy is not installed')
+class ProductionPlannerTests(TestCase):
+    """The planner works out the batches each flavor allows and shares the stock between them."""
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.cocoa = Ingredient.objects.create(name='Cocoa', stock=1000)
+        self.milk = Ingredient.objects.create(name='Milk', stock=500)
+        self.nuts = Ingredient.objects.create(name='Nuts', stock=5)
+        flavors = {}
+        for name, is_active in [('Dark', True), ('Extra Dark', True), ('Praline', False)]:
+            flavors[name] = FlavorSeason.objects.create(
+                name=name, available_from=today, available_to=today, is_active=is_active,
+            )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(flavor=flavors['Dark'], ingredient=self.cocoa, quantity=100),
+            RecipeIngredient(flavor=flavors['Dark'], ingredient=self.milk, quantity=50),
+            RecipeIngredient(flavor=flavors['Extra Dark'], ingredient=self.cocoa, quantity=300),
+            RecipeIngredient(flavor=flavors['Praline'], ingredient=self.nuts, quantity=10),
+        ])
+
+    def batches(self, plan):
+        return {row['name']: (row['max_batches'], row['batches'], row['limited_by']) for row in plan['flavors']}
+
+    def test_plan_shares_stock(self):
+        plan = planner.plan()
+        self.assertEqual(self.batches(plan), {'Dark': (10, 4, 'Cocoa'), 'Extra Dark': (3, 2, 'Cocoa')})
+        self.assertEqual(
+            [(row['name'], row['used'], row['left']) for row in plan['ingredients']],
+            [('Cocoa', 1000, 0), ('Milk', 200, 300)],
+        )
+
+    def test_plan_by_demand(self):
+        FlavorStats.objects.create(suggested_flavor='Dark', suggestion_count=2)
+        plan = planner.plan(planner.DEMAND, active_only=False)
+        self.assertEqual(self.batches(plan), {
+            'Dark': (10, 7, 'Cocoa'), 'Extra Dark': (3, 1, 'Cocoa'), 'Praline': (0, 0, 'Nuts'),
+        })
+
+    def test_allocation_is_feasible_and_complete(self):
+        np = planner.np
+        rng = np.random.default_rng(7)
+        stock = rng.integers(0, 10_000, 40)
+        rows = [
+            (flavor, f'F{flavor}', int(ingredient), f'I{ingredient}', 'g', int(stock[ingredient]),
+             int(rng.integers(1, 500)))
+            for flavor in range(200) for ingredient in sorted(rng.choice(40, 4, replace=False))
+        ]
+        recipes = planner.Recipes(rows)
+        for weights in (np.ones(200), rng.integers(0, 5, 200)):
+            batches, left = recipes.allocate(weights)
+            self.assertTrue((left >= 0).all())
+            self.assertTrue((recipes.stock - recipes.usage(batches) == left).all())
+            # No flavor that gets a share could make another batch from what is left.
+            self.assertTrue((recipes.capacity(left)[0][weights > 0] == 0).all())
+            self.assertTrue((batches[weights == 0] == 0).all())
+
+    def test_view_and_command(self):
+        response = self.client.get('/inventory/production/?flavors=all')
+        self.assertContains(response, 'Praline')
+        self.assertContains(response, '0.3 grams')
+        self.assertNotContains(self.client.get('/inventory/production/'), 'Praline')
+        RecipeIngredient.objects.filter(ingredient=self.nuts).delete()
+        self.assertNotContains(self.client.get('/inventory/production/?flavors=all'), 'Praline')
+        output = io.StringIO()
+        call_command('plan_production', '--weights', 'demand', stdout=output)
+        self.assertIn('Extra Dark', output.getvalue())
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    """Every SQLite connection is opened with the tuned PRAGMAs and IMMEDIATE transactions."""
+
+    def connect(self):
+        """Open a connection configured like the default database, on a file of its own."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_dict = dict(connections['default'].settings_dict, NAME=os.path.join(directory, 'db.sqlite3'))
+        wrapper = connections['default'].__class__(settings_dict, alias='pragmas')
+        connections['pragmas'] = wrapper
+        self.addCleanup(connections.__delitem__, 'pragmas')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pragmas_are_applied(self):
+        wrapper = self.connect()
+        with wrapper.cursor() as cursor:
+            values = {}
+            for pragma in ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values[pragma] = cursor.fetchone()[0]
+        self.assertEqual(values, {
+            'journal_mode': 'wal', 'synchronous': 1, 'mmap_size': 268435456, 'cache_size': -65536,
+            'temp_store': 2, 'busy_timeout': 20000,
+        })
+
+    def test_transactions_take_the_write_lock_at_once(self):
+        wrapper = self.connect()
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x)')
+        other = sqlite3.connect(wrapper.settings_dict['NAME'], timeout=0)
+        self.addCleanup(other.close)
+        # A transaction that has only read still holds the write lock, so it can never be asked to upgrade.
+        with transaction.atomic(using='pragmas'):
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT count(*) FROM t')
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+        other.execute('BEGIN IMMEDIATE')
+        other.rollback()
+
+
+class SampleDataTests(TestCase):
+    """The sample_data fixture loads into a freshly migrated database."""
+    fixtures = ['sample_data']
+
+    def test_ledger_agrees_with_the_stock(self):
+        for ingredient in Ingredient.objects.all():
+            self.assertEqual(ingredient.stock_as_of(timezone.now()), ingredient.stock, ingredient.name)
+
+    def test_ingredient_list_shows_the_sample_rows(self):
+        response = self.client.get('/inventory/ingredients/')
+        for name in ('Cocoa Beans', 'Cocoa Butter', 'Vanilla'):
+            self.assertContains(response, name)
+
+
+class DeploymentTests(SimpleTestCase):
+    """The production entry point shares the page cache between its workers."""
+
+    def load_gunicorn_conf(self, **env):
+        """Run gunicorn.conf.py with `env` (None unsets) and return its settings and the environment it left."""
+        with mock.patch.dict(os.environ):
+            for name, value in env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            return runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py')), dict(os.environ)
+
+    def test_workers_share_a_file_cache_by_default(self):
+        conf, environ = self.load_gunicorn_conf(WEB_WORKERS='3', PAGE_CACHE_BACKEND=None)
+        self.assertEqual(conf['workers'], 3)
+        self.assertEqual(environ['PAGE_CACHE_BACKEND'], 'file')
+
+    def test_several_workers_on_locmem_are_refused(self):
+        with self.assertRaises(SystemExit):
+            self.load_gunicorn_conf(WEB_WORKERS='3', PAGE_CACHE_BACKEND='locmem')
+        conf, _environ = self.load_gunicorn_conf(WEB_WORKERS='1', PAGE_CACHE_BACKEND='locmem')
+        self.assertEqual(conf['workers'], 1)
+
+    def test_asgi_interface_runs_uvicorn_workers(self):
+        conf, _environ = self.load_gunicorn_conf(WEB_INTERFACE=None)
+        self.assertEqual((conf['wsgi_app'], conf['worker_class']), ('chocolate_house.wsgi:application', 'gthread'))
+        conf, _environ = self.load_gunicorn_conf(WEB_INTERFACE='asgi')
+        self.assertEqual(
+            (conf['wsgi_app'], conf['worker_class']),
+            ('chocolate_house.asgi:application', 'uvicorn.workers.UvicornWorker'),
+        )
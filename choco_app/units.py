@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+# Stock is stored as an integer count of base units: milligrams for ingredients
+# measured in grams and whole items for ingredients counted in units. Integer
+# sums are exact, unlike repeatedly adding floats.
+GRAMS = 'g'
+UNITS = 'unit'
+
+UNIT_CHOICES = [
+    (GRAMS, 'grams'),
+    (UNITS, 'units'),
+]
+
+# The largest quantity of base units a stock or movement may hold: stock is a
+# 64-bit integer column, and SQLite silently turns integer overflow into REAL.
+MAX_QUANTITY = 2**63 - 1
+
+# Number of base units per display unit.
+SCALE = {
+    GRAMS: 1000,
+    UNITS: 1,
+}
+
+
+def to_base(quantity, unit):
+    """
+    Convert a quantity in display units (grams or units) to integer base units.
+
+    Parameters:
+        quantity (Decimal | int | float | str): The quantity, e.g. 12.5 grams.
+        unit (str): GRAMS or UNITS.
+
+    Returns:
+        int: The quantity in base units, e.g. 12500 milligrams.
+
+    Raises:
+        ValueError: If the quantity is not a number, is finer than one base unit
+                    or is beyond +/- MAX_QUANTITY base units.
+    """
+    try:
+        scaled = Decimal(str(quantity)) * SCALE[unit]
+    except (ArithmeticError, KeyError):
+        raise ValueError(f'Invalid quantity {quantity!r} in unit {unit!r}')
+    if not scaled.is_finite():
+        raise ValueError(f'Invalid quantity {quantity!r} in unit {unit!r}')
+    if abs(scaled) > MAX_QUANTITY:
+        raise ValueError(f'{quantity} {unit} is beyond the largest storable quantity, {format_quantity(MAX_QUANTITY, unit)}')
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f'{quantity} {unit} is more precise than the stored resolution')
+    return int(scaled)
+
+
+def from_base(value, unit):
+    """
+    Convert integer base units back to a display quantity.
+
+    Parameters:
+        value (int): The quantity in base units.
+        unit (str): GRAMS or UNITS.
+
+    Returns:
+        Decimal: The quantity in display units, e.g. Decimal('12.5') grams.
+    """
+    return (Decimal(value) / SCALE[unit]).normalize() if value else Decimal(0)
+
+
+def format_quantity(value, unit):
+    """Return a base-unit quantity formatted for display, e.g. "12.5 grams"."""
+    return f"{from_base(value, unit):f} {dict(UNIT_CHOICES).get(unit, unit)}"
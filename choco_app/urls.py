@@ -1,16 +1,41 @@
+from django.conf import settings
 from django.urls import path
-from .views import list_ingredients, create_customer_suggestion,suggestion_success_view, view_seasonal_flavors, create_allergy_concern, allergy_concern_success_view,home_view,contact_view, about_view,create_ingredient, update_ingredient, delete_ingredient, add_seasonal_flavor, update_seasonal_flavor,delete_seasonal_flavor
+from .views import create_customer_suggestion, ingredient_catalogue, suggestion_success_view, create_allergy_concern, customer_suggestion_lookup, search_suggestions, check_allergens, allergy_concern_success_view, analytics_view, production_plan, api_list, api_changes, live_events,contact_view, about_view,create_ingredient, update_ingredient, delete_ingredient, import_ingredients, export_ingredients, adjust_ingredient_stock, adjust_stock_batch, add_seasonal_flavor, update_seasonal_flavor,delete_seasonal_flavor
+
+# Under ASGI (chocolate_house/asgi.py turns ASYNC_VIEWS on) the read-heavy pages
+# are served by their async variants, which do not hold a worker thread while
+# waiting on the database.
+if settings.ASYNC_VIEWS:
+    from .views import (
+        list_ingredients_async as list_ingredients, view_seasonal_flavors_async as view_seasonal_flavors,
+        home_view_async as home_view,
+    )
+else:
+    from .views import list_ingredients, view_seasonal_flavors, home_view
 
 urlpatterns = [
     path('ingredients/', list_ingredients, name='ingredient_list'),
     path('ingredients/create/', create_ingredient, name='ingredient_create'),
     path('ingredients/update/<int:pk>/',update_ingredient, name='ingredient_update'),
     path('ingredients/delete/<int:pk>/', delete_ingredient, name='ingredient_delete'),
+    path('ingredients/<int:pk>/stock/', adjust_ingredient_stock, name='ingredient_stock_adjust'),
+    path('ingredients/stock/batch/', adjust_stock_batch, name='ingredient_stock_batch'),
+    path('ingredients/import/', import_ingredients, name='ingredient_import'),
+    path('ingredients/export/', export_ingredients, name='ingredient_export'),
     path('suggest/', create_customer_suggestion, name='customer_suggestion'),
+    path('suggest/search/', search_suggestions, name='suggestion_search'),
+    path('suggest/ingredients/', ingredient_catalogue, name='ingredient_catalogue'),
     path('suggest/success/', suggestion_success_view, name='suggestion_success'),
     path('seasonal_flavors/', view_seasonal_flavors, name='seasonal_flavors'),
     path('allergy_concern/', create_allergy_concern, name='allergy_concern_create'),
+    path('allergy_concern/suggestions/', customer_suggestion_lookup, name='customer_suggestion_lookup'),
+    path('allergy_concern/check/', check_allergens, name='allergen_check'),
     path('allergy_concern/success/', allergy_concern_success_view, name='allergy_concern_success'),
+    path('analytics/', analytics_view, name='analytics'),
+    path('production/', production_plan, name='production_plan'),
+    path('api/<slug:resource>/', api_list, name='api_list'),
+    path('api/<slug:resource>/changes/', api_changes, name='api_changes'),
+    path('events/', live_events, name='live_events'),
     path('', home_view, name='home'),
     path('contact/', contact_view, name='contact'),  
     path('about/', about_view, name='about'),
@@ -1,30 +1,159 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from .models import Ingredient, FlavorSeason
-from .forms import SuggestionForm, AllergyForm, InquiryForm, IngredientForm, SeasonalFlavorForm
+import json
+from itertools import islice
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template import loader
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_POST
+from . import allergens, analytics, api, bulk, cache, events, planner, search, submissions
+from .models import Ingredient, FlavorSeason, CustomerSuggestion, InsufficientStock, StockLimitExceeded
+from .units import format_quantity
+from .forms import (
+    SuggestionForm, AllergyForm, InquiryForm, IngredientForm, IngredientImportForm, SeasonalFlavorForm,
+    StockMovementForm, BatchStockMovementForm,
+)
+from .pagination import akeyset_paginate, get_page_size, keyset_paginate
+
+# Where the rows go in ingredient_stream.html; the page is split around it.
+STREAM_ROWS_MARKER = '<!-- rows -->'
+
+# Browser cache lifetime of a versioned ingredient catalogue: one year, as its URL changes with its content.
+CATALOGUE_MAX_AGE = 31536000
+
+@cache.conditional_page(cache.INGREDIENTS, params=('cursor', 'page_size', 'stream'))
+@cache.cache_page_for(cache.INGREDIENTS, params=('cursor', 'page_size', 'stream'))
 def list_ingredients(request):
     """
-    View to list all ingredients.
+    View to list ingredients one page at a time.
+
+    Ingredients are ordered by name and paginated with a keyset cursor taken from
+    the `cursor` query parameter, so every page costs the same regardless of how
+    deep into the inventory it is. The page size comes from `page_size` (bounded by
+    the INGREDIENT_PAGE_SIZE / INGREDIENT_MAX_PAGE_SIZE settings). Passing
+    `stream=1` instead streams the whole inventory, see `stream_ingredients`.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: Rendered HTML response with one page of ingredients, or a
+                      StreamingHttpResponse with all of them.
+    """
+    if request.GET.get('stream') == '1':
+        return stream_ingredients(request)
+    page = keyset_paginate(
+        Ingredient.objects.only('pk', 'name', 'stock', 'unit'),
+        cursor=request.GET.get('cursor'),
+        page_size=get_page_size(request),
+    )
+    return render(request, 'ingredient.html', {'ingredients': page.items, 'page': page})
+
+@cache.conditional_page(cache.INGREDIENTS, params=('cursor', 'page_size', 'stream'))
+@cache.cache_page_for(cache.INGREDIENTS, params=('cursor', 'page_size', 'stream'))
+async def list_ingredients_async(request):
+    """
+    Async variant of `list_ingredients`, served under ASGI (see the ASYNC_VIEWS setting).
+
+    The page is read with the async ORM API before rendering, so the template
+    only sees evaluated rows. The template is rendered in a thread, since its
+    ``{% cache %}`` fragments read the cache synchronously (from the database
+    with PAGE_CACHE_BACKEND=db).
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: Rendered HTML response with one page of ingredients, or a
+                      StreamingHttpResponse with all of them.
+    """
+    if request.GET.get('stream') == '1':
+        return stream_ingredients_async(request)
+    page = await akeyset_paginate(
+        Ingredient.objects.only('pk', 'name', 'stock', 'unit'),
+        cursor=request.GET.get('cursor'),
+        page_size=get_page_size(request),
+    )
+    return await sync_to_async(render)(request, 'ingredient.html', {'ingredients': page.items, 'page': page})
+
+def stream_ingredients(request):
+    """
+    Stream the full ingredient inventory as HTML.
+
+    Rows are read with a server-side iterator over `values()` (no model instances)
+    and rendered in fixed-size chunks, so time-to-first-byte and peak memory stay
+    flat no matter how many ingredients exist. The page around the rows is
+    rendered once from ingredient_stream.html, with the site layout, and sent
+    in two parts either side of STREAM_ROWS_MARKER.
+
+    Parameters:
+        request (HttpRequest): The request object.
 
-    This view retrieves all ingredients from the database and renders them
-    in the 'ingredient.html' template.
+    Returns:
+        StreamingHttpResponse: The streamed HTML document.
+    """
+    chunk_size = getattr(settings, 'INGREDIENT_STREAM_CHUNK_SIZE', 2000)
+    rows = Ingredient.objects.order_by('name', 'pk').values('pk', 'name', 'stock', 'unit').iterator(chunk_size=chunk_size)
+    body = loader.get_template('ingredient_rows.html')
+
+    def render_chunks():
+        start, end = _render_stream_page(request)
+        yield start
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            yield body.render({'ingredients': chunk}, request)
+        yield end
+
+    return StreamingHttpResponse(render_chunks(), content_type='text/html; charset=utf-8')
+
+def _render_stream_page(request):
+    """Render ingredient_stream.html and return the HTML before and after its rows."""
+    page = loader.render_to_string('ingredient_stream.html', request=request)
+    start, end = page.split(STREAM_ROWS_MARKER, 1)
+    return start, end
+
+def stream_ingredients_async(request):
+    """
+    Async variant of `stream_ingredients`: the rows are read with `aiterator()`
+    and the layout around them is rendered in a thread.
 
     Parameters:
         request (HttpRequest): The request object.
 
     Returns:
-        HttpResponse: Rendered HTML response with the list of ingredients.
+        StreamingHttpResponse: The streamed HTML document, with an async iterator as content.
     """
-    all_ingredients = Ingredient.objects.all()  
-    return render(request, 'ingredient.html', {'ingredients': all_ingredients})
+    chunk_size = getattr(settings, 'INGREDIENT_STREAM_CHUNK_SIZE', 2000)
+    rows = Ingredient.objects.order_by('name', 'pk').values('pk', 'name', 'stock', 'unit').aiterator(chunk_size=chunk_size)
+    body = loader.get_template('ingredient_rows.html')
+
+    async def render_chunks():
+        start, end = await sync_to_async(_render_stream_page)(request)
+        yield start
+        chunk = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield body.render({'ingredients': chunk}, request)
+                chunk = []
+        if chunk:
+            yield body.render({'ingredients': chunk}, request)
+        yield end
+
+    return StreamingHttpResponse(render_chunks(), content_type='text/html; charset=utf-8')
 
 def create_customer_suggestion(request):
     """
     View to create a customer flavor suggestion.
 
     This view handles the form submission for customer suggestions.
-    If the request method is POST and the form is valid, the suggestion is saved
-    and the user is redirected to the success page. Otherwise, a blank form is displayed.
+    If the request method is POST and the form is valid, the suggestion is submitted
+    (see `submissions.submit`) and the user is redirected to the success page. Otherwise, a blank form is displayed.
 
     Parameters:
         request (HttpRequest): The request object.
@@ -36,13 +165,37 @@ def create_customer_suggestion(request):
     if request.method == 'POST':
         form = SuggestionForm(request.POST)
         if form.is_valid():
-            form.save() 
+            submissions.submit('suggestion', form)
             return redirect('suggestion_success')  
     else:
         form = SuggestionForm()
 
     return render(request, 'customer_suggestion.html', {'form': form})
 
+@cache.conditional_page(cache.INGREDIENTS, params=('v',))
+@cache.cache_page_for(cache.INGREDIENTS, params=('v',))
+def ingredient_catalogue(request):
+    """
+    JSON catalogue of every ingredient, behind the ingredient picker of the suggestion form.
+
+    Only the id and name columns are read, as tuples, and the response is cached
+    under the INGREDIENTS version like the ingredient pages. The picker requests
+    it as `?v=<version>`; when that is the current version the response is marked
+    immutable, since any ingredient change produces a new URL.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        JsonResponse: ``{"version": ..., "ingredients": [[id, name], ...]}``, ordered by name.
+    """
+    version = cache.get_version(cache.INGREDIENTS)
+    rows = Ingredient.objects.order_by('name', 'pk').values_list('pk', 'name')
+    response = JsonResponse({'version': version, 'ingredients': list(rows)})
+    if request.GET.get('v') == str(version):
+        patch_cache_control(response, public=True, max_age=CATALOGUE_MAX_AGE, immutable=True)
+    return response
+
 def suggestion_success_view(request):
     """
     View to display the success page after a customer suggestion is created.
@@ -55,12 +208,14 @@ def suggestion_success_view(request):
     """
     return render(request, 'suggestion_success.html')
 
+@cache.conditional_page(cache.FLAVORS, daily=True)
+@cache.cache_page_for(cache.FLAVORS, daily=True)
 def view_seasonal_flavors(request):
     """
-    View to list active seasonal flavors.
+    View to list the seasonal flavors on offer today.
 
-    This view retrieves all active flavors from the database and renders them
-    in the 'season_flavor.html' template.
+    This view retrieves the flavors that are active and whose availability window
+    contains today's date, and renders them in the 'season_flavor.html' template.
 
     Parameters:
         request (HttpRequest): The request object.
@@ -68,16 +223,31 @@ def view_seasonal_flavors(request):
     Returns:
         HttpResponse: Rendered HTML response with the list of active seasonal flavors.
     """
-    active_flavors = FlavorSeason.objects.filter(is_active=True)  
+    active_flavors = FlavorSeason.objects.current().sorted_by_name()
     return render(request, 'season_flavor.html', {'flavors': active_flavors})
 
+@cache.conditional_page(cache.FLAVORS, daily=True)
+@cache.cache_page_for(cache.FLAVORS, daily=True)
+async def view_seasonal_flavors_async(request):
+    """
+    Async variant of `view_seasonal_flavors`, served under ASGI (see the ASYNC_VIEWS setting).
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: Rendered HTML response with the list of active seasonal flavors.
+    """
+    active_flavors = await FlavorSeason.objects.current().asorted_by_name()
+    return await sync_to_async(render)(request, 'season_flavor.html', {'flavors': active_flavors})
+
 def create_allergy_concern(request):
     """
     View to create an allergy concern related to customer suggestions.
 
     This view handles the form submission for allergy concerns. If the request
-    method is POST and the form is valid, the concern is saved and the user is
-    redirected to the success page. Otherwise, a blank form is displayed.
+    method is POST and the form is valid, the concern is submitted (see
+    `submissions.submit`) and the user is redirected to the success page. Otherwise, a blank form is displayed.
 
     Parameters:
         request (HttpRequest): The request object.
@@ -89,13 +259,303 @@ def create_allergy_concern(request):
     if request.method == 'POST':
         form = AllergyForm(request.POST)
         if form.is_valid():
-            form.save()
+            submissions.submit('allergy_issue', form)
             return redirect('allergy_concern_success')  
     else:
         form = AllergyForm()
     
     return render(request, 'allergy_concern.html', {'form': form})
 
+def customer_suggestion_lookup(request):
+    """
+    JSON lookup endpoint behind the customer suggestion picker of the allergy concern form.
+
+    Returns at most SUGGESTION_LOOKUP_LIMIT suggestions whose customer name or
+    suggested flavor starts with the `q` query parameter (ignoring case): name
+    matches first, then flavor matches. Each is an indexed prefix range read in
+    index order (see `CustomerSuggestionQuerySet.starting_with`), and the flavor
+    query only runs when the names leave room. Only the columns needed for the
+    label are read and no model instances are created.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        JsonResponse: ``{"results": [{"id": ..., "text": ...}, ...]}``.
+    """
+    term = request.GET.get('q', '').strip()
+    if not term:
+        return JsonResponse({'results': []})
+    limit = getattr(settings, 'SUGGESTION_LOOKUP_LIMIT', 20)
+    columns = ('pk', 'customer_name', 'suggested_flavor')
+    matches = {
+        pk: (name, flavor)
+        for pk, name, flavor in CustomerSuggestion.objects.starting_with('customer_name', term)
+        .values_list(*columns)[:limit]
+    }
+    if len(matches) < limit:
+        for pk, name, flavor in CustomerSuggestion.objects.starting_with('suggested_flavor', term).values_list(*columns)[:limit]:
+            matches.setdefault(pk, (name, flavor))
+    results = [{'id': pk, 'text': f"{name} - {flavor}"} for pk, (name, flavor) in list(matches.items())[:limit]]
+    return JsonResponse({'results': results})
+
+def search_suggestions(request):
+    """
+    Public JSON full-text search over customer suggestions.
+
+    Matches every word of the `q` query parameter as a prefix against the
+    customer name, suggested flavor and reason through the FTS5 index, and
+    returns at most SEARCH_RESULT_LIMIT suggestions, most relevant first.
+    Customer email addresses are not included.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        JsonResponse: ``{"results": [{"id": ..., "customer_name": ..., "suggested_flavor": ..., "suggestion_reason": ...}, ...]}``.
+    """
+    term = request.GET.get('q', '').strip()
+    limit = getattr(settings, 'SEARCH_RESULT_LIMIT', 20)
+    matches = search.ranked_search(
+        CustomerSuggestion.objects.all(), search.SUGGESTION_INDEX, term, limit,
+        fallback_fields=('customer_name', 'suggested_flavor', 'suggestion_reason'),
+    )
+    results = list(matches.values('id', 'customer_name', 'suggested_flavor', 'suggestion_reason'))
+    return JsonResponse({'results': results})
+
+def check_allergens(request):
+    """
+    Public JSON check of which suggestions are free of a set of allergens.
+
+    Takes the suggestions to check as repeated `suggestion` query parameters (at
+    most ALLERGEN_CHECK_LIMIT) and the ingredient ids to avoid as repeated
+    `allergen` parameters; without any `allergen`, every ingredient with a
+    reported allergy issue is avoided. Answered from the in-memory allergen
+    index (see choco_app/allergens.py).
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        JsonResponse: ``{"safe": [...], "unsafe": [...]}`` with suggestion ids in request order.
+    """
+    ids = {}
+    for name, model in (('suggestion', CustomerSuggestion), ('allergen', Ingredient)):
+        try:
+            ids[name] = api.parse_ids(model, request.GET.getlist(name))
+        except ValueError as exc:
+            return JsonResponse({'errors': {name: [str(exc)]}}, status=400)
+    suggestion_ids, allergen_ids = ids['suggestion'], ids['allergen']
+    limit = getattr(settings, 'ALLERGEN_CHECK_LIMIT', 1000)
+    if len(suggestion_ids) > limit:
+        return JsonResponse({'errors': {'suggestion': [f'At most {limit} suggestions per request.']}}, status=400)
+    index = allergens.get_index()
+    if not request.GET.getlist('allergen'):
+        allergen_ids = index.known_allergens()
+    unsafe = index.unsafe_suggestions(allergen_ids)
+    return JsonResponse({
+        'safe': [pk for pk in suggestion_ids if pk not in unsafe],
+        'unsafe': [pk for pk in suggestion_ids if pk in unsafe],
+    })
+
+def api_list(request, resource):
+    """
+    Read-only JSON listing of a published model (ingredients, flavors or suggestions, see choco_app/api.py).
+
+    `fields` selects a comma-separated subset of the published fields (all by
+    default; `id` is always included). With repeated `id` parameters (at most
+    API_MAX_IDS) exactly those rows are returned; otherwise rows are returned
+    in primary key order, one keyset page at a time (`cursor`, `page_size` up
+    to API_MAX_PAGE_SIZE). `version` is the change version to pass to
+    `api_changes` afterwards, read before the rows so no later change is missed.
+
+    Parameters:
+        request (HttpRequest): The request object.
+        resource (str): The resource name.
+
+    Returns:
+        JsonResponse: ``{"version": ..., "results": [...], "next_cursor": ...}``, or with
+                      ids ``{"version": ..., "results": [...], "missing": [...]}`` in request order.
+    """
+    published = api.get_resource(resource)
+    try:
+        fields = published.parse_fields(request.GET.get('fields'))
+    except ValueError as exc:
+        return JsonResponse({'errors': {'fields': [str(exc)]}}, status=400)
+    version = api.current_version()
+    if 'id' in request.GET:
+        try:
+            ids = published.parse_ids(request.GET.getlist('id'))
+        except ValueError as exc:
+            return JsonResponse({'errors': {'id': [str(exc)]}}, status=400)
+        limit = getattr(settings, 'API_MAX_IDS', 500)
+        if len(ids) > limit:
+            return JsonResponse({'errors': {'id': [f'At most {limit} ids per request.']}}, status=400)
+        rows = published.fetch(ids, fields)
+        return JsonResponse({
+            'version': version,
+            'results': [rows[pk] for pk in ids if pk in rows],
+            'missing': [pk for pk in ids if pk not in rows],
+        })
+    page = keyset_paginate(
+        published.values(fields),
+        cursor=request.GET.get('cursor'),
+        page_size=get_page_size(request, 'API_PAGE_SIZE', 'API_MAX_PAGE_SIZE'),
+        ordering=('id',),
+    )
+    return JsonResponse({
+        'version': version,
+        'results': published.attach(page.items, fields),
+        'next_cursor': page.next_cursor,
+    })
+
+def api_changes(request, resource):
+    """
+    JSON delta of a published model: the rows changed after the version given as `since`.
+
+    Kiosks keep the `version` of their last sync and download only what changed
+    since, instead of the whole catalogue on every poll. At most `page_size`
+    rows are returned per call; while `has_more` is true, call again with the
+    returned version. `fields` works as in `api_list`.
+
+    Parameters:
+        request (HttpRequest): The request object.
+        resource (str): The resource name.
+
+    Returns:
+        JsonResponse: ``{"version": ..., "changed": [...], "deleted": [ids], "has_more": ...}``.
+    """
+    published = api.get_resource(resource)
+    try:
+        fields = published.parse_fields(request.GET.get('fields'))
+    except ValueError as exc:
+        return JsonResponse({'errors': {'fields': [str(exc)]}}, status=400)
+    try:
+        since = int(request.GET.get('since', 0))
+        if not 0 <= since < 2**63:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'errors': {'since': ['Expected a version number.']}}, status=400)
+    page_size = get_page_size(request, 'API_PAGE_SIZE', 'API_MAX_PAGE_SIZE')
+    version, changed, deleted, has_more = api.changes(published, since, page_size, fields)
+    return JsonResponse({'version': version, 'changed': changed, 'deleted': deleted, 'has_more': has_more})
+
+async def live_events(request):
+    """
+    Server-Sent Events stream of ingredient and seasonal flavor changes, for shop displays.
+
+    Every committed change to an ingredient or flavor, by any worker process,
+    is pushed within EVENTS_POLL_INTERVAL seconds (see choco_app/events.py), so
+    displays no longer reload pages on a timer. The `topics` query parameter
+    selects a comma-separated subset of "ingredients" and "flavors" (both by
+    default). Event ids are RowChange versions: a reconnecting browser sends
+    Last-Event-ID to any worker and is sent the changes it missed, or a "reset"
+    event if there are more than EVENTS_REPLAY_LIMIT.
+
+    Only served under ASGI (chocolate_house/asgi.py), where an open stream costs
+    a coroutine rather than a worker thread.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        StreamingHttpResponse: The text/event-stream response, or errors with status
+                               400 (unknown topic) or 501 (not running under ASGI).
+    """
+    if not settings.ASYNC_VIEWS:
+        return JsonResponse(
+            {'errors': {'__all__': ['Live updates are served by the ASGI entry point (chocolate_house/asgi.py).']}},
+            status=501,
+        )
+    topics = [topic for topic in request.GET.get('topics', ','.join(events.TOPICS)).split(',') if topic]
+    unknown = set(topics) - set(events.TOPICS)
+    if unknown or not topics:
+        return JsonResponse({'errors': {'topics': [f"Choose from {', '.join(events.TOPICS)}."]}}, status=400)
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    response = StreamingHttpResponse(
+        events.stream(
+            topics, last_event_id,
+            heartbeat=getattr(settings, 'EVENTS_HEARTBEAT', 15),
+            retry=getattr(settings, 'EVENTS_RETRY', 3000),
+            replay_limit=getattr(settings, 'EVENTS_REPLAY_LIMIT', 1000),
+        ),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies (nginx) from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def analytics_view(request):
+    """
+    Dashboard of the most suggested flavors, the most requested ingredients and
+    allergens, and the allergy issue rate per day.
+
+    Reads only the materialized tables maintained by choco_app/analytics.py and
+    choco_app/allergens.py, through their count indexes, so its cost does not
+    grow with the number of suggestions and allergy issues. The `days` query
+    parameter (default ANALYTICS_DAYS) sets the length of the daily series.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: Rendered HTML response with the dashboard.
+    """
+    limit = getattr(settings, 'ANALYTICS_TOP_LIMIT', 10)
+    default_days = getattr(settings, 'ANALYTICS_DAYS', 30)
+    try:
+        days = min(max(int(request.GET.get('days', default_days)), 1), 366)
+    except ValueError:
+        days = default_days
+    return render(request, 'analytics.html', {
+        'flavors': analytics.top_flavors(limit),
+        'ingredients': analytics.top_ingredients(limit),
+        'allergens': analytics.top_allergens(limit),
+        'activity': analytics.daily_activity(days),
+        'days': days,
+    })
+
+@cache.cache_page_for(cache.INGREDIENTS, cache.FLAVORS, cache.RECIPES, params=('weights', 'flavors'))
+def production_plan(request):
+    """
+    Production planner: how many batches of each flavor the current stock allows.
+
+    For every flavor with a recipe it shows the most batches it could make on
+    its own and the ingredient that limits it, then a plan that shares the
+    stock between all of them (see choco_app/planner.py). The `weights` query
+    parameter shares it "equal"ly (default) or by customer "demand"; `flavors`
+    plans the "active" flavors (default) or "all" of them. The page is cached
+    until stock, flavors or recipes change; under "demand" weighting the
+    suggestion counts may lag by up to PAGE_CACHE_TIMEOUT.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: Rendered HTML response with the plan, or status 501 without NumPy.
+    """
+    if not planner.available():
+        return HttpResponse('The production planner requires NumPy.', status=501, content_type='text/plain')
+    weighting = request.GET.get('weights')
+    if weighting not in planner.WEIGHTINGS:
+        weighting = planner.EQUAL
+    active_only = request.GET.get('flavors') != 'all'
+    plan = planner.plan(weighting, active_only)
+    for row in plan['ingredients']:
+        for name in ('stock', 'used', 'left'):
+            row[f'{name}_display'] = format_quantity(row[name], row['unit'])
+    return render(request, 'production_plan.html', {
+        'flavors': plan['flavors'],
+        'ingredients': plan['ingredients'],
+        'weighting': weighting,
+        'weightings': planner.WEIGHTINGS,
+        'active_only': active_only,
+    })
+
 def allergy_concern_success_view(request):
     """
     View to display the success page after an allergy concern is created.
@@ -108,6 +568,7 @@ def allergy_concern_success_view(request):
     """
     return render(request, 'allergy_sucess.html')
 
+@cache.cache_page_for()
 def home_view(request):
     """
     View for the home page.
@@ -120,13 +581,26 @@ def home_view(request):
     """
     return render(request, 'home.html')
 
+@cache.cache_page_for()
+async def home_view_async(request):
+    """
+    Async variant of `home_view`, served under ASGI (see the ASYNC_VIEWS setting).
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: Rendered HTML response for the home page.
+    """
+    return await sync_to_async(render)(request, 'home.html')
+
 def contact_view(request):
     """
     View for customer inquiries.
 
     This view handles the form submission for customer inquiries. If the request
-    method is POST and the form is valid, the inquiry is saved and the user is
-    redirected to the home page. Otherwise, a blank form is displayed.
+    method is POST and the form is valid, the inquiry is submitted (see
+    `submissions.submit`) and the user is redirected to the home page. Otherwise, a blank form is displayed.
 
     Parameters:
         request (HttpRequest): The request object.
@@ -138,12 +612,13 @@ def contact_view(request):
     if request.method == 'POST':
         form = InquiryForm(request.POST)
         if form.is_valid():
-            form.save()  
+            submissions.submit('inquiry', form)
             return redirect('home')  
     else:
         form = InquiryForm()
     return render(request, 'contact.html', {'form': form})
 
+@cache.cache_page_for()
 def about_view(request):
     """
     View for the about page.
@@ -174,7 +649,9 @@ def create_ingredient(request):
     if request.method == 'POST':
         form = IngredientForm(request.POST)
         if form.is_valid():
-            form.save()
+            # The ingredient and its opening ledger entry are written together.
+            with transaction.atomic():
+                form.save()
             return redirect('ingredient_list')
     else:
         form = IngredientForm()
@@ -187,6 +664,7 @@ def update_ingredient(request, pk):
     This view retrieves the ingredient by primary key and handles the form submission
     for updating its details. If the request method is POST and the form is valid,
     the ingredient is updated and the user is redirected to the ingredient list page.
+    A stock edit is recorded as a stock movement (see `IngredientForm.save`).
 
     Parameters:
         request (HttpRequest): The request object.
@@ -200,8 +678,13 @@ def update_ingredient(request, pk):
     if request.method == 'POST':
         form = IngredientForm(request.POST, instance=ingredient_instance)
         if form.is_valid():
-            form.save()
-            return redirect('ingredient_list')
+            try:
+                with transaction.atomic():
+                    form.save()
+            except (InsufficientStock, StockLimitExceeded) as exc:
+                form.add_error('stock', str(exc))
+            else:
+                return redirect('ingredient_list')
     else:
         form = IngredientForm(instance=ingredient_instance)
     return render(request, 'ingredient_form.html', {'form': form})
@@ -227,6 +710,124 @@ def delete_ingredient(request, pk):
         return redirect('ingredient_list')
     return render(request, 'ingredient_delete.html', {'ingredient': ingredient_instance})
 
+@require_POST
+def adjust_ingredient_stock(request, pk):
+    """
+    View to apply one stock movement (increment or decrement) to an ingredient.
+
+    The movement is applied with a single atomic UPDATE, so concurrent
+    terminals cannot overwrite each other's changes, and the database rejects
+    movements that would make the stock negative.
+
+    Parameters:
+        request (HttpRequest): The request object, with `delta` (in base units: milligrams
+                               or units) and `reason` POST fields.
+        pk (int): The primary key of the ingredient.
+
+    Returns:
+        JsonResponse: ``{"ingredient": pk, "stock": new_stock}``, or the errors with
+                      status 400 (invalid input), 404 (unknown ingredient) or 409
+                      (insufficient stock, or stock above the limit).
+    """
+    form = StockMovementForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    try:
+        stock = Ingredient.objects.adjust_stock(pk, form.cleaned_data['delta'], form.cleaned_data['reason'])
+    except Ingredient.DoesNotExist:
+        return JsonResponse({'errors': {'ingredient': ['Ingredient not found.']}}, status=404)
+    except (InsufficientStock, StockLimitExceeded) as exc:
+        return JsonResponse({'errors': {'delta': [str(exc)]}}, status=409)
+    return JsonResponse({'ingredient': pk, 'stock': stock})
+
+@require_POST
+def adjust_stock_batch(request):
+    """
+    View to apply many stock movements in one transaction.
+
+    The request body is JSON of the form
+    ``{"movements": [{"ingredient": pk, "delta": 5000, "reason": "delivery"}, ...]}``
+    with deltas in base units (milligrams or units).
+    Either every movement is applied or, if any is invalid or would make a stock
+    negative, none is.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        JsonResponse: ``{"stock": {pk: new_stock, ...}}``, or the errors with status
+                      400 (invalid input), 404 (unknown ingredient) or 409
+                      (insufficient stock, or stock above the limit).
+    """
+    try:
+        items = json.loads(request.body)['movements']
+        if not isinstance(items, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'errors': {'movements': ['Expected a JSON object with a "movements" list.']}}, status=400)
+
+    movements = []
+    for index, item in enumerate(items):
+        form = BatchStockMovementForm(item if isinstance(item, dict) else {})
+        if not form.is_valid():
+            return JsonResponse({'errors': {'movements': {index: form.errors}}}, status=400)
+        data = form.cleaned_data
+        movements.append((data['ingredient'], data['delta'], data['reason']))
+
+    try:
+        stock = Ingredient.objects.apply_movements(movements)
+    except Ingredient.DoesNotExist as exc:
+        return JsonResponse({'errors': {'ingredient': [str(exc)]}}, status=404)
+    except (InsufficientStock, StockLimitExceeded) as exc:
+        return JsonResponse({'errors': {'delta': [str(exc)]}, 'ingredients': exc.ingredient_ids}, status=409)
+    return JsonResponse({'stock': stock})
+
+def import_ingredients(request):
+    """
+    View to create or update ingredients in bulk from an uploaded CSV or JSON Lines file.
+
+    The upload is streamed through `bulk.import_ingredients`, which writes
+    it in batched upserts. Rows that fail validation are listed on the result page
+    while the valid rows are still saved.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: Rendered HTML response with the upload form and, after a POST,
+                      the import summary.
+    """
+    result = None
+    if request.method == 'POST':
+        form = IngredientImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = form.cleaned_data['format'] or bulk.guess_format(upload.name)
+            result = bulk.import_ingredients(bulk.decode_lines(upload), fmt)
+    else:
+        form = IngredientImportForm()
+    return render(request, 'ingredient_import.html', {'form': form, 'result': result})
+
+def export_ingredients(request):
+    """
+    View to download the full ingredient inventory as CSV (default) or JSON Lines.
+
+    The response is streamed row by row, so the table is never loaded into memory.
+
+    Parameters:
+        request (HttpRequest): The request object.
+
+    Returns:
+        StreamingHttpResponse: The exported file as an attachment.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in bulk.FORMATS:
+        fmt = 'csv'
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(bulk.export_ingredients(fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="ingredients.{fmt}"'
+    return response
+
 def add_seasonal_flavor(request):
     """
     View to add a new seasonal flavor.
@@ -0,0 +1,123 @@
+from django import forms
+from django.urls import reverse
+
+from . import cache
+
+
+class LookupSelect(forms.Widget):
+    """
+    A searchable replacement for `forms.Select` backed by a JSON lookup endpoint.
+
+    Instead of rendering an <option> for every row of the field's queryset, the
+    widget renders a hidden input holding the selected primary key and a search
+    box that asks `url_name` for the top matches as the user types. Only the
+    currently selected row (if any) is read from the database to show its label.
+
+    Attributes:
+        url_name (str): Name of the URL pattern that answers `?q=<term>` lookups.
+    """
+    template_name = 'widgets/lookup_select.html'
+
+    def __init__(self, url_name, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.choices = ()
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['lookup_url'] = reverse(self.url_name)
+        context['widget']['label'] = self.label_for(value)
+        return context
+
+    def format_value(self, value):
+        if value is None or value == '':
+            return ''
+        return str(value)
+
+    def label_for(self, value):
+        """
+        Return the display label of the selected object without iterating the choices.
+
+        Parameters:
+            value: The selected primary key (or an empty value).
+
+        Returns:
+            str: The label of the selected object, or an empty string.
+        """
+        queryset = getattr(self.choices, 'queryset', None)
+        if queryset is None or value in (None, ''):
+            return ''
+        try:
+            obj = queryset.filter(pk=value).first()
+        except (TypeError, ValueError):
+            return ''
+        return '' if obj is None else self.choices.field.label_from_instance(obj)
+
+
+class CatalogueSelectMultiple(forms.Widget):
+    """
+    A searchable replacement for `forms.CheckboxSelectMultiple` backed by a JSON catalogue.
+
+    The page carries only the selected rows, as hidden inputs with their labels.
+    The catalogue of ``[id, label]`` pairs is fetched from `url_name` the first
+    time the search box gets focus, and searched in the browser. Its URL carries
+    the INGREDIENTS cache version, so the browser can keep one copy per version
+    and fetches it again only after an ingredient changes.
+
+    Attributes:
+        url_name (str): Name of the URL pattern serving the catalogue.
+        group (str): The cache group whose version the catalogue URL carries.
+    """
+    template_name = 'widgets/catalogue_select_multiple.html'
+    allow_multiple_selected = True
+
+    def __init__(self, url_name, group=cache.INGREDIENTS, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.group = group
+        self.choices = ()
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['catalogue_url'] = f'{reverse(self.url_name)}?v={cache.get_version(self.group)}'
+        context['widget']['selected'] = self.labels_for(context['widget']['value'])
+        return context
+
+    def format_value(self, value):
+        if value is None:
+            return []
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        return [str(v.pk if hasattr(v, 'pk') else v) for v in value if v not in (None, '')]
+
+    def value_from_datadict(self, data, files, name):
+        try:
+            getter = data.getlist
+        except AttributeError:
+            getter = data.get
+        return getter(name)
+
+    def value_omitted_from_data(self, data, files, name):
+        # An empty selection submits nothing, as with checkboxes.
+        return False
+
+    def labels_for(self, values):
+        """
+        Return (value, label) of the selected objects with one query, without iterating the choices.
+
+        Parameters:
+            values (list[str]): The selected primary keys.
+
+        Returns:
+            list[tuple[str, str]]: The selected objects that exist, in the order given.
+        """
+        queryset = getattr(self.choices, 'queryset', None)
+        if queryset is None or not values:
+            return []
+        try:
+            objects = {str(obj.pk): obj for obj in queryset.filter(pk__in=values)}
+        except (TypeError, ValueError, OverflowError):
+            return []
+        return [
+            (pk, self.choices.field.label_from_instance(objects[pk])) for pk in dict.fromkeys(values) if pk in objects
+        ]
@@ -2,6 +2,13 @@
 ASGI config for chocolate_house project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI the read-heavy pages are served by their async views (see the
+ASYNC_VIEWS setting), and shop displays receive live ingredient and flavor
+updates from the inventory/events/ stream. Each process polls the RowChange
+log for the writes of every process (see choco_app/events.py), so any number
+of workers can serve it. In production run it through gunicorn.conf.py:
+
+    WEB_INTERFACE=asgi gunicorn -c gunicorn.conf.py
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -12,5 +19,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chocolate_house.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Deliver queued form submissions from this process (see choco_app.submissions.Worker).
+from choco_app.submissions import worker  # noqa: E402
+
+worker.start()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -22,12 +23,15 @@ STATIC_URL = '/static/'
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-3lm)2k)i+7m7hmmpudv=lfw$bu!jw#ykc#h2t6s&b%s$*%+!px'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY', 'django-insecure-3lm)2k)i+7m7hmmpudv=lfw$bu!jw#ykc#h2t6s&b%s$*%+!px',
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# The production entry point (gunicorn.conf.py, DockerFile) sets DJANGO_DEBUG=0.
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') != '0'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -47,6 +51,9 @@ STATICFILES_DIRS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that static files skip the rest of the stack (see SERVE_STATIC).
+    'choco_app.staticfiles.StaticFilesMiddleware',
+    'choco_app.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,18 +65,27 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'chocolate_house.urls'
 
+# Outside DEBUG, templates are compiled once per worker by the cached loader
+# instead of being read and parsed again on every render.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing template renders for choco_app.metrics.
+        'BACKEND': 'choco_app.metrics.InstrumentedTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'choco_app.context_processors.fragment_cache',
             ],
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
@@ -80,14 +96,81 @@ WSGI_APPLICATION = 'chocolate_house.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# The SQLite connection is tuned for concurrent form submissions:
+# - WAL lets readers continue while one writer commits, and synchronous=NORMAL
+#   is durable across application crashes in WAL mode (only the last commits
+#   can be lost on power failure).
+# - mmap_size and cache_size (negative = KiB, here 64 MiB) keep hot pages in memory.
+# - timeout (seconds) makes a writer wait for the lock instead of failing with
+#   "database is locked".
+# - IMMEDIATE transactions take the write lock when an atomic block starts, so
+#   a transaction that read first never has to upgrade its lock, which SQLite
+#   cannot wait for and reports as "database is locked" at once.
+# - Connections are kept for CONN_MAX_AGE seconds instead of reopened per request.
+# init_command and transaction_mode need Django 5.1 or later.
+# DATABASE_PATH moves the database file, e.g. onto a volume in a container.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory by default. Page invalidation happens in the process that saved the
+# model, so when running several worker processes set PAGE_CACHE_BACKEND to 'file'
+# or 'db' to share one cache between them ('db' needs `manage.py createcachetable`).
+# gunicorn.conf.py and the DockerFile default to 'file'.
+
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'locmem')
+
+if PAGE_CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('PAGE_CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        }
+    }
+elif PAGE_CACHE_BACKEND == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'choco_cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'chocolate-house',
+        }
+    }
+
+# Lifetime in seconds of cached pages; model changes evict them earlier.
+PAGE_CACHE_TIMEOUT = 300
+
+# Lifetime in seconds of {% cache %} template fragments (the layout header and
+# footer, listing bodies). Fragments of listings are keyed on their cache group
+# versions, so model changes replace them earlier.
+TEMPLATE_FRAGMENT_TIMEOUT = 3600
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -121,10 +204,143 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
+# Outside DEBUG, collectstatic writes content-hashed copies of every file plus
+# gzip/brotli variants into STATIC_ROOT, and SERVE_STATIC makes the application
+# server serve them (choco_app.staticfiles): hashed names as immutable for a
+# year, anything else for STATIC_MAX_AGE seconds.
 
 STATIC_URL = 'static/'
 
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'choco_app.staticfiles.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '0' if DEBUG else '1') == '1'
+
+STATIC_MAX_AGE = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Ingredient inventory listing
+# Keyset pagination page size (overridable per request with ?page_size=, up to the maximum)
+# and the number of rows rendered per chunk when the list is streamed with ?stream=1.
+
+INGREDIENT_PAGE_SIZE = 50
+
+INGREDIENT_MAX_PAGE_SIZE = 500
+
+INGREDIENT_STREAM_CHUNK_SIZE = 2000
+
+
+# Stock level buckets used by the ingredient admin filter, per unit and in base
+# units (milligrams or units): stock below the first value is "low", at or above
+# the second is "high", and anything in between is "ok".
+
+STOCK_LEVEL_THRESHOLDS = {
+    'g': (1_000_000, 10_000_000),
+    'unit': (10, 100),
+}
+
+
+# Maximum number of matches returned by the customer suggestion lookup endpoint.
+
+SUGGESTION_LOOKUP_LIMIT = 20
+
+
+# Maximum number of results returned by the public suggestion search endpoint.
+
+SEARCH_RESULT_LIMIT = 20
+
+
+# Maximum number of suggestions checked per request by the allergen check endpoint.
+
+ALLERGEN_CHECK_LIMIT = 1000
+
+
+# Rows per ranking, and default days of daily history, shown on the analytics dashboard.
+
+ANALYTICS_TOP_LIMIT = 10
+
+ANALYTICS_DAYS = 30
+
+
+# Request instrumentation (choco_app.metrics). Per-view latency, SQL and
+# template timings are served in the Prometheus text format at /metrics, to
+# scrapers sending "Authorization: Bearer <METRICS_TOKEN>" and to staff users.
+# With several worker processes set METRICS_DIR (gunicorn.conf.py does): each
+# process writes its totals there every METRICS_FLUSH_INTERVAL seconds and
+# /metrics serves the sum of all of them, whichever worker answers.
+# Requests slower than SLOW_REQUEST_THRESHOLD seconds are logged to the
+# "choco_app.slow_requests" logger with their SLOW_REQUEST_MAX_QUERIES slowest
+# queries; set the threshold to None to disable the log.
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 1.0
+SLOW_REQUEST_THRESHOLD = 1.0
+SLOW_REQUEST_MAX_QUERIES = 10
+
+
+# Write-behind queue for the public suggestion, allergy concern and contact forms
+# (choco_app.submissions). Valid submissions are queued in one small INSERT and
+# written in batches of up to SUBMISSION_BATCH_SIZE by a worker:
+#   'thread' - a background thread of each web process, started with it, drains the queue,
+#   'worker' - only queue; run `manage.py process_submissions` separately,
+#   'sync'   - no queue, save in the request.
+# Failed deliveries are retried after SUBMISSION_RETRY_DELAY seconds, doubling
+# each time, and marked failed (see the admin) after SUBMISSION_MAX_ATTEMPTS.
+
+SUBMISSION_QUEUE = os.environ.get('SUBMISSION_QUEUE', 'thread')
+SUBMISSION_BATCH_SIZE = 500
+SUBMISSION_MAX_ATTEMPTS = 5
+SUBMISSION_RETRY_DELAY = 30
+SUBMISSION_POLL_INTERVAL = 1.0
+
+
+# Serve the async variants of the read-heavy views (ingredient list, seasonal
+# flavors, home). chocolate_house/asgi.py turns this on; keep it off under WSGI,
+# where every async view would run in its own event loop.
+
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
+
+# Read-only JSON API (choco_app/api.py): default and largest page size, and the
+# most ids accepted by one bulk fetch.
+
+API_PAGE_SIZE = 100
+
+API_MAX_PAGE_SIZE = 1000
+
+API_MAX_IDS = 500
+
+
+# Live updates (choco_app/events.py, ASGI only): seconds of silence before a
+# keepalive, the reconnection delay sent to browsers in milliseconds, how often
+# each process polls the RowChange log for writes made by any process, the most
+# missed changes replayed to a reconnecting client before it is sent a reset
+# instead, and batches queued per client before a slow client is reset.
+
+EVENTS_HEARTBEAT = 15
+
+EVENTS_RETRY = 3000
+
+EVENTS_POLL_INTERVAL = 0.5
+
+EVENTS_REPLAY_LIMIT = 1000
+
+EVENTS_QUEUE_SIZE = 100
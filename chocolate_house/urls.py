@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from choco_app.metrics import metrics_view
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
      path('inventory/', include('choco_app.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chocolate_house.settings')
 
 application = get_wsgi_application()
+
+# Deliver queued form submissions from this process (see choco_app.submissions.Worker).
+from choco_app.submissions import worker  # noqa: E402
+
+worker.start()
@@ -0,0 +1,9 @@
+#!/bin/sh
+# Migrate the database on the data volume, then run the server command.
+# Done at start rather than build time: a fresh or bind-mounted volume
+# replaces whatever the image had in /app/data.
+set -e
+
+mkdir -p "$(dirname "$DATABASE_PATH")"
+python manage.py migrate --noinput
+exec "$@"
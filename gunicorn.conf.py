@@ -0,0 +1,74 @@
+"""
+Production entry point for the WSGI application.
+
+    DJANGO_DEBUG=0 python manage.py collectstatic --noinput
+    gunicorn -c gunicorn.conf.py
+
+Runs WEB_WORKERS processes (default: two per CPU, plus one) of WEB_THREADS
+threads each (default 4). Threads suit this application: requests mostly wait
+on SQLite, which releases the GIL, and a thread costs far less memory than a
+process. Workers are recycled after WEB_MAX_REQUESTS requests (jittered, so
+they do not all restart at once) to bound slow memory growth.
+
+The page cache and its invalidation counters must be shared by the workers, or a
+save in one worker leaves the others serving (and answering 304 for) stale
+pages: PAGE_CACHE_BACKEND defaults to 'file' here, and starting several workers
+on the per-process 'locmem' cache is refused.
+
+Each worker also writes its request metrics to METRICS_DIR (by default a fresh
+directory per server, cleared at start), so /metrics reports every worker
+whichever one answers the scrape; the files of exited workers are folded into
+one archive (see choco_app.metrics).
+
+WEB_INTERFACE=asgi runs the ASGI application (chocolate_house/asgi.py) in
+uvicorn workers instead, for the async views and the live update stream, where
+an open connection costs a coroutine rather than a thread; WEB_THREADS does not
+apply.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chocolate_house.settings')
+os.environ.setdefault('DJANGO_DEBUG', '0')
+os.environ.setdefault('PAGE_CACHE_BACKEND', 'file')
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f'choco-metrics-{os.getpid()}'))
+
+bind = os.environ.get('WEB_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+if workers > 1 and os.environ['PAGE_CACHE_BACKEND'] == 'locmem':
+    raise SystemExit(
+        f"PAGE_CACHE_BACKEND=locmem keeps a separate page cache in each of the {workers} workers; "
+        "use 'file' or 'db', or set WEB_WORKERS=1."
+    )
+if os.environ.get('WEB_INTERFACE', 'wsgi') == 'asgi':
+    wsgi_app = 'chocolate_house.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'chocolate_house.wsgi:application'
+    worker_class = 'gthread'
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+keepalive = 5
+accesslog = os.environ.get('WEB_ACCESS_LOG') or None
+errorlog = '-'
+
+# Each worker imports the application itself: database connections and the
+# in-process submission worker thread must not be shared across a fork.
+preload_app = False
+
+
+def on_starting(server):
+    """Start the metrics of this server from zero."""
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICS_DIR'])
+
+
+def child_exit(server, worker):
+    """Fold an exited worker's metrics into the archive."""
+    from choco_app.metrics import archive
+
+    archive(os.environ['METRICS_DIR'], worker.pid)